@@ -9,6 +9,93 @@ import json
 import os
 
 from utils import create_tamil_nadu_map, display_map, MAJOR_CITIES, generate_routes, get_alternative_routes
+from route_geometry import RouteLine
+from lazy_charts import lazy_plotly_chart
+
+def traffic_prediction_figure(start_location):
+    """Predicted traffic density over the day for routes leaving start_location"""
+    # Generate hourly traffic data with more realistic patterns
+    hours = list(range(24))
+    current_hour = datetime.now().hour
+    current_day = datetime.now().weekday()  # 0 = Monday, 6 = Sunday
+    
+    # Create realistic traffic pattern based on time and day
+    traffic_values = []
+    for hour in hours:
+        # Weekday patterns
+        if current_day < 5:  # Monday to Friday
+            # Early morning rush (6-10 AM)
+            if 6 <= hour <= 10:
+                base = 60 + (hour - 6) * 15  # Gradually increasing
+            # Lunch time (12-2 PM)
+            elif 12 <= hour <= 14:
+                base = 70
+            # Evening rush (4-8 PM)
+            elif 16 <= hour <= 20:
+                base = 85 + (20 - abs(hour - 18)) * 5
+            # Late night (10 PM - 5 AM)
+            elif hour < 5 or hour > 22:
+                base = 15
+            # Other times
+            else:
+                base = 50
+        else:  # Weekend pattern
+            # Late morning (9-11 AM)
+            if 9 <= hour <= 11:
+                base = 65
+            # Shopping hours (12-8 PM)
+            elif 12 <= hour <= 20:
+                base = 75
+            # Late night
+            elif hour < 6 or hour > 22:
+                base = 20
+            # Other times
+            else:
+                base = 45
+    
+        # Add weather impact (example: higher traffic during rain)
+        weather_factor = random.choice([1.0, 1.1, 1.2])  # Normal, Light Rain, Heavy Rain
+    
+        # Add location-based congestion
+        if start_location in ['Chennai', 'Coimbatore', 'Madurai']:
+            location_factor = 1.2  # More traffic in major cities
+        else:
+            location_factor = 1.0
+    
+        # Calculate final traffic value
+        traffic = int(base * weather_factor * location_factor)
+        traffic = max(10, min(100, traffic))  # Ensure within bounds
+        traffic_values.append(traffic)
+    
+    # Create DataFrame for the chart
+    traffic_df = pd.DataFrame({
+        'Hour': [f"{h:02d}:00" for h in hours],
+        'Traffic Density (%)': traffic_values
+    })
+    
+    # Highlight current hour
+    traffic_df['Current Time'] = [
+        True if h == current_hour else False for h in hours
+    ]
+    
+    # Create the chart
+    fig = px.line(
+        traffic_df, 
+        x='Hour', 
+        y='Traffic Density (%)',
+        markers=True,
+        color='Current Time',
+        color_discrete_map={True: 'red', False: 'blue'}
+    )
+    
+    fig.update_layout(
+        height=300,
+        margin=dict(l=0, r=0, t=30, b=0),
+        legend_title_text='',
+        hovermode='x'
+    )
+    
+    return fig
 
 def main():
     st.title("🗺️ Predictive Route Management")
@@ -48,180 +135,109 @@ def main():
         route_preference = st.selectbox("Route Preference", 
                                        options=["Fastest", "Shortest", "Least Tolls", "Scenic"])
     
-    # Generate routes button
+    # Generate routes button; routes are kept so widgets in the results can rerun the page
     if st.button("Find Routes"):
         if start_location == end_location:
             st.error("Starting point and destination cannot be the same.")
+            st.session_state.pop("route_results", None)
         else:
-            with st.spinner("Calculating optimal routes..."):
-                # Get route options
-                routes = generate_routes(start_location, end_location)
-                
-                # Display map with routes
-                st.subheader("Route Options")
-                m = create_tamil_nadu_map()
+            # Get route options
+            st.session_state["route_results"] = (start_location, end_location, generate_routes(start_location, end_location))
+    
+    route_results = st.session_state.get("route_results")
+    if route_results and route_results[:2] == (start_location, end_location):
+        routes = route_results[2]
+        with st.spinner("Calculating optimal routes..."):
+            
+            # Display map with routes
+            st.subheader("Route Options")
+            m = create_tamil_nadu_map()
+            
+            # Add markers for start and end locations
+            start_coords = MAJOR_CITIES[start_location]
+            end_coords = MAJOR_CITIES[end_location]
+            
+            folium.Marker(
+                location=start_coords,
+                popup=start_location,
+                tooltip=f"Start: {start_location}",
+                icon=folium.Icon(color="green", icon="play", prefix="fa")
+            ).add_to(m)
+            
+            folium.Marker(
+                location=end_coords,
+                popup=end_location,
+                tooltip=f"End: {end_location}",
+                icon=folium.Icon(color="red", icon="stop", prefix="fa")
+            ).add_to(m)
+            
+            # Add route lines
+            for i, route in enumerate(routes):
+                # Creating waypoints for the route visualization
+                route_points = [start_coords]
                 
-                # Add markers for start and end locations
-                start_coords = MAJOR_CITIES[start_location]
-                end_coords = MAJOR_CITIES[end_location]
+                # Add some intermediate points for visualization
+                # In a real app, these would be actual waypoints
+                intermediate_points = 3
+                for j in range(intermediate_points):
+                    # Create points that deviate slightly from a straight line
+                    factor = (j + 1) / (intermediate_points + 1)
+                    lat = start_coords[0] + (end_coords[0] - start_coords[0]) * factor
+                    lng = start_coords[1] + (end_coords[1] - start_coords[1]) * factor
+                    
+                    # Add some randomness for different routes
+                    lat_offset = (random.random() - 0.5) * 0.5
+                    lng_offset = (random.random() - 0.5) * 0.5
+                    
+                    route_points.append([lat + lat_offset, lng + lng_offset])
                 
-                folium.Marker(
-                    location=start_coords,
-                    popup=start_location,
-                    tooltip=f"Start: {start_location}",
-                    icon=folium.Icon(color="green", icon="play", prefix="fa")
-                ).add_to(m)
+                route_points.append(end_coords)
                 
-                folium.Marker(
-                    location=end_coords,
-                    popup=end_location,
-                    tooltip=f"End: {end_location}",
-                    icon=folium.Icon(color="red", icon="stop", prefix="fa")
+                # Add route line
+                RouteLine(
+                    route_points,
+                    tooltip=f"Route {i+1}: {route['name']}",
+                    color=route['color'],
+                    weight=5,
+                    opacity=0.7
                 ).add_to(m)
-                
-                # Add route lines
-                for i, route in enumerate(routes):
-                    # Creating waypoints for the route visualization
-                    route_points = [start_coords]
+            
+            # Display the map
+            display_map(m)
+            
+            # Display route details
+            st.subheader("Route Details")
+            
+            for i, route in enumerate(routes):
+                expander_label = f"Option {i+1}: {route['name']} ({route['distance']} km, {route['time']} min)"
+                with st.expander(expander_label):
+                    col1, col2 = st.columns(2)
                     
-                    # Add some intermediate points for visualization
-                    # In a real app, these would be actual waypoints
-                    intermediate_points = 3
-                    for j in range(intermediate_points):
-                        # Create points that deviate slightly from a straight line
-                        factor = (j + 1) / (intermediate_points + 1)
-                        lat = start_coords[0] + (end_coords[0] - start_coords[0]) * factor
-                        lng = start_coords[1] + (end_coords[1] - start_coords[1]) * factor
+                    with col1:
+                        st.markdown(f"**Distance:** {route['distance']} km")
+                        st.markdown(f"**Estimated Time:** {route['time']} minutes")
+                        st.markdown(f"**Traffic Conditions:** {route['traffic']}")
+                        st.markdown(f"**Toll Plazas:** {route.get('toll_plazas', 'N/A')}")
                         
-                        # Add some randomness for different routes
-                        lat_offset = (random.random() - 0.5) * 0.5
-                        lng_offset = (random.random() - 0.5) * 0.5
+                    with col2:
+                        st.markdown(f"**Estimated Fuel Cost:** ₹{round(route['distance'] * 7.5)}")
+                        st.markdown(f"**Estimated Toll Cost:** ₹{route.get('estimated_toll_cost', 'N/A')}")
                         
-                        route_points.append([lat + lat_offset, lng + lng_offset])
+                        arrival_time = (datetime.combine(datetime.today(), departure_time) + 
+                                       timedelta(minutes=route['time'])).time()
+                        st.markdown(f"**Estimated Arrival:** {arrival_time.strftime('%I:%M %p')}")
                     
-                    route_points.append(end_coords)
+                    # Traffic prediction chart (simplified)
+                    st.markdown("#### Traffic Prediction")                        
+                    lazy_plotly_chart(
+                        f"traffic_{route.get('id', route['name'])}",
+                        (start_location, datetime.now().hour, datetime.now().weekday()),
+                        lambda: traffic_prediction_figure(start_location),
+                        label="Show traffic prediction"
+                    )
                     
-                    # Add route line
-                    folium.PolyLine(
-                        locations=route_points,
-                        tooltip=f"Route {i+1}: {route['name']}",
-                        color=route['color'],
-                        weight=5,
-                        opacity=0.7
-                    ).add_to(m)
-                
-                # Display the map
-                display_map(m)
-                
-                # Display route details
-                st.subheader("Route Details")
-                
-                for i, route in enumerate(routes):
-                    expander_label = f"Option {i+1}: {route['name']} ({route['distance']} km, {route['time']} min)"
-                    with st.expander(expander_label):
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.markdown(f"**Distance:** {route['distance']} km")
-                            st.markdown(f"**Estimated Time:** {route['time']} minutes")
-                            st.markdown(f"**Traffic Conditions:** {route['traffic']}")
-                            st.markdown(f"**Toll Plazas:** {route.get('toll_plazas', 'N/A')}")
-                            
-                        with col2:
-                            st.markdown(f"**Estimated Fuel Cost:** ₹{round(route['distance'] * 7.5)}")
-                            st.markdown(f"**Estimated Toll Cost:** ₹{route.get('estimated_toll_cost', 'N/A')}")
-                            
-                            arrival_time = (datetime.combine(datetime.today(), departure_time) + 
-                                           timedelta(minutes=route['time'])).time()
-                            st.markdown(f"**Estimated Arrival:** {arrival_time.strftime('%I:%M %p')}")
-                        
-                        # Traffic prediction chart (simplified)
-                        st.markdown("#### Traffic Prediction")                        
-                        # Generate hourly traffic data with more realistic patterns
-                        hours = list(range(24))
-                        current_hour = datetime.now().hour
-                        current_day = datetime.now().weekday()  # 0 = Monday, 6 = Sunday
-                        
-                        # Create realistic traffic pattern based on time and day
-                        traffic_values = []
-                        for hour in hours:
-                            # Weekday patterns
-                            if current_day < 5:  # Monday to Friday
-                                # Early morning rush (6-10 AM)
-                                if 6 <= hour <= 10:
-                                    base = 60 + (hour - 6) * 15  # Gradually increasing
-                                # Lunch time (12-2 PM)
-                                elif 12 <= hour <= 14:
-                                    base = 70
-                                # Evening rush (4-8 PM)
-                                elif 16 <= hour <= 20:
-                                    base = 85 + (20 - abs(hour - 18)) * 5
-                                # Late night (10 PM - 5 AM)
-                                elif hour < 5 or hour > 22:
-                                    base = 15
-                                # Other times
-                                else:
-                                    base = 50
-                            else:  # Weekend pattern
-                                # Late morning (9-11 AM)
-                                if 9 <= hour <= 11:
-                                    base = 65
-                                # Shopping hours (12-8 PM)
-                                elif 12 <= hour <= 20:
-                                    base = 75
-                                # Late night
-                                elif hour < 6 or hour > 22:
-                                    base = 20
-                                # Other times
-                                else:
-                                    base = 45
-                            
-                            # Add weather impact (example: higher traffic during rain)
-                            weather_factor = random.choice([1.0, 1.1, 1.2])  # Normal, Light Rain, Heavy Rain
-                            
-                            # Add location-based congestion
-                            if start_location in ['Chennai', 'Coimbatore', 'Madurai']:
-                                location_factor = 1.2  # More traffic in major cities
-                            else:
-                                location_factor = 1.0
-                            
-                            # Calculate final traffic value
-                            traffic = int(base * weather_factor * location_factor)
-                            traffic = max(10, min(100, traffic))  # Ensure within bounds
-                            traffic_values.append(traffic)
-                        
-                        # Create DataFrame for the chart
-                        traffic_df = pd.DataFrame({
-                            'Hour': [f"{h:02d}:00" for h in hours],
-                            'Traffic Density (%)': traffic_values
-                        })
-                        
-                        # Highlight current hour
-                        traffic_df['Current Time'] = [
-                            True if h == current_hour else False for h in hours
-                        ]
-                        
-                        # Create the chart
-                        fig = px.line(
-                            traffic_df, 
-                            x='Hour', 
-                            y='Traffic Density (%)',
-                            markers=True,
-                            color='Current Time',
-                            color_discrete_map={True: 'red', False: 'blue'}
-                        )
-                        
-                        fig.update_layout(
-                            height=300,
-                            margin=dict(l=0, r=0, t=30, b=0),
-                            legend_title_text='',
-                            hovermode='x'
-                        )
-                        
-                        st.plotly_chart(fig, use_container_width=True)
-                        
-                        # Navigation button
-                        st.button(f"Navigate via Route {i+1}", key=f"nav_route_{i}")
+                    # Navigation button
+                    st.button(f"Navigate via Route {i+1}", key=f"nav_route_{i}")
     
     # Traffic alerts section
     st.header("Live Traffic Alerts")
@@ -1,5 +1,4 @@
 import streamlit as st
-import folium
 from streamlit_folium import st_folium
 import pandas as pd
 import plotly.express as px
@@ -7,7 +6,125 @@ import json
 import random
 from datetime import datetime, timedelta
 
-from utils import create_tamil_nadu_map, display_map, MAJOR_CITIES
+from utils import create_tamil_nadu_map, display_map, map_view, MAJOR_CITIES
+from map_layers import get_point_layer
+from lazy_charts import lazy_plotly_chart
+from paged_list import paged_list
+
+def parking_color(spot, open_color):
+    # Determine marker color based on availability
+    if spot["status"] == "Full":
+        return "red"
+    elif spot["status"] == "Crowded":
+        return "orange"
+    return open_color
+
+def parking_tooltip(spot):
+    # Calculate percentage availability
+    availability_pct = round((spot["available_spaces"] / spot["total_spaces"]) * 100)
+    return f"{spot['name']}: {availability_pct}% available"
+
+def facility_popup(facility):
+    return f"""
+    <div style="width:200px">
+        <h4>{facility["name"]}</h4>
+        <p><b>Available:</b> {facility["available_spaces"]}/{facility["total_spaces"]} spaces</p>
+        <p><b>Status:</b> {facility["status"]}</p>
+        <p><b>Rate:</b> ₹{facility["hourly_rate"]}/hour</p>
+        <p><b>Hours:</b> {facility["operating_hours"]}</p>
+        <p><b>Features:</b> {", ".join(facility["features"])}</p>
+    </div>
+    """
+
+def street_parking_popup(spot):
+    return f"""
+    <div style="width:200px">
+        <h4>{spot["name"]} (Street Parking)</h4>
+        <p><b>Available:</b> {spot["available_spaces"]}/{spot["total_spaces"]} spaces</p>
+        <p><b>Status:</b> {spot["status"]}</p>
+        <p><b>Rate:</b> ₹{spot["hourly_rate"]}/hour</p>
+        <p><b>Restrictions:</b> {spot["restrictions"]}</p>
+        <p><b>Payment:</b> {", ".join(spot["payment_methods"])}</p>
+    </div>
+    """
+
+def street_parking_figure(spot):
+    """Predicted availability over the day for a street parking spot"""
+    # Generate hourly availability prediction
+    hours = list(range(24))
+    current_hour = datetime.now().hour
+    
+    # Create data for availability chart
+    availability_data = []
+    total_spaces = spot["total_spaces"]
+    current_spaces = spot["available_spaces"]
+    
+    for h in hours:
+        # Morning decrease (7-10 AM)
+        if 7 <= h <= 10:
+            factor = 0.6 - (h - 7) * 0.15
+        # Lunch time (12-2 PM)
+        elif 12 <= h <= 14:
+            factor = 0.3
+        # Evening rush (5-8 PM)
+        elif 17 <= h <= 20:
+            factor = 0.2
+        # Late night (10 PM - 6 AM)
+        elif h < 6 or h > 22:
+            factor = 0.9
+        # Other times
+        else:
+            factor = 0.5
+    
+        # Add some randomness
+        factor += (random.random() - 0.5) * 0.2
+        factor = max(0, min(1, factor))
+    
+        # Calculate spaces
+        spaces = int(total_spaces * factor)
+    
+        # If current hour, use actual data
+        if h == current_hour:
+            spaces = current_spaces
+    
+        availability_data.append({
+            "Hour": f"{h:02d}:00",
+            "Available Spaces": spaces,
+            "Current Hour": h == current_hour
+        })
+    
+    # Create DataFrame for chart
+    df = pd.DataFrame(availability_data)
+    
+    # Create chart
+    fig = px.line(
+        df,
+        x="Hour",
+        y="Available Spaces",
+        markers=True,
+        color="Current Hour",
+        color_discrete_map={True: "red", False: "blue"}
+    )
+    
+    fig.update_layout(
+        height=200,
+        margin=dict(l=0, r=0, t=20, b=0),
+        legend_title_text="",
+        hovermode="x"
+    )
+    
+    # Add capacity line
+    fig.add_shape(
+        type="line",
+        x0=0,
+        y0=total_spaces,
+        x1=1,
+        y1=total_spaces,
+        xref="paper",
+        line=dict(color="green", dash="dash"),
+    )
+    
+    return fig
 
 def load_parking_data():
     try:
@@ -98,80 +215,34 @@ def main():
     st.header(f"Parking Facilities in {selected_city}")
     
     # Create map centered on selected city
-    m = folium.Map(
-        location=MAJOR_CITIES[selected_city],
-        zoom_start=13,
-        tiles="OpenStreetMap"
-    )
+    m = create_tamil_nadu_map(center=MAJOR_CITIES[selected_city], zoom=13, cities=False)
     
-    # Add markers for parking facilities
-    for facility in city_facilities:
-        # Determine marker color based on availability
-        if facility["status"] == "Full":
-            color = "red"
-        elif facility["status"] == "Crowded":
-            color = "orange"
-        else:
-            color = "green"
-            
-        # Calculate percentage availability
-        availability_pct = round((facility["available_spaces"] / facility["total_spaces"]) * 100)
-        
-        # Create popup content
-        popup_html = f"""
-        <div style="width:200px">
-            <h4>{facility["name"]}</h4>
-            <p><b>Available:</b> {facility["available_spaces"]}/{facility["total_spaces"]} spaces</p>
-            <p><b>Status:</b> {facility["status"]}</p>
-            <p><b>Rate:</b> ₹{facility["hourly_rate"]}/hour</p>
-            <p><b>Hours:</b> {facility["operating_hours"]}</p>
-            <p><b>Features:</b> {", ".join(facility["features"])}</p>
-        </div>
-        """
-        
-        # Add marker to map
-        folium.Marker(
-            location=facility["coordinates"],
-            popup=folium.Popup(popup_html, max_width=300),
-            tooltip=f"{facility['name']}: {availability_pct}% available",
-            icon=folium.Icon(color=color, icon="parking", prefix="fa")
-        ).add_to(m)
+    # Add markers for parking facilities and street parking, clustered and limited to the current view
+    map_key = f"parking_map_{selected_city}"
+    view = map_view(map_key)
     
-    # Add markers for street parking
-    for spot in city_street_parking:
-        # Determine marker color
-        if spot["status"] == "Full":
-            color = "red"
-        elif spot["status"] == "Crowded":
-            color = "orange"
-        else:
-            color = "blue"
-            
-        # Calculate percentage availability
-        availability_pct = round((spot["available_spaces"] / spot["total_spaces"]) * 100)
-        
-        # Create popup content
-        popup_html = f"""
-        <div style="width:200px">
-            <h4>{spot["name"]} (Street Parking)</h4>
-            <p><b>Available:</b> {spot["available_spaces"]}/{spot["total_spaces"]} spaces</p>
-            <p><b>Status:</b> {spot["status"]}</p>
-            <p><b>Rate:</b> ₹{spot["hourly_rate"]}/hour</p>
-            <p><b>Restrictions:</b> {spot["restrictions"]}</p>
-            <p><b>Payment:</b> {", ".join(spot["payment_methods"])}</p>
-        </div>
-        """
-        
-        # Add marker to map
-        folium.Marker(
-            location=spot["coordinates"],
-            popup=folium.Popup(popup_html, max_width=300),
-            tooltip=f"{spot['name']}: {availability_pct}% available",
-            icon=folium.Icon(color=color, icon="road", prefix="fa")
-        ).add_to(m)
+    get_point_layer(f"{map_key}_facilities", city_facilities).add_to(
+        m,
+        city_facilities,
+        view=view,
+        tooltip=parking_tooltip,
+        style=lambda facility: {"color": parking_color(facility, "green"), "icon": "parking"},
+        popup=facility_popup,
+        label="parking facilities"
+    )
+    
+    get_point_layer(f"{map_key}_street", city_street_parking).add_to(
+        m,
+        city_street_parking,
+        view=view,
+        tooltip=parking_tooltip,
+        style=lambda spot: {"color": parking_color(spot, "blue"), "icon": "road"},
+        popup=street_parking_popup,
+        label="street parking spots"
+    )
         
     # Display the map
-    display_map(m)
+    display_map(m, key=map_key)
     
     # Parking facilities list
     st.header(f"Available Parking in {selected_city}")
@@ -182,7 +253,18 @@ def main():
         st.subheader("Parking Facilities")
         
         if city_facilities:
-            for facility in city_facilities:
+            page = paged_list(
+                city_facilities,
+                f"facility_list_{selected_city}",
+                sort_options={
+                    "Most spaces free": (lambda f: f["available_spaces"], True),
+                    "Lowest rate": (lambda f: f["hourly_rate"], False),
+                    "Name": (lambda f: f["name"], False)
+                },
+                search_fields=("name",),
+                label="facilities"
+            )
+            for facility in page:
                 # Determine status color
                 if facility["status"] == "Full":
                     status_color = "red"
@@ -220,7 +302,18 @@ def main():
         st.subheader("Street Parking")
         
         if city_street_parking:
-            for spot in city_street_parking:
+            page = paged_list(
+                city_street_parking,
+                f"street_list_{selected_city}",
+                sort_options={
+                    "Most spaces free": (lambda s: s["available_spaces"], True),
+                    "Lowest rate": (lambda s: s["hourly_rate"], False),
+                    "Name": (lambda s: s["name"], False)
+                },
+                search_fields=("name",),
+                label="street spots"
+            )
+            for spot in page:
                 # Determine status color
                 if spot["status"] == "Full":
                     status_color = "red"
@@ -236,83 +329,14 @@ def main():
                     st.markdown(f"**Payment Methods:** {', '.join(spot['payment_methods'])}")
                     st.markdown(f"**Status:** <span style='color:{status_color};'>{spot['status']}</span>", unsafe_allow_html=True)
                     
-                    # Add real-time availability chart
+                    # Real-time availability chart, built when the user asks for it
                     if spot["status"] != "Full":
-                        # Generate hourly availability prediction
-                        hours = list(range(24))
-                        current_hour = datetime.now().hour
-                        
-                        # Create data for availability chart
-                        availability_data = []
-                        total_spaces = spot["total_spaces"]
-                        current_spaces = spot["available_spaces"]
-                        
-                        for h in hours:
-                            # Morning decrease (7-10 AM)
-                            if 7 <= h <= 10:
-                                factor = 0.6 - (h - 7) * 0.15
-                            # Lunch time (12-2 PM)
-                            elif 12 <= h <= 14:
-                                factor = 0.3
-                            # Evening rush (5-8 PM)
-                            elif 17 <= h <= 20:
-                                factor = 0.2
-                            # Late night (10 PM - 6 AM)
-                            elif h < 6 or h > 22:
-                                factor = 0.9
-                            # Other times
-                            else:
-                                factor = 0.5
-                                
-                            # Add some randomness
-                            factor += (random.random() - 0.5) * 0.2
-                            factor = max(0, min(1, factor))
-                            
-                            # Calculate spaces
-                            spaces = int(total_spaces * factor)
-                            
-                            # If current hour, use actual data
-                            if h == current_hour:
-                                spaces = current_spaces
-                                
-                            availability_data.append({
-                                "Hour": f"{h:02d}:00",
-                                "Available Spaces": spaces,
-                                "Current Hour": h == current_hour
-                            })
-                        
-                        # Create DataFrame for chart
-                        df = pd.DataFrame(availability_data)
-                        
-                        # Create chart
-                        fig = px.line(
-                            df,
-                            x="Hour",
-                            y="Available Spaces",
-                            markers=True,
-                            color="Current Hour",
-                            color_discrete_map={True: "red", False: "blue"}
+                        lazy_plotly_chart(
+                            f"street_{selected_city}_{spot.get('id', spot['name'])}",
+                            (spot["available_spaces"], spot["total_spaces"], datetime.now().hour),
+                            lambda: street_parking_figure(spot),
+                            label="Show availability forecast"
                         )
-                        
-                        fig.update_layout(
-                            height=200,
-                            margin=dict(l=0, r=0, t=20, b=0),
-                            legend_title_text="",
-                            hovermode="x"
-                        )
-                        
-                        # Add capacity line
-                        fig.add_shape(
-                            type="line",
-                            x0=0,
-                            y0=total_spaces,
-                            x1=1,
-                            y1=total_spaces,
-                            xref="paper",
-                            line=dict(color="green", dash="dash"),
-                        )
-                        
-                        st.plotly_chart(fig, use_container_width=True)
         else:
             st.info(f"No street parking information available for {selected_city}")
     
@@ -386,11 +386,7 @@ def main():
             first_metro = transport_data["metros"][0]
             city_name = first_metro["operator"].split(" ")[0]
             
-            m = folium.Map(
-                location=MAJOR_CITIES.get(city_name, [13.0827, 80.2707]),
-                zoom_start=12,
-                tiles="OpenStreetMap"
-            )
+            m = create_tamil_nadu_map(center=MAJOR_CITIES.get(city_name, [13.0827, 80.2707]), zoom=12, cities=False)
             
             # Add metro markers
             for metro in transport_data["metros"]:
@@ -3,11 +3,20 @@ import folium
 from streamlit_folium import st_folium
 import pandas as pd
 import json
-import random
 from datetime import datetime, timedelta
 import plotly.express as px
 
-from utils import create_tamil_nadu_map, display_map, MAJOR_CITIES, generate_routes
+from utils import create_tamil_nadu_map, display_map, map_view, MAJOR_CITIES
+from map_layers import get_point_layer
+from map_tiles import get_tile_layer
+from route_geometry import RouteLine
+from paged_list import paged_list
+from charger_state import get_charger_state_store
+from road_network import get_road_network
+from ev_routing import plan_ev_route
+from charging_curve import VEHICLE_PROFILES, get_charging_curve
+from charger_queue import predict_wait_minutes
+from charger_reservations import NO_SHOW_GRACE_MINUTES, get_reservation_store
 
 def load_charging_stations():
     try:
@@ -16,27 +25,236 @@ def load_charging_stations():
     except (FileNotFoundError, json.JSONDecodeError):
         return []
 
-def update_station_availability(stations):
-    """Simulate changes in charging station availability for demo purposes"""
-    current_time = datetime.now()
+def reserve_charger(charger_state, station, start, duration_minutes, charger_type="Any"):
+    """Book the first free port of the requested type at a station and report the result"""
+    user = st.session_state.get("user") or {}
+    reservation = get_reservation_store().book(
+        station["id"],
+        charger_state.get_ports(station["id"]),
+        start,
+        duration_minutes,
+        charger_type=charger_type,
+        user=user.get("uid")
+    )
     
-    for station in stations:
-        # Randomly update available ports
-        change = random.randint(-1, 1)
-        new_available = station["available_ports"] + change
-        
-        # Ensure available ports is within bounds
-        station["available_ports"] = max(0, min(station["total_ports"], new_available))
-        
-        # Update status based on availability
-        if station["available_ports"] == 0:
-            station["status"] = "Fully Occupied"
-        elif station["available_ports"] < 0.3 * station["total_ports"]:
-            station["status"] = "Limited Availability"
-        else:
-            station["status"] = "Operational"
+    if reservation is None:
+        st.error(f"No {'' if charger_type == 'Any' else charger_type + ' '}ports are free at {station['name']} for that time.")
+    else:
+        st.session_state.setdefault("reservations", []).append(reservation["id"])
+        st.success(
+            f"Port {reservation['connector_id']} reserved at {station['name']} from "
+            f"{reservation['start'].strftime('%H:%M')} to {reservation['end'].strftime('%H:%M')}. "
+            f"Confirmation code: {reservation['id']}"
+        )
+    return reservation
+
+def show_my_reservations(stations_by_id):
+    """This session's reservations, with a check-in button so arrivals aren't released as no-shows"""
+    store = get_reservation_store()
+    store.release_expired()
+    # Finished reservations are dropped from the store, and from the list with them
+    reservations = [store.get(reservation_id) for reservation_id in st.session_state.get("reservations", [])]
+    reservations = [reservation for reservation in reservations if reservation is not None]
+    st.session_state["reservations"] = [reservation["id"] for reservation in reservations]
+    if not reservations:
+        return
     
-    return stations
+    st.subheader("My Reservations")
+    for reservation in reservations:
+        station = stations_by_id.get(reservation["station_id"], {})
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            st.markdown(
+                f"**{reservation['id']}** - {station.get('name', reservation['station_id'])}, port {reservation['connector_id']}, "
+                f"{reservation['start'].strftime('%d %b %H:%M')} to {reservation['end'].strftime('%H:%M')} - {reservation['status']}"
+            )
+            if reservation["status"] == "Booked":
+                st.caption(f"Check in within {NO_SHOW_GRACE_MINUTES} minutes of the start time or the port is released.")
+        
+        with col2:
+            if store.can_check_in(reservation) and st.button("Check In", key=f"check_in_{reservation['id']}"):
+                store.check_in(reservation["id"])
+                st.rerun()
+
+def station_style(station):
+    # Determine marker color based on availability
+    if station["available_ports"] == 0:
+        color = "red"
+    elif station["available_ports"] < station["total_ports"] / 2:
+        color = "orange"
+    else:
+        color = "green"
+    return {"color": color, "icon": "plug"}
+
+def station_tile_points():
+    """Every station as a (lat, lng, color) point for the statewide tiles, with live availability"""
+    stations = load_charging_stations()
+    stations = get_charger_state_store(stations).apply_to_stations(stations)
+    return [(s["coordinates"][0], s["coordinates"][1], station_style(s)["color"]) for s in stations]
+
+def station_popup(station):
+    return f"""
+    <div style="width:250px">
+        <h4>{station["name"]}</h4>
+        <p><b>Operator:</b> {station["operator"]}</p>
+        <p><b>Availability:</b> {station["available_ports"]}/{station["total_ports"]} ports</p>
+        <p><b>Charger Types:</b> {', '.join(station["charger_types"])}</p>
+        <p><b>Power Levels:</b> {', '.join(station["power_levels"])}</p>
+        <p><b>Hours:</b> {station["operating_hours"]}</p>
+        <p><b>Payment:</b> {', '.join(station["payment_methods"])}</p>
+        <p><b>Amenities:</b> {', '.join(station["amenities"])}</p>
+        <p><b>Address:</b> {station["address"]}</p>
+    </div>
+    """
+
+def show_ev_route_plan(plan, start_location, end_location, charger_state, preferred_charger="Any"):
+    """Render the map, stop list and battery chart for a planned EV route"""
+    charging_stations_on_route = plan["stops"]
+    num_charging_stops = len(charging_stations_on_route)
+    
+    # Display route map
+    m = create_tamil_nadu_map()
+    
+    # Add markers for start and end
+    folium.Marker(
+        location=MAJOR_CITIES[start_location],
+        popup=start_location,
+        tooltip=f"Start: {start_location}",
+        icon=folium.Icon(color="green", icon="play", prefix="fa")
+    ).add_to(m)
+    
+    folium.Marker(
+        location=MAJOR_CITIES[end_location],
+        popup=end_location,
+        tooltip=f"End: {end_location}",
+        icon=folium.Icon(color="red", icon="stop", prefix="fa")
+    ).add_to(m)
+    
+    # Add polyline following the planned road path
+    RouteLine(
+        encoded=plan["polyline"],
+        color="blue",
+        weight=5,
+        opacity=0.7
+    ).add_to(m)
+    
+    # Add charging station markers
+    for i, stop in enumerate(charging_stations_on_route):
+        station = stop["station"]
+        
+        # Create popup
+        popup_html = f"""
+        <div style="width:250px">
+            <h4>{station["name"]} (Stop {i+1})</h4>
+            <p><b>Distance from start:</b> {round(stop["distance_from_start"], 1)} km</p>
+            <p><b>Charge:</b> {round(stop["arrival_soc"] * 100)}% to {round(stop["departure_soc"] * 100)}%</p>
+            <p><b>Estimated charging time:</b> {round(stop["charging_time"])} minutes</p>
+            <p><b>Operator:</b> {station["operator"]}</p>
+            <p><b>Charger Types:</b> {', '.join(station["charger_types"])}</p>
+            <p><b>Amenities:</b> {', '.join(station["amenities"])}</p>
+        </div>
+        """
+        
+        # Add marker
+        folium.Marker(
+            location=station["coordinates"],
+            popup=folium.Popup(popup_html, max_width=300),
+            tooltip=f"Charging Stop {i+1}: {station['name']}",
+            icon=folium.Icon(color="blue", icon="plug", prefix="fa")
+        ).add_to(m)
+    
+    # Display map
+    display_map(m)
+    
+    # Display route summary
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Total Distance", f"{round(plan['distance_km'], 1)} km")
+    
+    with col2:
+        st.metric("Estimated Time", f"{round(plan['total_minutes'])} min",
+                  f"{round(plan['charge_minutes'] + plan['wait_minutes'])} min charging", delta_color="off")
+    
+    with col3:
+        st.metric("Charging Stops", str(num_charging_stops))
+    
+    # Display charging stops details
+    if charging_stations_on_route:
+        st.subheader("Charging Stops")
+        
+        for i, stop in enumerate(charging_stations_on_route):
+            station = stop["station"]
+            
+            with st.expander(f"Stop {i+1}: {station['name']} (at {round(stop['distance_from_start'], 1)} km)"):
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    st.markdown(f"**Charge:** {round(stop['arrival_soc'] * 100)}% → {round(stop['departure_soc'] * 100)}%")
+                    st.markdown(f"**Charging Time:** {round(stop['charging_time'])} minutes at {stop['power_kw']:g} kW")
+                    st.markdown(f"**Expected Wait:** {round(stop['wait_time'])} minutes")
+                    st.markdown(f"**Operator:** {station['operator']}")
+                    st.markdown(f"**Charger Types:** {', '.join(station['charger_types'])}")
+                
+                with col2:
+                    st.markdown(f"**Power Levels:** {', '.join(station['power_levels'])}")
+                    st.markdown(f"**Payment Methods:** {', '.join(station['payment_methods'])}")
+                    st.markdown(f"**Amenities:** {', '.join(station['amenities'])}")
+                    
+                    # Reserve button
+                    if st.button("Reserve Charger", key=f"reserve_route_{station['id']}"):
+                        # Hold the port from the planned arrival until charging should be done
+                        arrival = plan["planned_at"] + timedelta(minutes=stop["arrival_minutes"])
+                        reserve_charger(charger_state, station, arrival,
+                                        stop["wait_time"] + stop["charging_time"], preferred_charger)
+    
+    # Battery status visualization
+    st.subheader("Battery Status During Journey")
+    
+    # Battery level at the start, at each stop and on arrival
+    battery_df = pd.DataFrame([
+        {
+            "Distance": round(point["distance"], 1),
+            "Location": end_location if point["location"] == "Destination" else (
+                start_location if point["location"] == "Start" else point["location"]),
+            "Battery": round(point["soc"], 1)
+        }
+        for point in plan["soc_profile"]
+    ])
+    
+    # Create chart
+    fig = px.line(
+        battery_df,
+        x="Distance",
+        y="Battery",
+        markers=True,
+        labels={"Battery": "Battery Charge (%)", "Distance": "Distance (km)"},
+        hover_data=["Location"]
+    )
+    
+    fig.update_layout(
+        height=300,
+        margin=dict(l=10, r=10, t=30, b=10),
+        hovermode="x"
+    )
+    
+    # Add danger threshold line
+    fig.add_shape(
+        type="line",
+        x0=0,
+        y0=20,
+        x1=plan["distance_km"],
+        y1=20,
+        line=dict(color="red", dash="dash"),
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Save route button
+    if st.button("Save Route"):
+        st.success("Route saved successfully. You can access it from your saved routes.")
+
 
 def main():
     st.title("⚡ EV Charging Stations")
@@ -47,9 +265,13 @@ def main():
     and plan your charging stops efficiently.
     """)
     
-    # Load and update charging station data
+    # Load charging station data and merge in live port availability
     charging_stations = load_charging_stations()
-    charging_stations = update_station_availability(charging_stations)
+    charger_state = get_charger_state_store(charging_stations)
+    charging_stations = charger_state.apply_to_stations(charging_stations)
+    
+    # Reservations made from either tab, checked in here on arrival
+    show_my_reservations({station["id"]: station for station in charging_stations})
     
     # Main navigation tabs
     tab1, tab2, tab3 = st.tabs(["Find Stations", "Route Planner", "Charging Tips"])
@@ -112,49 +334,41 @@ def main():
             map_center = [11.1271, 78.6569]  # Center of Tamil Nadu
             zoom = 7
         
-        m = folium.Map(location=map_center, zoom_start=zoom, tiles="OpenStreetMap")
-        
-        # Add station markers
-        for station in filtered_stations:
-            # Determine marker color based on availability
-            if station["available_ports"] == 0:
-                color = "red"
-            elif station["available_ports"] < station["total_ports"] / 2:
-                color = "orange"
-            else:
-                color = "green"
-            
-            # Create popup content
-            popup_html = f"""
-            <div style="width:250px">
-                <h4>{station["name"]}</h4>
-                <p><b>Operator:</b> {station["operator"]}</p>
-                <p><b>Availability:</b> {station["available_ports"]}/{station["total_ports"]} ports</p>
-                <p><b>Charger Types:</b> {', '.join(station["charger_types"])}</p>
-                <p><b>Power Levels:</b> {', '.join(station["power_levels"])}</p>
-                <p><b>Hours:</b> {station["operating_hours"]}</p>
-                <p><b>Payment:</b> {', '.join(station["payment_methods"])}</p>
-                <p><b>Amenities:</b> {', '.join(station["amenities"])}</p>
-                <p><b>Address:</b> {station["address"]}</p>
-            </div>
-            """
-            
-            # Add marker
-            folium.Marker(
-                location=station["coordinates"],
-                popup=folium.Popup(popup_html, max_width=300),
-                tooltip=f"{station['name']} ({station['available_ports']}/{station['total_ports']} available)",
-                icon=folium.Icon(color=color, icon="plug", prefix="fa")
-            ).add_to(m)
+        m = create_tamil_nadu_map(center=map_center, zoom=zoom, cities=False)
+        
+        # Add station markers, clustered and limited to the current view
+        map_key = f"ev_station_map_{selected_location}"
+        get_point_layer(map_key, filtered_stations).add_to(
+            m,
+            filtered_stations,
+            view=map_view(map_key),
+            tooltip=lambda station: f"{station['name']} ({station['available_ports']}/{station['total_ports']} available)",
+            style=station_style,
+            popup=station_popup,
+            label="stations",
+            # Unfiltered statewide views are drawn from pre-rendered tiles
+            tiles=get_tile_layer("ev_stations", station_tile_points) if len(filtered_stations) == len(charging_stations) else None
+        )
         
         # Display the map
-        display_map(m)
+        display_map(m, key=map_key)
         
         # List view
         st.subheader("Charging Station List")
         
         if filtered_stations:
-            for station in filtered_stations:
+            page = paged_list(
+                filtered_stations,
+                "ev_station_list",
+                sort_options={
+                    "Most available ports": (lambda s: s["available_ports"], True),
+                    "Name": (lambda s: s["name"], False),
+                    "Location": (lambda s: s["location"], False)
+                },
+                search_fields=("name", "location", "operator", "address"),
+                label="stations"
+            )
+            for station in page:
                 # Determine status color
                 if station["available_ports"] == 0:
                     status_color = "red"
@@ -186,7 +400,8 @@ def main():
                         # Reserve button
                         if station["available_ports"] > 0:
                             if st.button("Reserve Port", key=f"reserve_{station['id']}"):
-                                st.success(f"Charging port reserved at {station['name']}. You have 30 minutes to arrive.")
+                                reserve_charger(charger_state, station, datetime.now(), 30,
+                                                "Any" if selected_charger_type == "All" else selected_charger_type)
                         else:
                             st.error("No ports available for reservation at this station.")
         else:
@@ -217,7 +432,7 @@ def main():
                 key="ev_end"
             )
         
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             vehicle_range = st.number_input(
@@ -243,6 +458,16 @@ def main():
                 options=["Any", "Type 2 AC", "CCS DC", "CHAdeMO"]
             )
         
+        with col4:
+            route_battery_kwh = st.number_input(
+                "Battery Capacity (kWh)",
+                min_value=20,
+                max_value=150,
+                value=60,
+                step=5,
+                key="ev_route_battery"
+            )
+        
         if st.button("Plan Route"):
             if start_location == end_location:
                 st.error("Starting point and destination cannot be the same.")
@@ -250,254 +475,31 @@ def main():
                 # Calculate route details
                 st.subheader("Route Overview")
                 
-                # Get routes
-                routes = generate_routes(start_location, end_location)
-                
-                # Select best route for EV
-                selected_route = routes[0]  # In a real app, would select best route for EV
-                
-                # Display route map
-                m = create_tamil_nadu_map()
-                
-                # Add markers for start and end
-                folium.Marker(
-                    location=MAJOR_CITIES[start_location],
-                    popup=start_location,
-                    tooltip=f"Start: {start_location}",
-                    icon=folium.Icon(color="green", icon="play", prefix="fa")
-                ).add_to(m)
-                
-                folium.Marker(
-                    location=MAJOR_CITIES[end_location],
-                    popup=end_location,
-                    tooltip=f"End: {end_location}",
-                    icon=folium.Icon(color="red", icon="stop", prefix="fa")
-                ).add_to(m)
-                
-                # Calculate charge requirements
-                total_distance = selected_route["distance"]
-                range_at_current_charge = vehicle_range * (current_charge / 100)
-                
-                # Determine if charging stops are needed
-                num_charging_stops = 0
-                remaining_range = range_at_current_charge
-                
-                charging_stations_on_route = []
-                
-                while remaining_range < total_distance:
-                    # Find an appropriate charging station
-                    # In a real app, would use actual locations along route
-                    # For demo, just pick random stations
-                    
-                    # Filter stations based on preferred charger
-                    available_stations = [
-                        station for station in charging_stations 
-                        if station["available_ports"] > 0 and
-                        (preferred_charger == "Any" or preferred_charger in station["charger_types"])
-                    ]
-                    
-                    if available_stations:
-                        selected_station = random.choice(available_stations)
-                        
-                        # Calculate distance covered before this stop (simplified)
-                        distance_covered = remaining_range * 0.8  # Leave 20% buffer
-                        
-                        # Calculate progress along route (0-1)
-                        progress = min(1.0, distance_covered / total_distance)
-                        
-                        # Interpolate position along route
-                        start_coords = MAJOR_CITIES[start_location]
-                        end_coords = MAJOR_CITIES[end_location]
-                        
-                        station_lat = start_coords[0] + progress * (end_coords[0] - start_coords[0])
-                        station_lng = start_coords[1] + progress * (end_coords[1] - start_coords[1])
-                        
-                        # Override station coordinates for demo purposes
-                        selected_station["interpolated_coords"] = [station_lat, station_lng]
-                        
-                        # Track this station
-                        charging_stations_on_route.append({
-                            "station": selected_station,
-                            "distance_from_start": distance_covered,
-                            "charge_needed": 90 - (current_charge - (distance_covered / vehicle_range * 100)),
-                            "charging_time": random.randint(20, 45)  # minutes
-                        })
-                        
-                        # Update remaining range
-                        remaining_range = vehicle_range - (total_distance - distance_covered)
-                        
-                        num_charging_stops += 1
-                    else:
-                        st.warning("Not enough charging stations available for this route. Consider a different vehicle or charger type.")
-                        break
-                
-                # Add route line
-                route_coords = [MAJOR_CITIES[start_location]]
-                
-                # Add charging stops to route
-                for stop in charging_stations_on_route:
-                    route_coords.append(stop["station"]["interpolated_coords"])
-                
-                route_coords.append(MAJOR_CITIES[end_location])
-                
-                # Add polyline
-                folium.PolyLine(
-                    locations=route_coords,
-                    color=selected_route["color"],
-                    weight=5,
-                    opacity=0.7
-                ).add_to(m)
-                
-                # Add charging station markers
-                for i, stop in enumerate(charging_stations_on_route):
-                    station = stop["station"]
-                    
-                    # Create popup
-                    popup_html = f"""
-                    <div style="width:250px">
-                        <h4>{station["name"]} (Stop {i+1})</h4>
-                        <p><b>Distance from start:</b> {round(stop["distance_from_start"], 1)} km</p>
-                        <p><b>Charge needed:</b> {round(stop["charge_needed"])}%</p>
-                        <p><b>Estimated charging time:</b> {stop["charging_time"]} minutes</p>
-                        <p><b>Operator:</b> {station["operator"]}</p>
-                        <p><b>Charger Types:</b> {', '.join(station["charger_types"])}</p>
-                        <p><b>Amenities:</b> {', '.join(station["amenities"])}</p>
-                    </div>
-                    """
-                    
-                    # Add marker
-                    folium.Marker(
-                        location=station["interpolated_coords"],
-                        popup=folium.Popup(popup_html, max_width=300),
-                        tooltip=f"Charging Stop {i+1}: {station['name']}",
-                        icon=folium.Icon(color="blue", icon="plug", prefix="fa")
-                    ).add_to(m)
-                
-                # Display map
-                display_map(m)
-                
-                # Display route summary
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.metric("Total Distance", f"{selected_route['distance']} km")
-                
-                with col2:
-                    st.metric("Estimated Time", f"{selected_route['time']} min")
-                
-                with col3:
-                    st.metric("Charging Stops", str(num_charging_stops))
-                
-                # Display charging stops details
-                if charging_stations_on_route:
-                    st.subheader("Charging Stops")
-                    
-                    for i, stop in enumerate(charging_stations_on_route):
-                        station = stop["station"]
-                        
-                        with st.expander(f"Stop {i+1}: {station['name']} (at {round(stop['distance_from_start'], 1)} km)"):
-                            col1, col2 = st.columns(2)
-                            
-                            with col1:
-                                st.markdown(f"**Charge Needed:** {round(stop['charge_needed'])}%")
-                                st.markdown(f"**Charging Time:** {stop['charging_time']} minutes")
-                                st.markdown(f"**Operator:** {station['operator']}")
-                                st.markdown(f"**Charger Types:** {', '.join(station['charger_types'])}")
-                            
-                            with col2:
-                                st.markdown(f"**Power Levels:** {', '.join(station['power_levels'])}")
-                                st.markdown(f"**Payment Methods:** {', '.join(station['payment_methods'])}")
-                                st.markdown(f"**Amenities:** {', '.join(station['amenities'])}")
-                                
-                                # Reserve button
-                                if st.button("Reserve Charger", key=f"reserve_route_{station['id']}"):
-                                    st.success(f"Charger reserved at {station['name']}. You will receive a confirmation code.")
-                
-                # Battery status visualization
-                st.subheader("Battery Status During Journey")
-                
-                # Generate battery level data points
-                battery_data = []
-                
-                # Starting point
-                battery_data.append({
-                    "Distance": 0,
-                    "Location": start_location,
-                    "Battery": current_charge
-                })
-                
-                remaining_charge = current_charge
-                current_distance = 0
-                
-                # Add data for each segment
-                for i, stop in enumerate(charging_stations_on_route):
-                    # Calculate battery drain
-                    segment_distance = stop["distance_from_start"] - current_distance
-                    charge_used = (segment_distance / vehicle_range) * 100
-                    remaining_charge -= charge_used
-                    
-                    # Add data point before charging
-                    battery_data.append({
-                        "Distance": stop["distance_from_start"],
-                        "Location": f"Arriving at Stop {i+1}",
-                        "Battery": max(0, remaining_charge)
-                    })
-                    
-                    # Add data point after charging
-                    remaining_charge = 90  # Assume charging to 90%
-                    current_distance = stop["distance_from_start"]
-                    
-                    battery_data.append({
-                        "Distance": stop["distance_from_start"],
-                        "Location": f"Leaving Stop {i+1}",
-                        "Battery": remaining_charge
-                    })
-                
-                # Add end point
-                final_segment_distance = selected_route["distance"] - current_distance
-                final_charge_used = (final_segment_distance / vehicle_range) * 100
-                remaining_charge -= final_charge_used
-                
-                battery_data.append({
-                    "Distance": selected_route["distance"],
-                    "Location": end_location,
-                    "Battery": max(0, remaining_charge)
-                })
-                
-                # Create DataFrame
-                battery_df = pd.DataFrame(battery_data)
-                
-                # Create chart
-                fig = px.line(
-                    battery_df,
-                    x="Distance",
-                    y="Battery",
-                    markers=True,
-                    labels={"Battery": "Battery Charge (%)", "Distance": "Distance (km)"},
-                    hover_data=["Location"]
-                )
-                
-                fig.update_layout(
-                    height=300,
-                    margin=dict(l=10, r=10, t=30, b=10),
-                    hovermode="x"
-                )
-                
-                # Add danger threshold line
-                fig.add_shape(
-                    type="line",
-                    x0=0,
-                    y0=20,
-                    x1=selected_route["distance"],
-                    y1=20,
-                    line=dict(color="red", dash="dash"),
+                # Search the road network for the fastest plan including charging stops
+                road_network = get_road_network(charging_stations)
+                plan = plan_ev_route(
+                    road_network,
+                    charging_stations,
+                    start_location,
+                    end_location,
+                    vehicle_range,
+                    current_charge,
+                    battery_kwh=route_battery_kwh,
+                    preferred_charger=preferred_charger,
+                    wait_time_fn=lambda stations, etas: predict_wait_minutes(stations, etas, store=charger_state)
                 )
                 
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Save route button
-                if st.button("Save Route"):
-                    st.success("Route saved successfully. You can access it from your saved routes.")
+                if not plan["found"]:
+                    st.session_state.pop("ev_route_plan", None)
+                    st.warning("No feasible route found with the available charging stations. Consider a different vehicle or charger type.")
+                else:
+                    # Keep the plan across reruns so its Reserve Charger buttons keep working
+                    plan["planned_at"] = datetime.now()
+                    st.session_state.ev_route_plan = (plan, start_location, end_location, preferred_charger)
+        
+        if "ev_route_plan" in st.session_state:
+            plan, plan_start, plan_end, plan_charger = st.session_state.ev_route_plan
+            show_ev_route_plan(plan, plan_start, plan_end, charger_state, plan_charger)
     
     with tab3:
         st.header("EV Charging Tips")
@@ -533,17 +535,38 @@ def main():
         # Charging time calculator
         st.subheader("Charging Time Calculator")
         
-        col1, col2, col3 = st.columns(3)
+        col1, col2 = st.columns(2)
         
         with col1:
-            battery_capacity = st.number_input(
-                "Battery Capacity (kWh)",
-                min_value=20,
-                max_value=150,
-                value=60,
+            vehicle_model = st.selectbox(
+                "Vehicle",
+                options=["Custom"] + list(VEHICLE_PROFILES.keys())
+            )
+        
+        with col2:
+            ambient_temperature = st.slider(
+                "Ambient Temperature (°C)",
+                min_value=-10,
+                max_value=45,
+                value=30,
                 step=5
             )
         
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            if vehicle_model == "Custom":
+                battery_capacity = st.number_input(
+                    "Battery Capacity (kWh)",
+                    min_value=20,
+                    max_value=150,
+                    value=60,
+                    step=5
+                )
+            else:
+                battery_capacity = VEHICLE_PROFILES[vehicle_model]["battery_kwh"]
+                st.metric("Battery Capacity", f"{battery_capacity} kWh")
+        
         with col2:
             start_soc = st.slider(
                 "Starting Charge (%)",
@@ -570,28 +593,25 @@ def main():
         # Extract power value
         power_kw = float(charger_power.split(" ")[0])
         
-        # Calculate charging time
-        energy_required = battery_capacity * (target_soc - start_soc) / 100
-        charging_time_hours = energy_required / power_kw
-        
-        # Account for charging inefficiency and tapering
-        if power_kw >= 50:  # DC fast charging
-            # Fast charging slows down above 80%
-            if target_soc > 80 and start_soc < 80:
-                energy_to_80 = battery_capacity * (80 - start_soc) / 100
-                energy_above_80 = battery_capacity * (target_soc - 80) / 100
-                
-                time_to_80 = energy_to_80 / power_kw
-                time_above_80 = energy_above_80 / (power_kw * 0.5)  # 50% slower above 80%
-                
-                charging_time_hours = time_to_80 + time_above_80
-            
-            efficiency = 0.85  # 85% efficiency for DC fast charging
-        else:
-            efficiency = 0.9  # 90% efficiency for AC charging
+        # Charging curve for the selected vehicle, evaluated for every charger tier at once
+        charging_curve = get_charging_curve(battery_capacity, vehicle_model)
+        
+        charger_types = [
+            "3.3 kW (Home)",
+            "7.4 kW (AC)",
+            "22 kW (Fast AC)",
+            "50 kW (DC Fast)",
+            "150 kW (Ultrafast DC)"
+        ]
+        
+        powers = [3.3, 7.4, 22, 50, 150]
+        
+        tier_minutes = charging_curve.charge_minutes(
+            powers, start_soc / 100, [target_soc / 100], ambient_temperature
+        )[:, 0]
         
-        # Adjust for efficiency
-        charging_time_hours = charging_time_hours / efficiency
+        energy_required = battery_capacity * (target_soc - start_soc) / 100
+        charging_time_hours = tier_minutes[powers.index(power_kw)] / 60
         
         # Convert to hours and minutes
         hours = int(charging_time_hours)
@@ -616,39 +636,11 @@ def main():
         st.subheader("Charging Speed Comparison")
         
         # Create comparison data
-        charger_types = [
-            "3.3 kW (Home)",
-            "7.4 kW (AC)",
-            "22 kW (Fast AC)",
-            "50 kW (DC Fast)",
-            "150 kW (Ultrafast DC)"
-        ]
-        
-        powers = [3.3, 7.4, 22, 50, 150]
-        
         comparison_data = []
         
-        for type_name, power in zip(charger_types, powers):
-            # Calculate time
-            basic_time = energy_required / power
-            
-            # Apply efficiency and tapering
-            if power >= 50:
-                if target_soc > 80 and start_soc < 80:
-                    energy_to_80 = battery_capacity * (80 - start_soc) / 100
-                    energy_above_80 = battery_capacity * (target_soc - 80) / 100
-                    
-                    time_to_80 = energy_to_80 / power
-                    time_above_80 = energy_above_80 / (power * 0.5)
-                    
-                    adjusted_time = (time_to_80 + time_above_80) / 0.85
-                else:
-                    adjusted_time = basic_time / 0.85
-            else:
-                adjusted_time = basic_time / 0.9
-            
+        for type_name, power, time_minutes in zip(charger_types, powers, tier_minutes):
             # Convert to minutes for easier comparison
-            time_minutes = round(adjusted_time * 60)
+            time_minutes = max(1, round(time_minutes))
             
             # Range added per minute
             range_per_minute = round(vehicle_range * (target_soc - start_soc) / 100 / time_minutes, 1)
@@ -657,7 +649,7 @@ def main():
                 "Charger Type": type_name,
                 "Time (Minutes)": time_minutes,
                 "Range Added Per Minute (km)": range_per_minute,
-                "Is Selected": type_name.startswith(str(power_kw))
+                "Is Selected": power == power_kw
             })
         
         # Create DataFrame
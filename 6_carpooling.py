@@ -8,6 +8,12 @@ from datetime import datetime, timedelta
 import plotly.express as px
 
 from utils import create_tamil_nadu_map, display_map, MAJOR_CITIES, generate_id
+from route_geometry import RouteLine
+from paged_list import paged_list
+from carpool_matching import clock_minutes, get_carpool_matcher
+from carpool_bookings import get_seat_inventory
+from carpool_dispatch import get_ride_dispatcher, get_ride_request_queue
+from owner_index import get_owner_index
 
 def load_carpool_data():
     try:
@@ -20,20 +26,6 @@ def save_carpool_data(data):
     from utils import save_json_data
     save_json_data(data, "carpools.json")
 
-def filter_carpools(carpools, start=None, end=None, date=None):
-    filtered = carpools
-    
-    if start and start != "Any":
-        filtered = [c for c in filtered if c["start_point"] == start]
-    
-    if end and end != "Any":
-        filtered = [c for c in filtered if c["end_point"] == end]
-    
-    if date:
-        filtered = [c for c in filtered if c["date"] == date.strftime("%Y-%m-%d")]
-    
-    return filtered
-
 def main():
     st.title("🚗 Carpooling Community")
     
@@ -43,8 +35,20 @@ def main():
     Find rides or offer your own to connect with fellow travelers.
     """)
     
-    # Load carpool data
+    # Load carpool data, bring seat counts up to date with bookings, and index rides
     carpools = load_carpool_data()
+    inventory = get_seat_inventory()
+    inventory.apply_to_rides(carpools)
+    matcher = get_carpool_matcher(carpools)
+    
+    # The signed-in user's own rides are looked up by user id
+    user = st.session_state.get("user") or {}
+    user_id = user.get("uid", "guest")
+    offered_rides = get_owner_index("carpools")
+    
+    # Ride requests are matched to offers in background batches
+    ride_requests = get_ride_request_queue()
+    get_ride_dispatcher(inventory, lambda: inventory.apply_to_rides(load_carpool_data()))
     
     # Main navigation tabs
     tab1, tab2, tab3 = st.tabs(["Find a Ride", "Offer a Ride", "My Rides"])
@@ -55,29 +59,43 @@ def main():
         # Search form
         col1, col2, col3 = st.columns(3)
         
+        # Riders can board or leave at any city a ride passes, or near one
+        ride_cities = sorted(set(matcher.cities()) | set(MAJOR_CITIES.keys()))
+        
         with col1:
-            start_points = ["Any"] + sorted(list(set(c["start_point"] for c in carpools)))
-            start_point = st.selectbox("From", options=start_points)
+            start_point = st.selectbox("From", options=["Any"] + ride_cities)
         
         with col2:
-            end_points = ["Any"] + sorted(list(set(c["end_point"] for c in carpools)))
-            end_point = st.selectbox("To", options=end_points)
+            end_point = st.selectbox("To", options=["Any"] + ride_cities)
         
         with col3:
             travel_date = st.date_input("Date", value=datetime.now().date())
         
-        # Filter carpools
-        filtered_carpools = filter_carpools(carpools, start_point, end_point, travel_date)
+        # Match rides passing through (or near) both cities, best first
+        matches = matcher.match(start_point, end_point, travel_date)
+        filtered_carpools = [match["ride"] for match in matches]
         
         # Display results
         if filtered_carpools:
             st.subheader(f"Available Rides ({len(filtered_carpools)})")
             
+            # One page of rides, drawn on the map and listed below it
+            page = paged_list(
+                matches,
+                "ride_list",
+                sort_options={
+                    "Best match": None,
+                    "Departure time": (lambda match: (match["ride"]["date"], clock_minutes(match["ride"]["time"])), False),
+                    "Lowest price": (lambda match: match["ride"]["price_per_seat"], False)
+                },
+                label="rides"
+            )
+            
             # Map view
             m = create_tamil_nadu_map()
             
             # Add markers and routes for each carpool
-            for carpool in filtered_carpools:
+            for carpool in [match["ride"] for match in page]:
                 # Add markers for start and end
                 start_coords = MAJOR_CITIES.get(carpool["start_point"], [0, 0])
                 end_coords = MAJOR_CITIES.get(carpool["end_point"], [0, 0])
@@ -109,8 +127,8 @@ def main():
                 route_points.append(end_coords)
                 
                 # Add route line
-                folium.PolyLine(
-                    locations=route_points,
+                RouteLine(
+                    route_points,
                     color=random.choice(["blue", "green", "purple", "orange"]),
                     weight=3,
                     opacity=0.7,
@@ -121,8 +139,17 @@ def main():
             display_map(m)
             
             # List view
-            for carpool in filtered_carpools:
+            for match in page:
+                carpool = match["ride"]
                 with st.expander(f"{carpool['route']} - {carpool['time']}"):
+                    if match["detour_km"] > 0:
+                        meeting = []
+                        if start_point != "Any" and match["pickup"] is None:
+                            meeting.append(f"pick you up in {start_point}")
+                        if end_point != "Any" and match["dropoff"] is None:
+                            meeting.append(f"drop you in {end_point}")
+                        st.caption(f"The driver would detour about {round(match['detour_km'])} km to {' and '.join(meeting)}.")
+                    
                     col1, col2 = st.columns(2)
                     
                     with col1:
@@ -146,7 +173,19 @@ def main():
                     col1, col2 = st.columns([1, 2])
                     with col1:
                         if st.button("Book Seat", key=f"book_{carpool['id']}"):
-                            st.success(f"Booking request sent to {carpool['driver_name']}. You will receive confirmation shortly.")
+                            booking = inventory.book(
+                                carpool,
+                                user_id,
+                                user.get("displayName", "Guest"),
+                                pickup=None if start_point == "Any" else start_point,
+                                dropoff=None if end_point == "Any" else end_point
+                            )
+                            
+                            if booking:
+                                st.success(f"Seat booked with {carpool['driver_name']}. Booking ID: {booking['id']}. "
+                                           f"{inventory.seats_left(carpool)} seat(s) left on this ride.")
+                            else:
+                                st.error("Sorry, this ride has just been fully booked.")
                     
                     with col2:
                         if st.button("Message Driver", key=f"msg_{carpool['id']}"):
@@ -159,6 +198,53 @@ def main():
             if st.button("Offer a Ride Instead"):
                 st.switch_page("pages/6_carpooling.py")
                 # This doesn't actually work in Streamlit as is, but simulates the intent
+        
+        # Ride requests, matched to drivers automatically
+        st.markdown("#### Request a Ride")
+        st.markdown("Post your trip and we'll book you a seat on the best matching ride as soon as one is available.")
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            earliest_time = st.time_input("Leave after", value=datetime.strptime("07:00", "%H:%M").time(), key="request_earliest")
+        
+        with col2:
+            latest_time = st.time_input("Leave before", value=datetime.strptime("10:00", "%H:%M").time(), key="request_latest")
+        
+        with col3:
+            request_seats = st.number_input("Seats Needed", min_value=1, max_value=4, value=1, key="request_seats")
+        
+        if st.button("Post Ride Request"):
+            if start_point == "Any" or end_point == "Any":
+                st.error("Please choose both where you're leaving from and where you're going.")
+            elif start_point == end_point:
+                st.error("Starting point and destination cannot be the same.")
+            elif latest_time <= earliest_time:
+                st.error("The latest departure time must be after the earliest.")
+            else:
+                ride_requests.submit(
+                    user_id,
+                    user.get("displayName", "Guest"),
+                    start_point,
+                    end_point,
+                    travel_date,
+                    earliest_time,
+                    latest_time,
+                    request_seats
+                )
+                st.success("Ride request posted. You'll see it under My Booked Rides once a driver is matched.")
+        
+        my_requests = ride_requests.requests_for(user_id)
+        if my_requests:
+            st.markdown("**Your Ride Requests**")
+            for request in my_requests[-5:]:
+                status_color = {"Open": "orange", "Matched": "green"}.get(request["status"], "gray")
+                st.markdown(
+                    f"{request['pickup']} → {request['dropoff']} on {request['date']}, "
+                    f"{request['earliest_time']}–{request['latest_time']} - "
+                    f"<span style='color:{status_color};'>{request['status']}</span>",
+                    unsafe_allow_html=True
+                )
     
     with tab2:
         st.header("Offer a Ride")
@@ -240,7 +326,8 @@ def main():
                 # Create new carpool offer
                 new_carpool = {
                     "id": generate_id("carpool"),
-                    "driver_name": "Your Name",  # In a real app, would use user profile
+                    "driver_id": user_id,
+                    "driver_name": user.get("displayName", "Your Name"),
                     "driver_rating": 5.0,        # New drivers start with 5.0
                     "vehicle": vehicle_model,
                     "vehicle_number": vehicle_number.upper(),
@@ -261,6 +348,7 @@ def main():
                 
                 # Save updated data
                 save_carpool_data(carpools)
+                offered_rides.put(user_id, new_carpool)
                 
                 st.success("Your ride has been offered successfully!")
                 
@@ -330,8 +418,8 @@ def main():
                 route_points.append(end_coords)
                 
                 # Add route line
-                folium.PolyLine(
-                    locations=route_points,
+                RouteLine(
+                    route_points,
                     color="blue",
                     weight=3,
                     opacity=0.7
@@ -343,17 +431,13 @@ def main():
     with tab3:
         st.header("My Rides")
         
-        # In a real app, would filter by user ID
-        # For demo, just show all rides
-        
         # Create tabs for offered and booked rides
         ride_tab1, ride_tab2 = st.tabs(["My Offered Rides", "My Booked Rides"])
         
         with ride_tab1:
             st.subheader("Rides You've Offered")
             
-            # For demo, use first 2 carpools as examples
-            my_offers = carpools[:2]
+            my_offers = offered_rides.records(user_id)
             
             if my_offers:
                 for carpool in my_offers:
@@ -374,26 +458,13 @@ def main():
                             # Display booked passengers
                             st.markdown("**Passengers:**")
                             
-                            # Generate random passenger data for demo
-                            num_passengers = random.randint(1, carpool['seats_available'])
-                            passengers = []
-                            
-                            for i in range(num_passengers):
-                                passenger_name = f"Passenger {i+1}"
-                                passenger_rating = round(random.uniform(3.5, 5.0), 1)
-                                passenger_status = random.choice(["Confirmed", "Pending"])
-                                
-                                passengers.append({
-                                    "name": passenger_name,
-                                    "rating": passenger_rating,
-                                    "status": passenger_status
-                                })
+                            # Confirmed bookings on this ride
+                            passengers = inventory.passengers(carpool['id'])
                             
                             # Display passengers
                             if passengers:
                                 for passenger in passengers:
-                                    status_color = "green" if passenger["status"] == "Confirmed" else "orange"
-                                    st.markdown(f"{passenger['name']} ({passenger['rating']}⭐) - <span style='color:{status_color};'>{passenger['status']}</span>", unsafe_allow_html=True)
+                                    st.markdown(f"{passenger['passenger_name']} ({passenger['seats']} seat(s), {passenger['pickup']} → {passenger['dropoff']}) - <span style='color:green;'>{passenger['status']}</span>", unsafe_allow_html=True)
                             else:
                                 st.markdown("No passengers yet.")
                         
@@ -416,11 +487,18 @@ def main():
         with ride_tab2:
             st.subheader("Rides You've Booked")
             
-            # For demo, use next 2 carpools as examples
-            my_bookings = carpools[2:4] if len(carpools) > 3 else []
+            if st.session_state.pop("cancelled_booking", None):
+                st.success("Booking cancelled successfully.")
+            
+            # Confirmed bookings from the passenger index, with their rides looked up by id
+            my_bookings = [
+                (booking, matcher.rides[booking["ride_id"]])
+                for booking in inventory.bookings_for(user_id)
+                if booking["ride_id"] in matcher.rides
+            ]
             
             if my_bookings:
-                for carpool in my_bookings:
+                for booking, carpool in my_bookings:
                     with st.expander(f"{carpool['route']} - {carpool['date']}"):
                         col1, col2 = st.columns(2)
                         
@@ -435,26 +513,39 @@ def main():
                         with col2:
                             st.markdown(f"**Date:** {carpool['date']}")
                             st.markdown(f"**Time:** {carpool['time']}")
-                            st.markdown(f"**Price:** ₹{carpool['price_per_seat']}")
-                            st.markdown(f"**Status:** <span style='color:green;'>Confirmed</span>", unsafe_allow_html=True)
+                            st.markdown(f"**Seats:** {booking['seats']} ({booking['pickup']} → {booking['dropoff']})")
+                            st.markdown(f"**Price:** ₹{carpool['price_per_seat'] * booking['seats']}")
+                            st.markdown(f"**Status:** <span style='color:green;'>{booking['status']}</span>", unsafe_allow_html=True)
                             st.markdown(f"**Contact:** {carpool['phone']}")
                         
                         # Action buttons
                         col1, col2, col3 = st.columns(3)
                         
                         with col1:
-                            if st.button("Cancel Booking", key=f"cancel_booking_{carpool['id']}"):
+                            # The confirmation is kept in session state, since each click reruns the page
+                            confirm_key = f"confirm_booking_cancel_{booking['id']}"
+                            if st.session_state.get(confirm_key):
                                 st.warning("Are you sure you want to cancel this booking? Cancellation may be subject to a fee.")
                                 
-                                if st.button("Yes, Cancel", key=f"confirm_booking_cancel_{carpool['id']}"):
-                                    st.success("Booking cancelled successfully.")
+                                if st.button("Yes, Cancel", key=f"yes_{confirm_key}"):
+                                    del st.session_state[confirm_key]
+                                    if inventory.cancel(booking["id"]):
+                                        st.session_state["cancelled_booking"] = booking["id"]
+                                    st.rerun()
+                                
+                                if st.button("Keep Booking", key=f"keep_{confirm_key}"):
+                                    del st.session_state[confirm_key]
+                                    st.rerun()
+                            elif st.button("Cancel Booking", key=f"cancel_booking_{booking['id']}"):
+                                st.session_state[confirm_key] = True
+                                st.rerun()
                         
                         with col2:
-                            if st.button("Message Driver", key=f"msg_driver_{carpool['id']}"):
+                            if st.button("Message Driver", key=f"msg_driver_{booking['id']}"):
                                 st.info("Messaging feature will be available in the next update.")
                         
                         with col3:
-                            if st.button("Track Ride", key=f"track_{carpool['id']}"):
+                            if st.button("Track Ride", key=f"track_{booking['id']}"):
                                 st.info("Live tracking will be available on the day of the ride.")
             else:
                 st.info("You haven't booked any rides yet.")
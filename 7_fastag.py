@@ -1,13 +1,23 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
-import random
 from datetime import datetime, timedelta
 import plotly.express as px
 import folium
 from streamlit_folium import st_folium
 
-from utils import create_tamil_nadu_map, display_map, MAJOR_CITIES
+from utils import create_tamil_nadu_map, display_map, map_view, MAJOR_CITIES
+from map_layers import get_point_layer
+from map_tiles import get_tile_layer
+from road_network import get_road_network, city_node
+from toll_index import get_toll_index
+from toll_fees import VEHICLE_CLASSES, PAYMENT_MODES, RETURN_WITHIN_24H_FACTOR
+from fastag_ledger import get_fastag_ledger, TOLL, LOW_BALANCE_THRESHOLD, RUNWAY_ALERT_DAYS
+from toll_waits import get_wait_engine
+from route_geometry import RouteLine
+from lazy_charts import lazy_plotly_chart
+from paged_list import paged_list
 
 def load_fastag_data():
     try:
@@ -33,6 +43,57 @@ def load_toll_plazas():
     except (FileNotFoundError, json.JSONDecodeError):
         return []
 
+def format_wait(minutes):
+    return "Lane unavailable" if minutes is None else f"{minutes:.1f} min"
+
+def toll_plaza_popup(plaza, fastag_wait, cash_wait):
+    return f"""
+    <div style="width:250px">
+        <h4>{plaza["name"]}</h4>
+        <p><b>Location:</b> {plaza["location"]}</p>
+        <p><b>Nearest City:</b> {plaza["nearest_city"]} ({plaza["distance_from_city"]} km)</p>
+        <p><b>FASTag Lanes:</b> {plaza["fastag_lanes"]}</p>
+        <p><b>Cash Lanes:</b> {plaza["cash_lanes"]}</p>
+        <p><b>Current Wait Time:</b> {format_wait(fastag_wait)} (FASTag), {format_wait(cash_wait)} (Cash)</p>
+        <br>
+        <p><b>Fees:</b></p>
+        <ul>
+            <li>Car/Jeep/Van: ₹{plaza["fees"]["Car/Jeep/Van"]}</li>
+            <li>LCV: ₹{plaza["fees"]["LCV"]}</li>
+            <li>Bus/Truck: ₹{plaza["fees"]["Bus/Truck"]}</li>
+            <li>Heavy Vehicle: ₹{plaza["fees"]["Heavy Vehicle"]}</li>
+        </ul>
+    </div>
+    """
+
+def wait_comparison_figure(fastag_wait, cash_wait):
+    """Bar chart of FASTag and cash lane waits at a plaza; a lane type the plaza lacks is labelled unavailable"""
+    # Create data for comparison
+    comparison_data = pd.DataFrame({
+        "Payment Method": ["FASTag", "Cash"],
+        "Wait Time (minutes)": [wait or 0 for wait in (fastag_wait, cash_wait)],
+        "Label": [format_wait(wait) for wait in (fastag_wait, cash_wait)]
+    })
+    
+    # Create bar chart
+    fig = px.bar(
+        comparison_data,
+        x="Payment Method",
+        y="Wait Time (minutes)",
+        color="Payment Method",
+        color_discrete_map={"FASTag": "green", "Cash": "red"},
+        text="Label"
+    )
+    fig.update_traces(textposition="outside", cliponaxis=False)
+    
+    fig.update_layout(
+        height=250,
+        margin=dict(l=10, r=10, t=10, b=10),
+        showlegend=False
+    )
+    
+    return fig
+
 def show_toll_plazas():
     toll_plazas = load_toll_plazas()
     
@@ -42,49 +103,47 @@ def show_toll_plazas():
     
     st.subheader("Toll Plaza Map")
     
+    # Predicted lane waits, refreshed in the background for all plazas
+    wait_engine = get_wait_engine(toll_plazas)
+    
     # Create map
     m = create_tamil_nadu_map()
     
-    # Add toll plaza markers
-    for plaza in toll_plazas:
-        # Create popup content
-        popup_html = f"""
-        <div style="width:250px">
-            <h4>{plaza["name"]}</h4>
-            <p><b>Location:</b> {plaza["location"]}</p>
-            <p><b>Nearest City:</b> {plaza["nearest_city"]} ({plaza["distance_from_city"]} km)</p>
-            <p><b>FASTag Lanes:</b> {plaza["fastag_lanes"]}</p>
-            <p><b>Cash Lanes:</b> {plaza["cash_lanes"]}</p>
-            <p><b>Current Wait Time:</b> {plaza["current_waiting_time"]}</p>
-            <br>
-            <p><b>Fees:</b></p>
-            <ul>
-                <li>Car/Jeep/Van: ₹{plaza["fees"]["Car/Jeep/Van"]}</li>
-                <li>LCV: ₹{plaza["fees"]["LCV"]}</li>
-                <li>Bus/Truck: ₹{plaza["fees"]["Bus/Truck"]}</li>
-                <li>Heavy Vehicle: ₹{plaza["fees"]["Heavy Vehicle"]}</li>
-            </ul>
-        </div>
-        """
-        
-        # Add marker
-        folium.Marker(
-            location=plaza["coordinates"],
-            popup=folium.Popup(popup_html, max_width=300),
-            tooltip=plaza["name"],
-            icon=folium.Icon(color="blue", icon="road", prefix="fa")
-        ).add_to(m)
+    # Add toll plaza markers, clustered and limited to the current view
+    plaza_rows = {plaza.get("id", plaza["name"]): index for index, plaza in enumerate(toll_plazas)}
+    get_point_layer("toll_plaza_map", toll_plazas).add_to(
+        m,
+        toll_plazas,
+        view=map_view("toll_plaza_map"),
+        tooltip=lambda plaza: plaza["name"],
+        style=lambda plaza: {"color": "blue", "icon": "road"},
+        popup=lambda plaza: toll_plaza_popup(plaza, *wait_engine.waits(plaza_rows[plaza.get("id", plaza["name"])])),
+        label="toll plazas",
+        tiles=get_tile_layer("toll_plazas", lambda: [(p["coordinates"][0], p["coordinates"][1], "blue") for p in load_toll_plazas()])
+    )
     
     # Display map
-    display_map(m)
+    display_map(m, key="toll_plaza_map")
     
     # Toll plaza list
     st.subheader("Toll Plaza List")
     
-    # Sort by nearest city
-    toll_plazas.sort(key=lambda x: x["nearest_city"])
-    
-    for plaza in toll_plazas:
+    # One page at a time; each plaza's position in the full list keys its wait times
+    fastag_delays = wait_engine.plaza_delays()
+    page = paged_list(
+        toll_plazas,
+        "toll_plaza_list",
+        sort_options={
+            "Nearest city": (lambda plaza: plaza["nearest_city"], False),
+            "Shortest FASTag wait": (lambda plaza: fastag_delays[plaza_rows[plaza.get("id", plaza["name"])]], False),
+            "Name": (lambda plaza: plaza["name"], False)
+        },
+        search_fields=("name", "location", "nearest_city"),
+        label="toll plazas"
+    )
+    for plaza in page:
+        fastag_wait, cash_wait = wait_engine.waits(plaza_rows[plaza.get("id", plaza["name"])])
+        
         with st.expander(f"{plaza['name']} - {plaza['location']}"):
             col1, col2 = st.columns(2)
             
@@ -92,7 +151,7 @@ def show_toll_plazas():
                 st.markdown(f"**Nearest City:** {plaza['nearest_city']} ({plaza['distance_from_city']} km)")
                 st.markdown(f"**FASTag Lanes:** {plaza['fastag_lanes']}")
                 st.markdown(f"**Cash Lanes:** {plaza['cash_lanes']}")
-                st.markdown(f"**Current Wait Time:** {plaza['current_waiting_time']}")
+                st.markdown(f"**Current Wait Time:** {format_wait(fastag_wait)} (FASTag), {format_wait(cash_wait)} (Cash)")
                 st.markdown(f"**Status:** {plaza['status']}")
             
             with col2:
@@ -102,40 +161,20 @@ def show_toll_plazas():
                 st.markdown(f"- Bus/Truck: ₹{plaza['fees']['Bus/Truck']}")
                 st.markdown(f"- Heavy Vehicle: ₹{plaza['fees']['Heavy Vehicle']}")
             
-            # Show FASTag vs Cash comparison
+            # Show FASTag vs Cash comparison, built when the user asks for it
             st.markdown("**FASTag vs Cash Time Savings:**")
-            
-            # Generate random wait times for comparison
-            fastag_wait = int(plaza["current_waiting_time"].split(" ")[0])
-            cash_wait = fastag_wait * random.uniform(2.5, 4)  # Cash is 2.5-4x slower
-            
-            # Create data for comparison
-            comparison_data = pd.DataFrame({
-                "Payment Method": ["FASTag", "Cash"],
-                "Wait Time (minutes)": [fastag_wait, int(cash_wait)]
-            })
-            
-            # Create bar chart
-            fig = px.bar(
-                comparison_data,
-                x="Payment Method",
-                y="Wait Time (minutes)",
-                color="Payment Method",
-                color_discrete_map={"FASTag": "green", "Cash": "red"},
-                text="Wait Time (minutes)"
-            )
-            
-            fig.update_layout(
-                height=250,
-                margin=dict(l=10, r=10, t=10, b=10),
-                showlegend=False
+            waits = tuple(None if wait is None else round(wait, 1) for wait in (fastag_wait, cash_wait))
+            lazy_plotly_chart(
+                f"plaza_waits_{plaza.get('id', plaza['name'])}",
+                waits,
+                lambda: wait_comparison_figure(*waits),
+                label="Show wait comparison"
             )
-            
-            st.plotly_chart(fig, use_container_width=True)
 
 def show_fastag_balance():
     # Load FASTag data
     fastag_data = load_fastag_data()
+    ledger = get_fastag_ledger(fastag_data)
     
     user_data = fastag_data["user_data"]
     vehicles = user_data["vehicles"]
@@ -157,27 +196,34 @@ def show_fastag_balance():
     else:
         selected_vehicle = vehicles[0]
     
+    registration = selected_vehicle["registration"]
+    balance = ledger.balance(registration)
+    if balance is None:
+        balance = selected_vehicle["balance"]
+    last_recharge = ledger.last_recharge(registration)
+    last_transaction = ledger.last_transaction(registration)
+    
     # Display vehicle information and balance
     col1, col2, col3 = st.columns([2, 1, 1])
     
     with col1:
         st.metric(
             "FASTag Balance",
-            f"₹{selected_vehicle['balance']:.2f}",
+            f"₹{balance:.2f}",
             delta=None
         )
     
     with col2:
         st.metric(
             "Last Recharge",
-            f"₹{next((r['amount'] for r in fastag_data['recharge_history'] if r['vehicle_reg'] == selected_vehicle['registration']), 0):.2f}",
+            f"₹{last_recharge['amount'] if last_recharge else 0:.2f}",
             delta=None
         )
     
     with col3:
         st.metric(
             "Last Transaction",
-            f"₹{selected_vehicle['last_transaction']['amount']:.2f}",
+            f"₹{last_transaction['amount'] if last_transaction else 0:.2f}",
             delta=None
         )
     
@@ -194,12 +240,16 @@ def show_fastag_balance():
         with col2:
             st.markdown(f"**FASTag ID:** {selected_vehicle['fastag_id']}")
             st.markdown(f"**Bank:** {selected_vehicle['bank']}")
-            st.markdown(f"**Last Transaction Date:** {selected_vehicle['last_transaction']['date']}")
-            st.markdown(f"**Last Transaction Location:** {selected_vehicle['last_transaction']['location']}")
+            if last_transaction:
+                st.markdown(f"**Last Transaction Date:** {last_transaction['date']} {last_transaction['time']}")
+                if last_transaction["kind"] == "Toll":
+                    st.markdown(f"**Last Transaction Location:** {last_transaction['toll_plaza']}")
+                else:
+                    st.markdown(f"**Last Transaction:** Recharge via {last_transaction['payment_method']}")
     
     # Low balance warning
-    if selected_vehicle['balance'] < 200:
-        st.warning(f"⚠️ Low Balance Alert! Your FASTag balance is below ₹200. Please recharge to avoid inconvenience.")
+    if balance < LOW_BALANCE_THRESHOLD:
+        st.warning(f"⚠️ Low Balance Alert! Your FASTag balance is below ₹{LOW_BALANCE_THRESHOLD}. Please recharge to avoid inconvenience.")
     
     # Recharge section
     st.subheader("Recharge FASTag")
@@ -230,20 +280,32 @@ def show_fastag_balance():
     
     # Recharge button
     if st.button("Recharge Now"):
-        st.success(f"FASTag recharge of ₹{recharge_amount} successful! Your updated balance is ₹{selected_vehicle['balance'] + recharge_amount:.2f}")
+        entry = ledger.recharge(registration, recharge_amount, payment_method)
+        st.success(f"FASTag recharge of ₹{recharge_amount} successful! Your updated balance is ₹{entry['balance']:.2f}")
     
     # Recent transactions
     st.subheader("Recent Transactions")
     
-    # Filter transactions for selected vehicle
-    vehicle_transactions = [t for t in fastag_data["recent_transactions"] if t["vehicle_reg"] == selected_vehicle["registration"]]
+    page_size = 20
+    _, total_transactions = ledger.history(registration, page_size=page_size, kind=TOLL)
+    page = 0
+    if total_transactions > page_size:
+        page = st.number_input(
+            "Page",
+            min_value=1,
+            max_value=(total_transactions - 1) // page_size + 1,
+            value=1,
+            key="fastag_history_page"
+        ) - 1
+    vehicle_transactions, _ = ledger.history(registration, page=page, page_size=page_size, kind=TOLL)
     
     if vehicle_transactions:
         transactions_df = pd.DataFrame(vehicle_transactions)
-        transactions_df = transactions_df[["date", "time", "toll_plaza", "amount", "status"]]
-        transactions_df.columns = ["Date", "Time", "Toll Plaza", "Amount (₹)", "Status"]
+        transactions_df = transactions_df[["date", "time", "toll_plaza", "amount", "balance", "status"]]
+        transactions_df.columns = ["Date", "Time", "Toll Plaza", "Amount (₹)", "Balance (₹)", "Status"]
         
         st.dataframe(transactions_df, use_container_width=True)
+        st.caption(f"Showing {len(vehicle_transactions)} of {total_transactions} toll transactions")
         
         # Transaction analysis
         st.subheader("Transaction Analysis")
@@ -275,6 +337,81 @@ def show_fastag_balance():
     else:
         st.info("No recent transactions found for this vehicle.")
 
+def show_fleet_balances():
+    st.subheader("Fleet Balance Check")
+    
+    st.markdown("""
+    Check FASTag balances for a whole fleet at once. Upload a CSV with a `registration` column
+    (or registrations in the first column), or paste them one per line.
+    """)
+    
+    uploaded = st.file_uploader("Fleet CSV", type=["csv"], key="fleet_csv")
+    pasted = st.text_area("Or paste registrations", key="fleet_registrations")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        threshold = st.number_input("Low Balance Threshold (₹)", min_value=0, value=LOW_BALANCE_THRESHOLD, step=50)
+    
+    with col2:
+        alert_days = st.number_input("Alert if Empty Within (days)", min_value=1, value=RUNWAY_ALERT_DAYS)
+    
+    with col3:
+        spend_days = st.number_input("Spend Rate Window (days)", min_value=1, max_value=365, value=30)
+    
+    registrations = []
+    if uploaded is not None:
+        fleet_df = pd.read_csv(uploaded, dtype=str)
+        column = "registration" if "registration" in fleet_df.columns else fleet_df.columns[0]
+        registrations = fleet_df[column].dropna().str.strip().tolist()
+    registrations += [line.strip() for line in pasted.splitlines() if line.strip()]
+    registrations = list(dict.fromkeys(registrations))
+    
+    if not registrations:
+        st.info("Add your fleet's registrations to check their balances.")
+        return
+    
+    # One batched pass over the ledger for every vehicle
+    summary = get_fastag_ledger().fleet_summary(registrations, days=spend_days, threshold=threshold, alert_days=alert_days)
+    report = pd.DataFrame(summary)
+    flagged = report[report["low_balance"] | report["runs_out_soon"]]
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Vehicles", len(report))
+    
+    with col2:
+        st.metric("Low Balance", int(report["low_balance"].sum()))
+    
+    with col3:
+        st.metric(f"Empty Within {alert_days} Days", int(report["runs_out_soon"].sum()))
+    
+    with col4:
+        st.metric("Not Found", int((~report["known"]).sum()))
+    
+    if len(flagged):
+        st.warning(f"⚠️ {len(flagged)} vehicles need a recharge soon.")
+    
+    report = report.sort_values("days_to_empty")
+    display_df = report[["registration", "balance", "spend", "daily_spend", "days_to_empty", "low_balance", "runs_out_soon"]].copy()
+    display_df["daily_spend"] = display_df["daily_spend"].round(2)
+    display_df["days_to_empty"] = display_df["days_to_empty"].replace(np.inf, np.nan).round(1)
+    display_df.columns = ["Registration", "Balance (₹)", f"Spend, Last {spend_days} Days (₹)", "Daily Spend (₹)", "Days to Empty", "Low Balance", "Empty Soon"]
+    
+    show_flagged_only = st.checkbox("Show flagged vehicles only", value=len(flagged) > 0)
+    if show_flagged_only:
+        display_df = display_df[report["low_balance"] | report["runs_out_soon"]]
+    
+    st.dataframe(display_df, use_container_width=True)
+    
+    st.download_button(
+        "Download Fleet Report",
+        data=display_df.to_csv(index=False),
+        file_name="fleet_fastag_report.csv",
+        mime="text/csv"
+    )
+
 def show_trip_calculator():
     st.subheader("Toll Trip Calculator")
     
@@ -302,186 +439,217 @@ def show_trip_calculator():
     # Vehicle type
     vehicle_type = st.selectbox(
         "Vehicle Type",
-        options=["Car/Jeep/Van", "LCV", "Bus/Truck", "Heavy Vehicle"]
+        options=VEHICLE_CLASSES
     )
     
     # Return journey option
     return_journey = st.checkbox("Include Return Journey")
+    return_within_day = return_journey and st.checkbox("Returning within 24 hours", value=True)
+    
+    # Regular trips, for the monthly pass comparison
+    trips_per_month = st.number_input("One-way Trips per Month", min_value=0, max_value=200, value=0, step=2)
     
     # Calculate button
     if st.button("Calculate Toll Cost"):
         if start_city == end_city:
             st.error("Starting point and destination cannot be the same.")
         else:
-            # Load routes data
-            try:
-                with open("data/routes.json", "r") as f:
-                    routes = json.load(f)
-                    
-                # Find matching route
-                matching_routes = [r for r in routes if r["start"] == start_city and r["end"] == end_city]
+            # Get toll plazas
+            toll_plazas = load_toll_plazas()
+            
+            # Find the fastest road path between the two cities, counting predicted waits at toll plazas
+            road_network = get_road_network(plazas=toll_plazas)
+            toll_index = get_toll_index(road_network, toll_plazas)
+            plaza_waits = get_wait_engine(toll_plazas).plaza_delays()
+            _, path = road_network.shortest_path(
+                city_node(start_city),
+                city_node(end_city),
+                edge_delays=toll_index.edge_delays(plaza_waits)
+            )
+            
+            if path:
+                route_points = road_network.path_coords(path)
+                total_distance = round(road_network.path_distance(path), 1)
                 
-                if not matching_routes:
-                    # Try reverse route
-                    matching_routes = [r for r in routes if r["start"] == end_city and r["end"] == start_city]
+                # Create map
+                m = create_tamil_nadu_map()
                 
-                if matching_routes:
-                    selected_route = matching_routes[0]
-                    
-                    # Get toll plazas
-                    toll_plazas = load_toll_plazas()
-                    
-                    # Create map
-                    m = create_tamil_nadu_map()
-                    
-                    # Add start and end markers
-                    folium.Marker(
-                        location=MAJOR_CITIES[start_city],
-                        popup=start_city,
-                        tooltip=f"Start: {start_city}",
-                        icon=folium.Icon(color="green", icon="play", prefix="fa")
-                    ).add_to(m)
+                # Add start and end markers
+                folium.Marker(
+                    location=MAJOR_CITIES[start_city],
+                    popup=start_city,
+                    tooltip=f"Start: {start_city}",
+                    icon=folium.Icon(color="green", icon="play", prefix="fa")
+                ).add_to(m)
+                
+                folium.Marker(
+                    location=MAJOR_CITIES[end_city],
+                    popup=end_city,
+                    tooltip=f"End: {end_city}",
+                    icon=folium.Icon(color="red", icon="stop", prefix="fa")
+                ).add_to(m)
+                
+                # Toll plazas snapped to the route's road edges, in the order they are passed
+                route_tolls = toll_index.route_tolls(path)
+                fee_matrix = toll_index.fees
+                class_index = VEHICLE_CLASSES.index(vehicle_type)
+                plaza_fees = fee_matrix.plaza_fees(route_tolls["rows"])[:, class_index]
+                route_toll_plazas = []
+                
+                for match, fee in zip(route_tolls["plazas"], plaza_fees):
+                    toll_plaza = match["plaza"]
                     
+                    # Add toll marker
                     folium.Marker(
-                        location=MAJOR_CITIES[end_city],
-                        popup=end_city,
-                        tooltip=f"End: {end_city}",
-                        icon=folium.Icon(color="red", icon="stop", prefix="fa")
-                    ).add_to(m)
-                    
-                    # Create route line
-                    route_points = [MAJOR_CITIES[start_city]]
-                    
-                    # Add toll plazas along route
-                    toll_count = selected_route.get("toll_plazas", 0)
-                    total_distance = selected_route.get("distance", 0)
-                    
-                    # For demo purposes, randomly position toll plazas along route
-                    route_toll_plazas = []
-                    
-                    for i in range(toll_count):
-                        # Random position along route
-                        progress = (i + 1) / (toll_count + 1)
-                        
-                        start_coords = MAJOR_CITIES[start_city]
-                        end_coords = MAJOR_CITIES[end_city]
-                        
-                        toll_lat = start_coords[0] + progress * (end_coords[0] - start_coords[0])
-                        toll_lng = start_coords[1] + progress * (end_coords[1] - start_coords[1])
-                        
-                        # Choose a random toll plaza
-                        if toll_plazas:
-                            toll_plaza = random.choice(toll_plazas)
-                            
-                            # Add to route points
-                            route_points.append([toll_lat, toll_lng])
-                            
-                            # Add toll marker
-                            folium.Marker(
-                                location=[toll_lat, toll_lng],
-                                popup=toll_plaza["name"],
-                                tooltip=f"Toll: {toll_plaza['name']}",
-                                icon=folium.Icon(color="blue", icon="usd", prefix="fa")
-                            ).add_to(m)
-                            
-                            # Add to list
-                            route_toll_plazas.append({
-                                "name": toll_plaza["name"],
-                                "distance": round(total_distance * progress, 1),
-                                "fee": toll_plaza["fees"][vehicle_type]
-                            })
-                    
-                    # Add end point to route
-                    route_points.append(MAJOR_CITIES[end_city])
-                    
-                    # Add route line
-                    folium.PolyLine(
-                        locations=route_points,
-                        color="blue",
-                        weight=4,
-                        opacity=0.7
+                        location=toll_plaza["coordinates"],
+                        popup=toll_plaza["name"],
+                        tooltip=f"Toll: {toll_plaza['name']}",
+                        icon=folium.Icon(color="blue", icon="usd", prefix="fa")
                     ).add_to(m)
                     
-                    # Display map
-                    display_map(m)
-                    
-                    # Calculate total cost
-                    total_cost = sum(plaza["fee"] for plaza in route_toll_plazas)
-                    if return_journey:
-                        total_cost *= 2
+                    # Add to list
+                    route_toll_plazas.append({
+                        "name": toll_plaza["name"],
+                        "distance": round(match["distance_km"], 1),
+                        "fee": round(float(fee)),
+                        "wait": round(float(plaza_waits[match["index"]]), 1)
+                    })
+                
+                toll_count = len(route_toll_plazas)
+                toll_wait = sum(p["wait"] for p in route_toll_plazas)
+                
+                # Add route line
+                RouteLine(
+                    route_points,
+                    color="blue",
+                    weight=4,
+                    opacity=0.7
+                ).add_to(m)
+                
+                # Display map
+                display_map(m)
+                
+                # Cost for every vehicle class and payment mode in one pass over the route's plazas
+                trip_costs = fee_matrix.route_cost(route_tolls["rows"], return_within_24h=return_within_day)
+                if return_journey and not return_within_day:
+                    trip_costs = trip_costs * 2
+                mode_costs = dict(zip(PAYMENT_MODES, trip_costs[class_index]))
+                total_cost = round(mode_costs["FASTag"])
+                
+                # Display results
+                st.subheader("Toll Cost Breakdown")
+                
+                col1, col2, col3 = st.columns(3)
+                
+                with col1:
+                    st.metric(
+                        "Total Distance",
+                        f"{total_distance} km",
+                        delta=None
+                    )
+                
+                with col2:
+                    st.metric(
+                        "Number of Tolls",
+                        str(toll_count),
+                        delta=f"~{toll_wait:.0f} min waiting" if toll_count else None,
+                        delta_color="off"
+                    )
+                
+                with col3:
+                    st.metric(
+                        "Total Toll Cost",
+                        f"₹{total_cost}",
+                        delta=None
+                    )
+                
+                # Display toll breakdown
+                st.markdown("### Toll Plaza Details")
+                
+                toll_df = pd.DataFrame(route_toll_plazas, columns=["name", "distance", "wait", "fee"])
+                toll_df.columns = ["Toll Plaza", "Distance (km)", "Wait (min)", "Fee (₹)"]
+                
+                if return_journey:
+                    # Same-day returns pay half fare on the way back
+                    return_factor = RETURN_WITHIN_24H_FACTOR if return_within_day else 2
+                    toll_df["Return Fee (₹)"] = toll_df["Fee (₹)"] * (return_factor - 1)
+                    toll_df["Total Fee (₹)"] = toll_df["Fee (₹)"] + toll_df["Return Fee (₹)"]
+                
+                st.dataframe(toll_df, use_container_width=True)
+                
+                # Show FASTag savings
+                st.subheader("FASTag Savings")
+                
+                # Vehicles without a valid FASTag pay a higher fee at the plaza
+                cash_cost = round(mode_costs["Cash"])
+                fastag_cost = round(mode_costs["FASTag"])
+                
+                savings_data = pd.DataFrame({
+                    "Payment Method": list(mode_costs.keys()),
+                    "Cost (₹)": [round(cost) for cost in mode_costs.values()]
+                })
+                
+                fig = px.bar(
+                    savings_data,
+                    x="Payment Method",
+                    y="Cost (₹)",
+                    color="Payment Method",
+                    color_discrete_map={"Cash": "red", "UPI": "orange", "FASTag": "green"},
+                    text="Cost (₹)"
+                )
+                
+                fig.update_layout(
+                    height=300,
+                    margin=dict(l=10, r=10, t=30, b=10),
+                    showlegend=False
+                )
+                
+                st.plotly_chart(fig, use_container_width=True)
+                
+                st.success(f"Using FASTag saves you approximately ₹{cash_cost - fastag_cost:.2f} on this journey!")
+                
+                # Monthly pass comparison for regular travellers
+                if trips_per_month > 0 and route_tolls["rows"]:
+                    st.subheader("Monthly Pass")
                     
-                    # Display results
-                    st.subheader("Toll Cost Breakdown")
+                    # Spend with and without passes for every trip count up to the chosen one, in one batch
+                    trip_counts = np.arange(1, trips_per_month + 1)
+                    pay_per_trip, with_passes, worthwhile = fee_matrix.monthly_costs(route_tolls["rows"], trip_counts)
                     
-                    col1, col2, col3 = st.columns(3)
+                    col1, col2 = st.columns(2)
                     
                     with col1:
-                        st.metric(
-                            "Total Distance",
-                            f"{selected_route['distance']} km",
-                            delta=None
-                        )
+                        st.metric("Monthly Cost (Pay per Trip)", f"₹{round(pay_per_trip[-1, class_index])}")
                     
                     with col2:
                         st.metric(
-                            "Number of Tolls",
-                            str(toll_count),
-                            delta=None
-                        )
-                    
-                    with col3:
-                        st.metric(
-                            "Total Toll Cost",
-                            f"₹{total_cost}",
-                            delta=None
+                            "Monthly Cost (With Passes)",
+                            f"₹{round(with_passes[-1, class_index])}",
+                            f"-₹{round(pay_per_trip[-1, class_index] - with_passes[-1, class_index])}",
+                            delta_color="inverse"
                         )
                     
-                    # Display toll breakdown
-                    st.markdown("### Toll Plaza Details")
-                    
-                    toll_df = pd.DataFrame(route_toll_plazas)
-                    toll_df.columns = ["Toll Plaza", "Distance (km)", "Fee (₹)"]
-                    
-                    if return_journey:
-                        toll_df["Return Fee (₹)"] = toll_df["Fee (₹)"]
-                        toll_df["Total Fee (₹)"] = toll_df["Fee (₹)"] * 2
-                    
-                    st.dataframe(toll_df, use_container_width=True)
-                    
-                    # Show FASTag savings
-                    st.subheader("FASTag Savings")
-                    
-                    # Calculate savings (FASTag users typically save 5-10% due to discounts)
-                    cash_cost = total_cost
-                    fastag_cost = total_cost * 0.9  # 10% discount
+                    pass_plazas = [
+                        match["plaza"]["name"]
+                        for match, use_pass in zip(route_tolls["plazas"], worthwhile[-1, :, class_index])
+                        if use_pass
+                    ]
+                    if pass_plazas:
+                        st.info(f"A monthly pass pays off at: {', '.join(pass_plazas)}")
+                    else:
+                        st.info("At this many trips, paying per trip is cheaper than a monthly pass.")
                     
-                    savings_data = pd.DataFrame({
-                        "Payment Method": ["Cash", "FASTag"],
-                        "Cost (₹)": [cash_cost, fastag_cost]
+                    monthly_df = pd.DataFrame({
+                        "Trips per Month": np.concatenate([trip_counts, trip_counts]),
+                        "Cost (₹)": np.concatenate([pay_per_trip[:, class_index], with_passes[:, class_index]]),
+                        "Option": ["Pay per Trip"] * len(trip_counts) + ["With Passes"] * len(trip_counts)
                     })
                     
-                    fig = px.bar(
-                        savings_data,
-                        x="Payment Method",
-                        y="Cost (₹)",
-                        color="Payment Method",
-                        color_discrete_map={"Cash": "red", "FASTag": "green"},
-                        text="Cost (₹)"
-                    )
-                    
-                    fig.update_layout(
-                        height=300,
-                        margin=dict(l=10, r=10, t=30, b=10),
-                        showlegend=False
-                    )
-                    
+                    fig = px.line(monthly_df, x="Trips per Month", y="Cost (₹)", color="Option")
+                    fig.update_layout(height=300, margin=dict(l=10, r=10, t=30, b=10))
                     st.plotly_chart(fig, use_container_width=True)
-                    
-                    st.success(f"Using FASTag saves you approximately ₹{cash_cost - fastag_cost:.2f} on this journey!")
-                else:
-                    st.warning(f"No direct route information available for {start_city} to {end_city}.")
-            except (FileNotFoundError, json.JSONDecodeError):
-                st.error("Route data is not available. Please check your connection.")
+            else:
+                st.warning(f"No route information available for {start_city} to {end_city}.")
 
 def main():
     st.title("💳 FASTag Management")
@@ -493,7 +661,7 @@ def main():
     """)
     
     # Main navigation tabs
-    tab1, tab2, tab3 = st.tabs(["FASTag Balance", "Toll Plazas", "Trip Calculator"])
+    tab1, tab2, tab3, tab4 = st.tabs(["FASTag Balance", "Toll Plazas", "Trip Calculator", "Fleet"])
     
     with tab1:
         show_fastag_balance()
@@ -504,6 +672,9 @@ def main():
     with tab3:
         show_trip_calculator()
     
+    with tab4:
+        show_fleet_balances()
+    
     # Tips section
     st.header("FASTag Tips")
     
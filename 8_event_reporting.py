@@ -6,7 +6,55 @@ import json
 import random
 from datetime import datetime, timedelta
 
-from utils import create_tamil_nadu_map, display_map, MAJOR_CITIES, generate_id
+from utils import create_tamil_nadu_map, display_map, map_view, MAJOR_CITIES, generate_id
+from map_layers import get_point_layer
+from map_tiles import get_tile_layer
+from route_geometry import RouteLine
+from paged_list import paged_list
+from owner_index import get_owner_index
+
+def event_style(event):
+    # Determine marker color based on severity
+    if event["severity"] == "High":
+        color = "red"
+    elif event["severity"] == "Medium":
+        color = "orange"
+    else:
+        color = "blue"
+    
+    # Determine icon based on type
+    if event["type"] == "Construction":
+        icon = "wrench"
+    elif event["type"] == "Road Closure":
+        icon = "road"
+    elif event["type"] == "Accident":
+        icon = "car-crash"
+    elif event["type"] == "Flooding":
+        icon = "water"
+    elif event["type"] == "Festival" or event["type"] == "Event":
+        icon = "calendar"
+    elif event["type"] == "Protest":
+        icon = "bullhorn"
+    elif event["type"] == "VIP Movement":
+        icon = "user-tie"
+    else:
+        icon = "exclamation-triangle"
+    
+    return {"color": color, "icon": icon}
+
+def event_popup(event):
+    return f"""
+    <div style="width:250px">
+        <h4>{event["name"]}</h4>
+        <p><b>Type:</b> {event["type"]}</p>
+        <p><b>Location:</b> {event["location"]}</p>
+        <p><b>Description:</b> {event["description"]}</p>
+        <p><b>Severity:</b> {event["severity"]}</p>
+        <p><b>Status:</b> {event["status"]}</p>
+        <p><b>Dates:</b> {event["start_date"]} to {event["end_date"]}</p>
+        <p><b>Affected Routes:</b> {", ".join(event["affected_routes"])}</p>
+    </div>
+    """
 
 def load_events():
     try:
@@ -15,6 +63,10 @@ def load_events():
     except (FileNotFoundError, json.JSONDecodeError):
         return []
 
+def event_tile_points():
+    """Every event as a (lat, lng, color) point for the statewide tiles"""
+    return [(e["coordinates"][0], e["coordinates"][1], event_style(e)["color"]) for e in load_events()]
+
 def save_events(events):
     from utils import save_json_data
     save_json_data(events, "events.json")
@@ -67,6 +119,11 @@ def main():
     # Load existing events
     events = load_events()
     
+    # Reports filed by the signed-in user, looked up by user id
+    user = st.session_state.get("user") or {}
+    user_id = user.get("uid", "guest")
+    my_reports_index = get_owner_index("events")
+    
     # Main navigation tabs
     tab1, tab2, tab3 = st.tabs(["View Reports", "Report Event", "My Reports"])
     
@@ -101,64 +158,38 @@ def main():
         # Create map centered on Tamil Nadu
         m = create_tamil_nadu_map()
         
-        # Add event markers
-        for event in filtered_events:
-            # Determine marker color based on severity
-            if event["severity"] == "High":
-                color = "red"
-            elif event["severity"] == "Medium":
-                color = "orange"
-            else:
-                color = "blue"
-            
-            # Determine icon based on type
-            if event["type"] == "Construction":
-                icon = "wrench"
-            elif event["type"] == "Road Closure":
-                icon = "road"
-            elif event["type"] == "Accident":
-                icon = "car-crash"
-            elif event["type"] == "Flooding":
-                icon = "water"
-            elif event["type"] == "Festival" or event["type"] == "Event":
-                icon = "calendar"
-            elif event["type"] == "Protest":
-                icon = "bullhorn"
-            elif event["type"] == "VIP Movement":
-                icon = "user-tie"
-            else:
-                icon = "exclamation-triangle"
-            
-            # Create popup content
-            popup_html = f"""
-            <div style="width:250px">
-                <h4>{event["name"]}</h4>
-                <p><b>Type:</b> {event["type"]}</p>
-                <p><b>Location:</b> {event["location"]}</p>
-                <p><b>Description:</b> {event["description"]}</p>
-                <p><b>Severity:</b> {event["severity"]}</p>
-                <p><b>Status:</b> {event["status"]}</p>
-                <p><b>Dates:</b> {event["start_date"]} to {event["end_date"]}</p>
-                <p><b>Affected Routes:</b> {", ".join(event["affected_routes"])}</p>
-            </div>
-            """
-            
-            # Add marker
-            folium.Marker(
-                location=event["coordinates"],
-                popup=folium.Popup(popup_html, max_width=300),
-                tooltip=f"{event['type']}: {event['name']}",
-                icon=folium.Icon(color=color, icon=icon, prefix="fa")
-            ).add_to(m)
+        # Add event markers, clustered and limited to the current view
+        get_point_layer("event_map", filtered_events).add_to(
+            m,
+            filtered_events,
+            view=map_view("event_map"),
+            tooltip=lambda event: f"{event['type']}: {event['name']}",
+            style=event_style,
+            popup=event_popup,
+            label="events",
+            # Unfiltered statewide views are drawn from pre-rendered tiles
+            tiles=get_tile_layer("events", event_tile_points) if len(filtered_events) == len(events) else None
+        )
         
         # Display map
-        display_map(m)
+        display_map(m, key="event_map")
         
         # List view
         st.subheader(f"Filtered Reports ({len(filtered_events)})")
         
         if filtered_events:
-            for event in filtered_events:
+            page = paged_list(
+                filtered_events,
+                "event_list",
+                sort_options={
+                    "Newest first": (lambda e: e["timestamp"], True),
+                    "Severity": (lambda e: {"High": 0, "Medium": 1, "Low": 2}.get(e["severity"], 3), False),
+                    "Start date": (lambda e: e["start_date"], False)
+                },
+                search_fields=("name", "description", "location", "type"),
+                label="reports"
+            )
+            for event in page:
                 with st.expander(f"{event['type']}: {event['name']} - {event['severity']}"):
                     col1, col2 = st.columns(2)
                     
@@ -249,8 +280,8 @@ def main():
                                 
                                 # Add route line
                                 tooltip = f"Route {i+1}: {route['name']} - {'Affected by event' if 'affected_by_event' in route else 'Alternative route'}"
-                                folium.PolyLine(
-                                    locations=route_points,
+                                RouteLine(
+                                    route_points,
                                     tooltip=tooltip,
                                     color=route["color"],
                                     weight=5,
@@ -350,14 +381,16 @@ def main():
                     "affected_routes": routes_list,
                     "status": status,
                     "reported_by": reporter_name if reporter_name else "Anonymous",
+                    "reporter_id": user_id,
                     "timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
                 }
                 
                 # Add to events list
                 events.append(new_event)
                 
-                # Save updated events
+                # Save updated events and file the report under its reporter
                 save_events(events)
+                my_reports_index.put(user_id, new_event)
                 
                 st.success("Event reported successfully! Thank you for helping fellow commuters.")
                 
@@ -406,9 +439,7 @@ def main():
     with tab3:
         st.header("My Reports")
         
-        # In a real app, would filter by user
-        # For demo, just show the last 3 reports
-        my_reports = events[-3:] if len(events) >= 3 else events
+        my_reports = my_reports_index.records(user_id)
         
         if my_reports:
             for report in my_reports:
@@ -433,12 +464,14 @@ def main():
                                     if e["id"] == report["id"]:
                                         e["status"] = "Cleared"
                                 save_events(events)
+                                my_reports_index.put(user_id, {**report, "status": "Cleared"})
                                 st.success("Event marked as cleared!")
                                 st.rerun()
                         
                         if st.button("Delete Report", key=f"delete_{report['id']}"):
                             events = [e for e in events if e["id"] != report["id"]]
                             save_events(events)
+                            my_reports_index.remove(user_id, report["id"])
                             st.success("Report deleted successfully!")
                             st.rerun()
         else:
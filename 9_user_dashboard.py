@@ -1,19 +1,20 @@
 import streamlit as st
-from firebase_utils import init_firebase, auth_required, get_from_rtdb, save_to_rtdb, push_to_rtdb
+from firebase_utils import init_firebase, auth_required, get_cached_from_rtdb, update_in_rtdb, push_to_rtdb
+from activity_history import ensure_history_indexed, load_history_page
 
 # Initialize Firebase
 init_firebase()
 
-def load_user_data(user_id):
-    """Load user data from Realtime Database"""
-    result = get_from_rtdb(f'users/{user_id}')
+def load_user_data(user_id, section):
+    """Load one part of a user's data (profile or vehicles), cached between reruns"""
+    result = get_cached_from_rtdb(f'users/{user_id}/{section}')
     if result['success']:
-        return result['data']
-    return None
+        return result['data'] or {}
+    return {}
 
 def save_user_data(user_id, data):
-    """Save user data to Realtime Database"""
-    result = save_to_rtdb(f'users/{user_id}', data)
+    """Save parts of a user's data to Realtime Database, leaving the other parts as they are"""
+    result = update_in_rtdb(f'users/{user_id}', data)
     if result['success']:
         st.success('Profile updated successfully!')
         st.rerun()
@@ -29,16 +30,15 @@ def main():
         st.page_link("pages/0_login.py", label="Go to Login", icon="🔐")
         return
     
-    # Load user data
+    # Each tab loads only its own part of the user's data
     user_id = st.session_state.user['uid']
-    user_data = load_user_data(user_id)
     
     # Navigation tabs
     tab1, tab2, tab3 = st.tabs(["Profile", "Vehicles", "History"])
     
     with tab1:
         st.header("Profile Information")
-        profile_data = user_data.get('profile', {}) if user_data else {}
+        profile_data = load_user_data(user_id, 'profile')
         
         # Profile form
         with st.form("profile_form"):
@@ -90,7 +90,7 @@ def main():
         
         # Display existing vehicles
         st.subheader("Your Vehicles")
-        vehicles = user_data.get('vehicles', {}) if user_data else {}
+        vehicles = load_user_data(user_id, 'vehicles')
         if vehicles:
             for vehicle_id, vehicle in vehicles.items():
                 with st.expander(f"{vehicle['make']} {vehicle['model']} ({vehicle['registration']})"):
@@ -110,15 +110,28 @@ def main():
             ["All", "Parking", "FASTag", "EV Charging", "Public Transport"]
         )
         
-        # Display activity history
-        history = user_data.get('history', {}) if user_data else {}
+        # Display one page of activity history, fetched already filtered and ordered
+        ensure_history_indexed(user_id)
+        paging = st.session_state.setdefault(f"history_{activity_type}", {"cursors": [None], "page": 0})
+        history, older = load_history_page(user_id, activity_type, before=paging["cursors"][paging["page"]])
         if history:
-            for activity_id, activity in history.items():
-                if activity_type == "All" or activity['type'] == activity_type:
-                    with st.expander(f"{activity['type']} - {activity['date']}"):
-                        for key, value in activity.items():
-                            if key not in ['type', 'date']:
-                                st.write(f"{key.title()}: {value}")
+            for activity_id, activity in history:
+                with st.expander(f"{activity['type']} - {activity['date']}"):
+                    for key, value in activity.items():
+                        if key not in ['type', 'date', 'timestamp', 'type_key']:
+                            st.write(f"{key.title()}: {value}")
+
+            col1, col2 = st.columns(2)
+            with col1:
+                if paging["page"] > 0 and st.button("Newer"):
+                    paging["page"] -= 1
+                    st.rerun()
+            with col2:
+                if older and st.button("Older"):
+                    del paging["cursors"][paging["page"] + 1:]
+                    paging["cursors"].append(older)
+                    paging["page"] += 1
+                    st.rerun()
         else:
             st.info("No activity history available")
 
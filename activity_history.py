@@ -0,0 +1,68 @@
+import time
+import uuid
+
+from firebase_utils import get_cached_from_rtdb, query_rtdb, save_to_rtdb, update_in_rtdb
+
+# Activities shown on one page of a user's history
+HISTORY_PAGE_SIZE = 20
+# Sorts after every character used in entry keys, to close a type's key range
+KEY_RANGE_END = "~"
+
+# History entries live at users/{uid}/history/{key}. Keys start with the
+# time they were recorded, so ordering by key is ordering by time, and
+# "type_key" ("{type}|{key}") orders one type's entries by time as well.
+# The database rules need: "history": {".indexOn": ["type_key"]}
+
+def _history_path(user_id):
+    return f'users/{user_id}/history'
+
+def record_activity(user_id, activity):
+    """Add an activity ({"type", "date", ...}) to a user's history, with the fields its queries order by"""
+    timestamp = int(time.time() * 1000)
+    key = f"{timestamp:013d}-{uuid.uuid4().hex[:8]}"
+    entry = dict(activity, timestamp=timestamp, type_key=f"{activity['type']}|{key}")
+    result = save_to_rtdb(f'{_history_path(user_id)}/{key}', entry)
+    if result['success']:
+        result['key'] = key
+    return result
+
+def ensure_history_indexed(user_id):
+    """Give entries recorded before type_key existed their type_key, once per user"""
+    if get_cached_from_rtdb(f'users/{user_id}/history_indexed').get('data'):
+        return
+    result = get_cached_from_rtdb(_history_path(user_id))
+    if not result['success']:
+        return
+    # Older entries have push ids as keys, which also sort by the time they were added
+    updates = {
+        f'history/{key}/type_key': f"{entry.get('type')}|{key}"
+        for key, entry in (result['data'] or {}).items()
+        if 'type_key' not in entry
+    }
+    updates['history_indexed'] = True
+    update_in_rtdb(f'users/{user_id}', updates)
+
+def load_history_page(user_id, activity_type="All", before=None, page_size=HISTORY_PAGE_SIZE):
+    """One page of a user's activities, newest first, fetched with a ranged query.
+
+    before is the cursor of the page to load (None for the newest page).
+    Returns ([(key, activity)], cursor of the next older page or None).
+    """
+    if activity_type == "All":
+        order_by, cursor_field = "$key", None
+        start_at, end_at = None, before
+    else:
+        order_by, cursor_field = "type_key", "type_key"
+        start_at, end_at = f"{activity_type}|", before or f"{activity_type}|{KEY_RANGE_END}"
+
+    # One extra entry tells whether an older page exists and is where it starts
+    result = query_rtdb(_history_path(user_id), order_by=order_by, start_at=start_at, end_at=end_at, limit_to_last=page_size + 1)
+    if not result['success'] or not result['data']:
+        return [], None
+
+    entries = list(result['data'].items())
+    next_cursor = None
+    if len(entries) > page_size:
+        key, entry = entries.pop(0)
+        next_cursor = entry[cursor_field] if cursor_field else key
+    return entries[::-1], next_cursor
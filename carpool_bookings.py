@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from utils import generate_id, load_jsonl
+
+# Append-only booking log; each line is a new booking or a status change
+BOOKINGS_FILE = "data/carpool_bookings.jsonl"
+
+class SeatInventory:
+    """Seat counts and bookings for carpool rides, safe under concurrent booking.
+
+    Each ride has its own lock, so bookings on different rides never wait
+    on each other, and seats are checked and taken in one step so a ride
+    can't be oversold. Bookings are appended to a log instead of rewriting
+    the ride list, and indexed by ride and by passenger.
+    """
+
+    def __init__(self, path=BOOKINGS_FILE):
+        self.path = path
+        self._offered = {}
+        self._booked = defaultdict(int)
+        self._bookings = {}
+        self._by_ride = defaultdict(list)
+        self._by_passenger = defaultdict(list)
+        self._ride_locks = {}
+        self._locks_guard = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        for entry in load_jsonl(self.path):
+            booking = self._bookings.get(entry["id"])
+            if booking is not None:
+                booking.update(entry)
+            elif "ride_id" in entry:
+                self._index(entry)
+
+        for booking in self._bookings.values():
+            if booking["status"] == "Confirmed":
+                self._booked[booking["ride_id"]] += booking["seats"]
+
+    def _index(self, booking):
+        self._bookings[booking["id"]] = booking
+        self._by_ride[booking["ride_id"]].append(booking["id"])
+        self._by_passenger[booking["passenger_id"]].append(booking["id"])
+
+    def _append(self, entry):
+        with self._file_lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _lock_for(self, ride_id):
+        lock = self._ride_locks.get(ride_id)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._ride_locks.setdefault(ride_id, threading.Lock())
+        return lock
+
+    def _register(self, ride):
+        # Seats offered are taken from the ride record the first time it's seen; seats_offered
+        # is preferred since seats_available may already have bookings taken off
+        if ride["id"] not in self._offered:
+            self._offered[ride["id"]] = int(ride.get("seats_offered", ride.get("seats_available", 0)))
+
+    def seats_left(self, ride):
+        self._register(ride)
+        return max(0, self._offered[ride["id"]] - self._booked[ride["id"]])
+
+    def apply_to_rides(self, rides):
+        """Set seats_available on freshly loaded ride records to what is left after bookings.
+
+        The seats offered are kept in seats_offered, so a ride list saved
+        after this still registers with its full capacity.
+        """
+        for ride in rides:
+            self._register(ride)
+            ride["seats_offered"] = self._offered[ride["id"]]
+            if self._booked.get(ride["id"]):
+                ride["seats_available"] = self.seats_left(ride)
+        return rides
+
+    def book(self, ride, passenger_id, passenger_name, seats=1, pickup=None, dropoff=None):
+        """Take seats on a ride if enough are left. Returns the booking, or None if the ride is full."""
+        self._register(ride)
+        with self._lock_for(ride["id"]):
+            if self.seats_left(ride) < seats:
+                return None
+            self._booked[ride["id"]] += seats
+            booking = {
+                "id": None,
+                "ride_id": ride["id"],
+                "passenger_id": passenger_id,
+                "passenger_name": passenger_name,
+                "seats": seats,
+                "pickup": pickup or ride["start_point"],
+                "dropoff": dropoff or ride["end_point"],
+                "status": "Confirmed",
+                "booked_at": datetime.now().isoformat()
+            }
+            # Timestamped ids can collide when bookings land in the same second
+            with self._locks_guard:
+                while booking["id"] is None or booking["id"] in self._bookings:
+                    booking["id"] = generate_id("booking")
+                self._index(booking)
+        self._append(booking)
+        return booking
+
+    def cancel(self, booking_id):
+        """Cancel a confirmed booking and return its seats to the ride"""
+        booking = self._bookings.get(booking_id)
+        if booking is None:
+            return False
+        with self._lock_for(booking["ride_id"]):
+            if booking["status"] != "Confirmed":
+                return False
+            booking["status"] = "Cancelled"
+            self._booked[booking["ride_id"]] -= booking["seats"]
+        self._append({"id": booking_id, "status": "Cancelled", "cancelled_at": datetime.now().isoformat()})
+        return True
+
+    def passengers(self, ride_id):
+        """Confirmed bookings on a ride"""
+        bookings = (self._bookings[b] for b in self._by_ride.get(ride_id, ()))
+        return [b for b in bookings if b["status"] == "Confirmed"]
+
+    def bookings_for(self, passenger_id):
+        """Confirmed bookings made by a passenger"""
+        bookings = (self._bookings[b] for b in self._by_passenger.get(passenger_id, ()))
+        return [b for b in bookings if b["status"] == "Confirmed"]
+
+# Inventory shared by every Streamlit session
+_inventory = None
+_inventory_lock = threading.Lock()
+
+def get_seat_inventory():
+    global _inventory
+    if _inventory is None:
+        with _inventory_lock:
+            if _inventory is None:
+                _inventory = SeatInventory()
+    return _inventory
@@ -0,0 +1,375 @@
+import bisect
+import heapq
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from carpool_matching import clock_minutes, get_carpool_matcher, ride_stops
+from road_network import AVERAGE_SPEED_KMPH, get_road_network
+from utils import MAJOR_CITIES, generate_id, load_jsonl
+
+logger = logging.getLogger(__name__)
+
+# Append-only ride request log; each line is a new request or a status change
+REQUESTS_FILE = "data/ride_requests.jsonl"
+# How often open requests are matched to offered rides (seconds)
+DISPATCH_INTERVAL = 30
+# Extra distance one rider may add to a ride, and all riders together (km)
+RIDER_DETOUR_KM = 30
+RIDE_DETOUR_KM = 60
+# Rides considered per request, best detours first
+CANDIDATES_PER_REQUEST = 20
+# Unmatched requests tried with one rider moved to another ride, per batch
+LOCAL_SEARCH_LIMIT = 2000
+
+class RideRequestQueue:
+    """Ride requests waiting for the batch dispatcher, persisted as an append-only log"""
+
+    def __init__(self, path=REQUESTS_FILE):
+        self.path = path
+        self._requests = {}
+        self._by_rider = defaultdict(list)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        for entry in load_jsonl(self.path):
+            if entry["id"] in self._requests:
+                self._requests[entry["id"]].update(entry)
+            elif "rider_id" in entry:
+                self._requests[entry["id"]] = entry
+                self._by_rider[entry["rider_id"]].append(entry["id"])
+
+    def _append(self, entry):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def submit(self, rider_id, rider_name, pickup, dropoff, date, earliest, latest, seats=1):
+        """Queue a request to travel pickup→dropoff on date, leaving between earliest and latest"""
+        request = {
+            "id": None,
+            "rider_id": rider_id,
+            "rider_name": rider_name,
+            "pickup": pickup,
+            "dropoff": dropoff,
+            "date": date.strftime("%Y-%m-%d"),
+            "earliest_time": earliest.strftime("%I:%M %p"),
+            "latest_time": latest.strftime("%I:%M %p"),
+            "seats": seats,
+            "status": "Open",
+            "requested_at": datetime.now().isoformat()
+        }
+        with self._lock:
+            while request["id"] is None or request["id"] in self._requests:
+                request["id"] = generate_id("request")
+            self._requests[request["id"]] = request
+            self._by_rider[rider_id].append(request["id"])
+            self._append(request)
+        return request
+
+    def _update(self, request_id, **changes):
+        with self._lock:
+            request = self._requests.get(request_id)
+            if request is None or request["status"] != "Open":
+                return False
+            request.update(changes)
+            self._append({"id": request_id, **changes})
+            return True
+
+    def mark_matched(self, request_id, booking):
+        return self._update(request_id, status="Matched", ride_id=booking["ride_id"], booking_id=booking["id"])
+
+    def cancel(self, request_id):
+        return self._update(request_id, status="Cancelled")
+
+    def open_requests(self, today=None):
+        """Open requests for today or later"""
+        today = (today or datetime.now()).strftime("%Y-%m-%d")
+        with self._lock:
+            return [dict(r) for r in self._requests.values() if r["status"] == "Open" and r["date"] >= today]
+
+    def requests_for(self, rider_id):
+        return [self._requests[r] for r in self._by_rider.get(rider_id, ())]
+
+class _RideState:
+    """A ride's current stop sequence and the riders inserted into it"""
+
+    def __init__(self, ride):
+        self.ride = ride
+        self.stops = ride_stops(ride)
+        self.route = list(self.stops)
+        self.riders = []
+        self.detour = 0.0
+        self.seats_left = int(ride.get("seats_available", 0))
+
+def _insertion(route, pickup, dropoff, distance):
+    """Cheapest way to add pickup then dropoff to a stop sequence.
+
+    Each city either is already a stop or is inserted on a leg; returns
+    (extra km, new route), or (inf, None) if no order works.
+    """
+    legs = [distance(a, b) for a, b in zip(route, route[1:])]
+
+    def options(city):
+        result = []
+        for k, stop in enumerate(route):
+            if stop == city:
+                result.append((k, 0.0, k, False))
+        for k, leg in enumerate(legs):
+            result.append((k + 0.5, distance(route[k], city) + distance(city, route[k + 1]) - leg, k, True))
+        return sorted(result)
+
+    best = (float("inf"), None)
+    pickups = options(pickup)
+    # Cheapest pickup strictly before each position, so each dropoff option is checked once
+    prefix = []
+    cheapest = (float("inf"), None)
+    for option in pickups:
+        if option[1] < cheapest[0]:
+            cheapest = (option[1], option)
+        prefix.append((option[0], cheapest))
+
+    positions = [p[0] for p in prefix]
+    for position, cost, k, inserted in options(dropoff):
+        index = bisect.bisect_left(positions, position) - 1
+        if index >= 0 and prefix[index][1][1] is not None:
+            p_cost, p_option = prefix[index][1]
+            if p_cost + cost < best[0]:
+                best = (p_cost + cost, (p_option, (position, cost, k, inserted)))
+        # Both inserted on the same leg, in order
+        if inserted:
+            same = (distance(route[k], pickup) + distance(pickup, dropoff)
+                    + distance(dropoff, route[k + 1]) - legs[k])
+            if same < best[0]:
+                best = (same, ((k + 0.5, 0.0, k, True), (k + 0.5, 0.0, k, True)))
+
+    if best[1] is None:
+        return best
+    (_, _, p_leg, p_inserted), (_, _, q_leg, q_inserted) = best[1]
+    new_route = list(route)
+    # Insert from the back so earlier indices stay valid
+    if q_inserted:
+        new_route.insert(q_leg + 1, dropoff)
+    if p_inserted:
+        new_route.insert(p_leg + 1, pickup)
+    return best[0], new_route
+
+def dispatch(requests, offers, network=None, rider_detour_km=RIDER_DETOUR_KM,
+             ride_detour_km=RIDE_DETOUR_KM, candidates_per_request=CANDIDATES_PER_REQUEST):
+    """Assign ride requests to offered rides, matching as many seats as possible.
+
+    Builds a feasibility list per request (rides on the same date that pass
+    near both cities, reach the pickup inside the request's time window and
+    have seats), using the road network's city distance matrix for detours.
+    Requests with the fewest options are placed first, each at its cheapest
+    insertion, then unmatched requests try moving one placed rider to
+    another ride to make room.
+
+    Returns a list of {"request", "ride", "detour_km", "pickup_minutes"}.
+    """
+    network = network or get_road_network()
+    cities = list(MAJOR_CITIES.keys())
+    city_index = {city: i for i, city in enumerate(cities)}
+    matrix = network.city_matrix(cities)
+
+    def distance(a, b):
+        if a == b:
+            return 0.0
+        if a in city_index and b in city_index:
+            return float(matrix[city_index[a], city_index[b]])
+        return float("inf")
+
+    matcher = get_carpool_matcher(offers)
+
+    # Feasibility graph: candidate rides per request, looked up once per (date, pickup, dropoff)
+    groups = defaultdict(list)
+    for request in requests:
+        groups[(request["date"], request["pickup"], request["dropoff"])].append(request)
+
+    candidates = {}
+    for (date, pickup, dropoff), group in groups.items():
+        # The matcher's straight-line detours are only a coarse filter; exact costs come later
+        matches = matcher.match(pickup, dropoff, datetime.strptime(date, "%Y-%m-%d"), detour_km=2 * rider_detour_km)
+        timed = sorted(
+            (clock_minutes(m["ride"].get("time")) + distance(m["ride"]["start_point"], pickup) / AVERAGE_SPEED_KMPH * 60,
+             m["detour_km"], m["ride"]["id"])
+            for m in matches
+        )
+        etas = [t[0] for t in timed]
+        for request in group:
+            low = bisect.bisect_left(etas, clock_minutes(request["earliest_time"]))
+            high = bisect.bisect_right(etas, clock_minutes(request["latest_time"]))
+            options = [t for t in timed[low:high] if t[0] < float("inf")]
+            best = heapq.nsmallest(candidates_per_request, options, key=lambda t: t[1])
+            candidates[request["id"]] = [(ride_id, eta) for eta, _, ride_id in best]
+
+    states = {}
+    requests_by_id = {r["id"]: r for r in requests}
+    assigned = {}
+
+    def state_for(ride_id):
+        if ride_id not in states:
+            states[ride_id] = _RideState(matcher.rides[ride_id])
+        return states[ride_id]
+
+    def try_insert(state, request):
+        if state.seats_left < request["seats"]:
+            return None
+        extra, route = _insertion(state.route, request["pickup"], request["dropoff"], distance)
+        if extra > rider_detour_km or state.detour + extra > ride_detour_km:
+            return None
+        return extra, route
+
+    def place(state, request, extra, route, eta):
+        state.route = route
+        state.detour += extra
+        state.seats_left -= request["seats"]
+        state.riders.append(request["id"])
+        assigned[request["id"]] = (state.ride["id"], extra, eta)
+
+    def rebuild_without(state, request_id):
+        """Ride state with one rider removed, or None if the others no longer fit"""
+        rebuilt = _RideState(state.ride)
+        for other in state.riders:
+            if other == request_id:
+                continue
+            request = requests_by_id[other]
+            inserted = try_insert(rebuilt, request)
+            if inserted is None:
+                return None
+            rebuilt.route = inserted[1]
+            rebuilt.detour += inserted[0]
+            rebuilt.seats_left -= request["seats"]
+            rebuilt.riders.append(other)
+        return rebuilt
+
+    # Greedy insertion: most constrained requests first, bigger parties first among equals
+    order = sorted(requests, key=lambda r: (len(candidates.get(r["id"], ())), -r["seats"]))
+    for request in order:
+        for ride_id, eta in candidates.get(request["id"], ()):
+            state = state_for(ride_id)
+            inserted = try_insert(state, request)
+            if inserted is not None:
+                place(state, request, inserted[0], inserted[1], eta)
+                break
+
+    # Local search: free a seat for an unmatched request by moving one rider elsewhere
+    attempts = 0
+    for request in order:
+        if request["id"] in assigned or attempts >= LOCAL_SEARCH_LIMIT:
+            continue
+        attempts += 1
+        moved = False
+        for ride_id, eta in candidates.get(request["id"], ()):
+            state = state_for(ride_id)
+            for other_id in list(state.riders):
+                other = requests_by_id[other_id]
+                # Only rebuild the ride if the rider has somewhere with free seats to go
+                alternatives = [
+                    (alt_id, alt_eta) for alt_id, alt_eta in candidates.get(other_id, ())
+                    if alt_id != ride_id and state_for(alt_id).seats_left >= other["seats"]
+                ]
+                if not alternatives:
+                    continue
+                reduced = rebuild_without(state, other_id)
+                if reduced is None or try_insert(reduced, request) is None:
+                    continue
+                for alt_id, alt_eta in alternatives:
+                    alt_state = state_for(alt_id)
+                    alt_inserted = try_insert(alt_state, other)
+                    if alt_inserted is None:
+                        continue
+                    states[ride_id] = reduced
+                    place(alt_state, other, alt_inserted[0], alt_inserted[1], alt_eta)
+                    extra, route = try_insert(reduced, request)
+                    place(reduced, request, extra, route, eta)
+                    moved = True
+                    break
+                if moved:
+                    break
+            if moved:
+                break
+
+    return [
+        {"request": requests_by_id[request_id], "ride": matcher.rides[ride_id], "detour_km": extra, "pickup_minutes": eta}
+        for request_id, (ride_id, extra, eta) in assigned.items()
+    ]
+
+class RideDispatcher:
+    """Matches open ride requests to offered rides every interval seconds and books the seats"""
+
+    def __init__(self, queue, inventory, load_offers, interval=DISPATCH_INTERVAL):
+        self.queue = queue
+        self.inventory = inventory
+        self.load_offers = load_offers
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._run_lock = threading.Lock()
+
+    def run_once(self):
+        """Dispatch one batch; returns how many requests were booked"""
+        with self._run_lock:
+            requests = self.queue.open_requests()
+            if not requests:
+                return 0
+            booked = 0
+            for assignment in dispatch(requests, self.load_offers()):
+                request = assignment["request"]
+                booking = self.inventory.book(
+                    assignment["ride"],
+                    request["rider_id"],
+                    request["rider_name"],
+                    seats=request["seats"],
+                    pickup=request["pickup"],
+                    dropoff=request["dropoff"]
+                )
+                if booking and self.queue.mark_matched(request["id"], booking):
+                    booked += 1
+            return booked
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            # A failed batch is retried on the next interval rather than stopping the dispatcher
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Ride dispatch batch failed")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="carpool-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+# Queue and dispatcher shared by every Streamlit session
+_queue = None
+_dispatcher = None
+_dispatch_lock = threading.Lock()
+
+def get_ride_request_queue():
+    global _queue
+    if _queue is None:
+        with _dispatch_lock:
+            if _queue is None:
+                _queue = RideRequestQueue()
+    return _queue
+
+def get_ride_dispatcher(inventory, load_offers, start=True):
+    """Return the process-wide dispatcher, starting its background batches on first use"""
+    global _dispatcher
+    queue = get_ride_request_queue()
+    if _dispatcher is None:
+        with _dispatch_lock:
+            if _dispatcher is None:
+                _dispatcher = RideDispatcher(queue, inventory, load_offers)
+                if start:
+                    _dispatcher.start()
+    return _dispatcher
@@ -0,0 +1,216 @@
+import threading
+from collections import defaultdict
+from datetime import datetime
+
+from road_network import ROAD_DETOUR_FACTOR, haversine_matrix
+from utils import MAJOR_CITIES
+
+# Largest extra distance a driver is asked to drive to pick up and drop off a rider (km)
+DETOUR_KM = 30
+# Largest detour a match can be asked for, leaving room for the dispatcher's wider search;
+# the leg detour table is precomputed up to this (km)
+MAX_DETOUR_KM = 2 * DETOUR_KM
+
+def clock_minutes(text):
+    """Minutes after midnight for a time like "08:30 AM" (end of day if unreadable)"""
+    try:
+        moment = datetime.strptime(text, "%I:%M %p")
+    except (TypeError, ValueError):
+        return 24 * 60
+    return moment.hour * 60 + moment.minute
+
+def ride_stops(ride):
+    """Ordered cities a ride passes: start, via points, end"""
+    return [ride["start_point"]] + list(ride.get("via") or []) + [ride["end_point"]]
+
+class CarpoolMatcher:
+    """Index of ride offers by date and by every ordered pair of cities along each ride.
+
+    A ride from A via B to C can carry riders A→B, A→C and B→C, so each of
+    those pairs points at the ride. Riders starting or ending off a ride's
+    route are matched through the legs (consecutive stops) the driver
+    could leave to pick them up, using a precomputed table of the detour
+    each city adds to each leg.
+    """
+
+    def __init__(self, rides=(), detour_km=DETOUR_KM, max_detour_km=MAX_DETOUR_KM):
+        self.detour_km = detour_km
+        self.max_detour_km = max(detour_km, max_detour_km)
+        self.rides = {}
+        self._minutes = {}
+        self._stops = {}
+        self._positions = {}
+        self._by_pair = defaultdict(list)
+        self._by_pickup = defaultdict(list)
+        self._by_dropoff = defaultdict(list)
+        self._by_leg = defaultdict(list)
+        self._by_date = defaultdict(list)
+        self._cities = set()
+        self._lock = threading.Lock()
+
+        # Extra road distance for visiting each city between two others, kept where within tolerance
+        names = list(MAJOR_CITIES.keys())
+        coords = list(MAJOR_CITIES.values())
+        distances = haversine_matrix(coords, coords) * ROAD_DETOUR_FACTOR
+        self._city_index = {city: i for i, city in enumerate(names)}
+        self._distances = distances
+        self._leg_detours = defaultdict(dict)
+        for k, city in enumerate(names):
+            for i, start in enumerate(names):
+                for j, end in enumerate(names):
+                    if k in (i, j) or i == j:
+                        continue
+                    detour = float(distances[i, k] + distances[k, j] - distances[i, j])
+                    if detour <= self.max_detour_km:
+                        self._leg_detours[city][(start, end)] = detour
+
+        for ride in rides:
+            self.add(ride)
+
+    def add(self, ride):
+        """Index a new ride offer"""
+        stops = ride_stops(ride)
+        date = ride["date"]
+        ride_id = ride["id"]
+        with self._lock:
+            self.rides[ride_id] = ride
+            self._minutes[ride_id] = clock_minutes(ride.get("time"))
+            self._stops[ride_id] = stops
+            self._positions[ride_id] = {city: i for i, city in enumerate(stops)}
+            self._by_date[date].append(ride_id)
+            self._cities.update(stops)
+            for i, pickup in enumerate(stops[:-1]):
+                self._by_pickup[(date, pickup)].append(ride_id)
+                self._by_leg[(date, pickup, stops[i + 1])].append((ride_id, i))
+                for dropoff in stops[i + 1:]:
+                    self._by_pair[(date, pickup, dropoff)].append(ride_id)
+            for dropoff in stops[1:]:
+                self._by_dropoff[(date, dropoff)].append(ride_id)
+
+    def cities(self):
+        """Every city some ride passes through"""
+        with self._lock:
+            return sorted(self._cities)
+
+    def _join(self, ride_id, city, pickup, leg, limit):
+        """Cheapest extra detour for a ride to drop a rider at city after picking them up mid-leg.
+
+        Returns (detour km, whether city is on the route), or None if the
+        ride can't get there within limit. A dropoff on the pickup's own
+        leg is priced as one trip a→pickup→city→b.
+        """
+        stops = self._stops[ride_id]
+        position = self._positions[ride_id].get(city)
+        if position is not None and position > leg:
+            return 0.0, True
+        best = None
+        legs = self._leg_detours.get(city, {})
+        for i in range(leg, len(stops) - 1):
+            if i == leg and city in self._city_index:
+                start, end = self._city_index[stops[i]], self._city_index[stops[i + 1]]
+                board, alight = self._city_index[pickup], self._city_index[city]
+                d = self._distances
+                # Both on one leg: price a→pickup→city→b, less what the pickup detour already counted
+                detour = float(d[start, board] + d[board, alight] + d[alight, end] - d[start, end]
+                               - self._leg_detours[pickup][(stops[i], stops[i + 1])])
+            else:
+                detour = legs.get((stops[i], stops[i + 1]))
+            if detour is not None and detour <= limit and (best is None or detour < best[0]):
+                best = (detour, False)
+        return best
+
+    def match(self, pickup=None, dropoff=None, date=None, detour_km=None, seats=1):
+        """Rides that can carry a rider from pickup to dropoff, best first.
+
+        pickup and dropoff may be None or "Any". Returns a list of dicts
+        with the ride, the detour in km the driver makes for the rider, and
+        the pickup/dropoff city when the rider boards or leaves at one of
+        the ride's own stops (None when the driver detours for them).
+        Direct matches come first, then smaller detours, then earlier
+        departures. detour_km is capped at max_detour_km.
+        """
+        detour_km = min(self.detour_km if detour_km is None else detour_km, self.max_detour_km)
+        pickup = None if pickup == "Any" else pickup
+        dropoff = None if dropoff == "Any" else dropoff
+
+        # ride id -> (detour km, boards at a stop, alights at a stop)
+        best = {}
+
+        def offer(ride_id, detour, boards, alights):
+            if ride_id not in best or detour < best[ride_id][0]:
+                best[ride_id] = (detour, boards, alights)
+
+        # The dispatcher thread adds rides while pages match, so the index is read under its lock
+        with self._lock:
+            dates = [date.strftime("%Y-%m-%d")] if date else list(self._by_date.keys())
+            for day in dates:
+                # Rides passing both cities in order
+                if pickup and dropoff:
+                    exact = self._by_pair.get((day, pickup, dropoff), ())
+                elif pickup:
+                    exact = self._by_pickup.get((day, pickup), ())
+                elif dropoff:
+                    exact = self._by_dropoff.get((day, dropoff), ())
+                else:
+                    exact = self._by_date.get(day, ())
+                for ride_id in exact:
+                    best[ride_id] = (0.0, True, True)
+
+                # Rides that leave their route to pick the rider up
+                for (start, end), pickup_detour in self._leg_detours.get(pickup, {}).items():
+                    if pickup_detour > detour_km:
+                        continue
+                    for ride_id, leg in self._by_leg.get((day, start, end), ()):
+                        if dropoff is None:
+                            offer(ride_id, pickup_detour, False, True)
+                            continue
+                        joined = self._join(ride_id, dropoff, pickup, leg, detour_km - pickup_detour)
+                        if joined is not None:
+                            offer(ride_id, pickup_detour + joined[0], False, joined[1])
+
+                # Rides passing the pickup that leave their route to drop the rider off
+                for (start, end), dropoff_detour in self._leg_detours.get(dropoff, {}).items():
+                    if dropoff_detour > detour_km:
+                        continue
+                    for ride_id, leg in self._by_leg.get((day, start, end), ()):
+                        if pickup is not None:
+                            position = self._positions[ride_id].get(pickup)
+                            if position is None or position > leg:
+                                continue
+                        offer(ride_id, dropoff_detour, True, False)
+
+        results = []
+        for ride_id, (detour, boards, alights) in best.items():
+            ride = self.rides[ride_id]
+            if ride.get("seats_available", 0) < seats:
+                continue
+            results.append({
+                "ride": ride,
+                "pickup": pickup if boards else None,
+                "dropoff": dropoff if alights else None,
+                "detour_km": detour
+            })
+        results.sort(key=lambda r: (r["detour_km"], r["ride"]["date"], self._minutes[r["ride"]["id"]]))
+        return results
+
+# Matcher shared across reruns and sessions
+_matcher = None
+_matcher_lock = threading.Lock()
+
+def get_carpool_matcher(rides):
+    """Return the shared matcher, indexing rides added since it was built.
+
+    Known rides are re-pointed at the freshly loaded records so seat counts
+    stay current; the index is rebuilt only if rides have been removed.
+    """
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None or len(rides) < len(_matcher.rides):
+            _matcher = CarpoolMatcher(rides)
+        else:
+            for ride in rides:
+                if ride["id"] in _matcher.rides:
+                    _matcher.rides[ride["id"]] = ride
+                else:
+                    _matcher.add(ride)
+    return _matcher
@@ -0,0 +1,121 @@
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+from charger_state import parse_power_kw
+
+# Share of a day's charging sessions that start in each hour (busiest 5-7 PM)
+HOURLY_ARRIVAL_PROFILE = np.array([
+    0.010, 0.006, 0.004, 0.004, 0.006, 0.012, 0.025, 0.040,
+    0.050, 0.052, 0.050, 0.050, 0.055, 0.052, 0.048, 0.050,
+    0.060, 0.080, 0.085, 0.070, 0.055, 0.040, 0.025, 0.021
+])
+HOURLY_ARRIVAL_PROFILE = HOURLY_ARRIVAL_PROFILE / HOURLY_ARRIVAL_PROFILE.sum()
+
+# Sessions per port per day assumed before a station has any history
+PRIOR_SESSIONS_PER_PORT_DAY = 6
+# How many hours of observation the prior is worth when blending with history
+PRIOR_WEIGHT_HOURS = 24
+# Typical session lengths (minutes) and squared coefficient of variation of service time
+DC_SESSION_MINUTES = 40
+AC_SESSION_MINUTES = 120
+SERVICE_CV2 = 0.5
+# Waits are capped here when a station is overloaded (minutes)
+MAX_WAIT_MINUTES = 180
+
+def erlang_c(servers, offered_load):
+    """Probability an arrival has to queue in an M/M/c system, for arrays of stations"""
+    servers = np.asarray(servers, dtype=int)
+    offered_load = np.asarray(offered_load, dtype=float)
+    blocking = np.ones_like(offered_load)
+    result = np.zeros_like(offered_load)
+
+    # Erlang B recursion, run once up to the largest station and sampled at each station's size
+    for k in range(1, int(servers.max(initial=0)) + 1):
+        blocking = offered_load * blocking / (k + offered_load * blocking)
+        result = np.where(servers == k, blocking, result)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        queueing = servers * result / (servers - offered_load * (1 - result))
+    return np.where(offered_load < servers, np.clip(queueing, 0.0, 1.0), 1.0)
+
+def mgc_wait_minutes(arrivals_per_minute, service_minutes, servers, service_cv2=SERVICE_CV2):
+    """Allen-Cunneen approximation of mean queueing delay in an M/G/c system"""
+    arrivals_per_minute = np.asarray(arrivals_per_minute, dtype=float)
+    service_minutes = np.asarray(service_minutes, dtype=float)
+    servers = np.maximum(np.asarray(servers, dtype=int), 0)
+
+    offered_load = arrivals_per_minute * service_minutes
+    capacity = servers / service_minutes
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mmc_wait = erlang_c(servers, offered_load) / (capacity - arrivals_per_minute)
+    wait = mmc_wait * (1 + service_cv2) / 2
+    overloaded = (servers == 0) | (offered_load >= servers)
+    return np.where(overloaded, MAX_WAIT_MINUTES, np.clip(wait, 0.0, MAX_WAIT_MINUTES))
+
+def _station_rates(stations, store):
+    """Daily sessions, mean service minutes and service CV² per station, blending history into priors"""
+    total_ports = np.array([max(1, int(s.get("total_ports", 1))) for s in stations])
+    fastest = np.array([max((parse_power_kw(p) for p in s.get("power_levels", [])), default=7.4) for s in stations])
+    prior_service = np.where(fastest >= 50, DC_SESSION_MINUTES, AC_SESSION_MINUTES).astype(float)
+    prior_daily = total_ports * PRIOR_SESSIONS_PER_PORT_DAY
+
+    if store is None:
+        return prior_daily.astype(float), prior_service, np.full(len(stations), SERVICE_CV2)
+
+    observed_hours = max(0.0, (time.time() - store.observed_since) / 3600)
+    daily = np.empty(len(stations))
+    service = np.empty(len(stations))
+    cv2 = np.empty(len(stations))
+
+    for i, station in enumerate(stations):
+        history = store.get_session_history(station["id"]) or {"sessions": 0, "completed": 0}
+        daily[i] = (prior_daily[i] / 24 * PRIOR_WEIGHT_HOURS + history["sessions"]) / (PRIOR_WEIGHT_HOURS + observed_hours) * 24
+
+        completed = history["completed"]
+        if completed >= 5:
+            mean = history["service_total"] / completed
+            variance = max(0.0, history["service_sq"] / completed - mean ** 2)
+            service[i] = max(5.0, mean)
+            cv2[i] = variance / service[i] ** 2
+        else:
+            service[i] = prior_service[i]
+            cv2[i] = SERVICE_CV2
+
+    return daily, service, cv2
+
+def predict_wait_minutes(stations, eta_minutes, now=None, store=None):
+    """Expected wait for a free port at each station when arriving eta_minutes from now.
+
+    Steady-state M/G/c waits for the hour of arrival are blended with the
+    live port state: near-term arrivals mostly see the current queue, later
+    ones mostly see the hourly average. Everything is computed in one batch.
+    """
+    if not stations:
+        return np.array([])
+    now = now or datetime.now()
+    eta_minutes = np.broadcast_to(np.asarray(eta_minutes, dtype=float), (len(stations),))
+
+    daily, service, cv2 = _station_rates(stations, store)
+    arrival_hours = np.array([(now + timedelta(minutes=float(m))).hour for m in eta_minutes])
+    arrivals_per_minute = daily * HOURLY_ARRIVAL_PROFILE[arrival_hours] / 60
+
+    total = np.array([int(s.get("total_ports", 0)) for s in stations])
+    available = np.array([int(s.get("available_ports", 0)) for s in stations])
+    faulted = np.zeros(len(stations), dtype=int)
+    if store is not None:
+        for i, station in enumerate(stations):
+            aggregate = store.get_station_aggregate(station["id"])
+            if aggregate:
+                total[i] = aggregate["total_ports"]
+                available[i] = aggregate["available_ports"]
+                faulted[i] = aggregate["faulted_ports"]
+    working = np.maximum(total - faulted, 0)
+
+    steady = mgc_wait_minutes(arrivals_per_minute, service, working, cv2)
+
+    # With every working port busy, the first one frees up after about service / ports
+    with np.errstate(divide="ignore"):
+        current = np.where(available > 0, 0.0, np.where(working > 0, service / np.maximum(working, 1), MAX_WAIT_MINUTES))
+    weight = np.exp(-eta_minutes / service)
+    return np.minimum(weight * current + (1 - weight) * steady, MAX_WAIT_MINUTES)
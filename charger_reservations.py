@@ -0,0 +1,179 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+
+# Length of one reservation slot (minutes)
+SLOT_MINUTES = 15
+# How far ahead reservations can be made; slot bitmaps wrap around after this (slots)
+HORIZON_SLOTS = 7 * 24 * 60 // SLOT_MINUTES
+# Reservations not checked in this long after their start are released (minutes)
+NO_SHOW_GRACE_MINUTES = 15
+# How early before its start a reservation can be checked in (minutes)
+CHECK_IN_EARLY_MINUTES = 30
+# Number of locks the port bitmaps are striped across
+LOCK_STRIPES = 64
+
+_EPOCH = datetime(2020, 1, 1)
+
+def to_slot(moment):
+    """Absolute slot number containing a datetime"""
+    return int((moment - _EPOCH).total_seconds() // (SLOT_MINUTES * 60))
+
+def from_slot(slot):
+    return _EPOCH + timedelta(minutes=slot * SLOT_MINUTES)
+
+def slot_mask(start_slot, end_slot):
+    """Bitmap with the bits for slots [start_slot, end_slot) set, wrapping at the horizon"""
+    length = end_slot - start_slot
+    offset = start_slot % HORIZON_SLOTS
+    if offset + length <= HORIZON_SLOTS:
+        return ((1 << length) - 1) << offset
+    head = HORIZON_SLOTS - offset
+    return (((1 << head) - 1) << offset) | ((1 << (length - head)) - 1)
+
+class ReservationStore:
+    """Per-port slot bitmaps with compare-and-set booking and automatic no-show release.
+
+    Each port's bookings are one integer bitmap over a rolling horizon. A
+    booking reads the bitmap, checks the requested window is clear and
+    swaps in the new bitmap only if nobody changed it in between, so
+    concurrent bookings never overlap on a port.
+    """
+
+    def __init__(self):
+        self._bitmaps = {}
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._records = {}
+        self._deadlines = []
+        self._records_lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _compare_and_set(self, port_key, expected, new):
+        with self._stripes[hash(port_key) % LOCK_STRIPES]:
+            if self._bitmaps.get(port_key, 0) != expected:
+                return False
+            self._bitmaps[port_key] = new
+            return True
+
+    def _clear_bits(self, port_key, mask):
+        while True:
+            current = self._bitmaps.get(port_key, 0)
+            if self._compare_and_set(port_key, current, current & ~mask):
+                return
+
+    def book(self, station_id, ports, start, duration_minutes, charger_type="Any", user=None):
+        """Reserve the first port matching charger_type that is free for the whole window.
+
+        ports maps connector ids to port records (as returned by
+        ChargerStateStore.get_ports). Returns the reservation dict, or
+        None if every matching port is taken.
+        """
+        now = datetime.now()
+        self.release_expired(now)
+
+        start_slot = to_slot(max(start, now))
+        end_slot = start_slot + max(1, -(-int(duration_minutes) // SLOT_MINUTES))
+        if end_slot - to_slot(now) > HORIZON_SLOTS:
+            return None
+        mask = slot_mask(start_slot, end_slot)
+
+        for connector_id, port in sorted(ports.items()):
+            if charger_type != "Any" and port.get("charger_type") != charger_type:
+                continue
+            if port.get("state") == "faulted":
+                continue
+            port_key = (station_id, connector_id)
+            while True:
+                current = self._bitmaps.get(port_key, 0)
+                if current & mask:
+                    break
+                if self._compare_and_set(port_key, current, current | mask):
+                    return self._record(port_key, start_slot, end_slot, mask, charger_type, user)
+
+        return None
+
+    def _record(self, port_key, start_slot, end_slot, mask, charger_type, user):
+        start = from_slot(start_slot)
+        reservation = {
+            "id": f"RSV{next(self._ids):06d}",
+            "station_id": port_key[0],
+            "connector_id": port_key[1],
+            "charger_type": charger_type,
+            "start": start,
+            "end": from_slot(end_slot),
+            "user": user,
+            "status": "Booked",
+            "_mask": mask
+        }
+        no_show_at = start + timedelta(minutes=NO_SHOW_GRACE_MINUTES)
+        with self._records_lock:
+            self._records[reservation["id"]] = reservation
+            heapq.heappush(self._deadlines, (no_show_at, reservation["id"], "no_show"))
+            heapq.heappush(self._deadlines, (reservation["end"], reservation["id"], "end"))
+        return reservation
+
+    def can_check_in(self, reservation, now=None):
+        now = now or datetime.now()
+        return reservation["status"] == "Booked" and now >= reservation["start"] - timedelta(minutes=CHECK_IN_EARLY_MINUTES)
+
+    def check_in(self, reservation_id, now=None):
+        """Mark a reservation as arrived so it is not released as a no-show"""
+        with self._records_lock:
+            reservation = self._records.get(reservation_id)
+            if reservation is None or not self.can_check_in(reservation, now):
+                return False
+            reservation["status"] = "Checked In"
+            return True
+
+    def cancel(self, reservation_id):
+        return self._release(reservation_id, "Cancelled")
+
+    def _release(self, reservation_id, status):
+        with self._records_lock:
+            reservation = self._records.get(reservation_id)
+            if reservation is None or reservation["status"] not in ("Booked", "Checked In"):
+                return False
+            reservation["status"] = status
+        self._clear_bits((reservation["station_id"], reservation["connector_id"]), reservation["_mask"])
+        return True
+
+    def release_expired(self, now=None):
+        """Free slots of no-shows past their grace period and of finished reservations"""
+        now = now or datetime.now()
+        due = []
+        with self._records_lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                due.append(heapq.heappop(self._deadlines))
+        released = 0
+        for _, reservation_id, kind in due:
+            reservation = self._records.get(reservation_id)
+            if reservation is None:
+                continue
+            if kind == "no_show" and reservation["status"] == "Booked":
+                released += self._release(reservation_id, "No Show")
+            elif kind == "end":
+                released += self._release(reservation_id, "Completed")
+                with self._records_lock:
+                    self._records.pop(reservation_id, None)
+        return released
+
+    def get(self, reservation_id):
+        return self._records.get(reservation_id)
+
+    def is_free(self, station_id, connector_id, start, duration_minutes):
+        start_slot = to_slot(start)
+        end_slot = start_slot + max(1, -(-int(duration_minutes) // SLOT_MINUTES))
+        return not self._bitmaps.get((station_id, connector_id), 0) & slot_mask(start_slot, end_slot)
+
+# Process-wide reservation store shared by every Streamlit session
+_store = None
+_store_lock = threading.Lock()
+
+def get_reservation_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ReservationStore()
+    return _store
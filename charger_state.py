@@ -0,0 +1,292 @@
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Port states tracked by the store
+PORT_IDLE = "idle"
+PORT_CHARGING = "charging"
+PORT_FAULTED = "faulted"
+
+# OCPP StatusNotification values mapped onto the three port states we track
+OCPP_STATUS_MAP = {
+    "Available": PORT_IDLE,
+    "Preparing": PORT_CHARGING,
+    "Charging": PORT_CHARGING,
+    "SuspendedEV": PORT_CHARGING,
+    "SuspendedEVSE": PORT_CHARGING,
+    "Finishing": PORT_CHARGING,
+    "Reserved": PORT_IDLE,
+    "Unavailable": PORT_FAULTED,
+    "Faulted": PORT_FAULTED
+}
+
+# How often the local simulator emits a batch of status events (seconds)
+SIMULATOR_INTERVAL = 5
+# Average number of status changes per port per hour in the simulator
+SIMULATOR_EVENTS_PER_PORT_HOUR = 2.0
+
+def parse_power_kw(power_level, default=7.4):
+    """Extract the kW figure from a power level label such as '50 kW DC'"""
+    match = re.search(r"(\d+(?:\.\d+)?)", str(power_level))
+    return float(match.group(1)) if match else default
+
+def station_status_label(available, faulted, total):
+    """Map port counts to the status labels shown on the EV charging page"""
+    if total and faulted == total:
+        return "Out of Service"
+    if available == 0:
+        return "Fully Occupied"
+    if available < 0.3 * total:
+        return "Limited Availability"
+    return "Operational"
+
+class ChargerStateStore:
+    """Per-port charger state with incrementally maintained per-station aggregates.
+
+    Writers (status events) serialize on a lock and replace a station's
+    aggregate dict in one assignment, so page renders read aggregates
+    without taking the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ports = {}
+        self._station_ports = {}
+        self._aggregates = {}
+        self._history = {}
+        self.observed_since = time.time()
+
+    def register_station(self, station):
+        """Seed ports for a station from its static JSON record"""
+        station_id = station["id"]
+        total = int(station.get("total_ports", 0))
+        available = int(station.get("available_ports", total))
+        charger_types = station.get("charger_types") or ["Unknown"]
+        power_levels = station.get("power_levels") or []
+        now = datetime.now()
+
+        with self._lock:
+            if station_id in self._station_ports:
+                return
+            port_ids = []
+            for i in range(total):
+                port_id = (station_id, i + 1)
+                state = PORT_IDLE if i < available else PORT_CHARGING
+                max_power = parse_power_kw(power_levels[i % len(power_levels)]) if power_levels else 7.4
+                self._ports[port_id] = {
+                    "state": state,
+                    "charger_type": charger_types[i % len(charger_types)],
+                    "max_power_kw": max_power,
+                    "power_kw": max_power if state == PORT_CHARGING else 0.0,
+                    "session_start": now if state == PORT_CHARGING else None
+                }
+                port_ids.append(port_id)
+            self._station_ports[station_id] = port_ids
+            self._aggregates[station_id] = self._build_aggregate(station_id)
+            self._history[station_id] = {"sessions": 0, "completed": 0, "service_total": 0.0, "service_sq": 0.0}
+
+    def _build_aggregate(self, station_id):
+        counts = {PORT_IDLE: 0, PORT_CHARGING: 0, PORT_FAULTED: 0}
+        power = 0.0
+        for port_id in self._station_ports[station_id]:
+            port = self._ports[port_id]
+            counts[port["state"]] += 1
+            power += port["power_kw"]
+        return self._aggregate_from_counts(counts, power, len(self._station_ports[station_id]))
+
+    @staticmethod
+    def _aggregate_from_counts(counts, power, total):
+        return {
+            "total_ports": total,
+            "available_ports": counts[PORT_IDLE],
+            "charging_ports": counts[PORT_CHARGING],
+            "faulted_ports": counts[PORT_FAULTED],
+            "power_kw": round(power, 1),
+            "status": station_status_label(counts[PORT_IDLE], counts[PORT_FAULTED], total),
+            "updated_at": time.time()
+        }
+
+    def apply_status_event(self, event):
+        """Apply an OCPP-like StatusNotification event.
+
+        Expected keys: station_id, connector_id (1-based), status (OCPP value),
+        plus optional power_kw and timestamp. Returns False for unknown ports.
+        """
+        port_id = (event["station_id"], int(event["connector_id"]))
+        new_state = OCPP_STATUS_MAP.get(event["status"], PORT_FAULTED)
+        timestamp = event.get("timestamp") or datetime.now()
+
+        with self._lock:
+            port = self._ports.get(port_id)
+            if port is None:
+                return False
+            old_state = port["state"]
+            old_power = port["power_kw"]
+
+            # Session counts and lengths feed the wait-time predictor
+            history = dict(self._history[port_id[0]])
+            if new_state == PORT_CHARGING and old_state != PORT_CHARGING:
+                history["sessions"] += 1
+            elif old_state == PORT_CHARGING and new_state != PORT_CHARGING and port["session_start"]:
+                minutes = max(0.0, (timestamp - port["session_start"]).total_seconds() / 60)
+                history["completed"] += 1
+                history["service_total"] += minutes
+                history["service_sq"] += minutes ** 2
+            self._history[port_id[0]] = history
+
+            port["state"] = new_state
+            if new_state == PORT_CHARGING:
+                if old_state != PORT_CHARGING:
+                    port["session_start"] = timestamp
+                port["power_kw"] = float(event.get("power_kw", port["max_power_kw"]))
+            else:
+                port["session_start"] = None
+                port["power_kw"] = 0.0
+
+            # Update the station aggregate from the delta instead of recounting ports
+            current = self._aggregates[port_id[0]]
+            counts = {
+                PORT_IDLE: current["available_ports"],
+                PORT_CHARGING: current["charging_ports"],
+                PORT_FAULTED: current["faulted_ports"]
+            }
+            counts[old_state] -= 1
+            counts[new_state] += 1
+            power = current["power_kw"] - old_power + port["power_kw"]
+            self._aggregates[port_id[0]] = self._aggregate_from_counts(counts, max(0.0, power), current["total_ports"])
+        return True
+
+    def get_station_aggregate(self, station_id):
+        """Lock-free read of a station's current aggregate (None if unknown)"""
+        return self._aggregates.get(station_id)
+
+    def get_session_history(self, station_id):
+        """Lock-free read of session counts and total/squared session minutes for a station"""
+        return self._history.get(station_id)
+
+    def get_ports(self, station_id):
+        """Return a copy of the port records for a station, keyed by connector id"""
+        with self._lock:
+            return {
+                port_id[1]: dict(self._ports[port_id])
+                for port_id in self._station_ports.get(station_id, [])
+            }
+
+    def station_ids(self):
+        return list(self._station_ports.keys())
+
+    def apply_to_stations(self, stations):
+        """Return copies of station records with live availability merged in"""
+        merged = []
+        for station in stations:
+            aggregate = self._aggregates.get(station["id"])
+            if aggregate is None:
+                merged.append(station)
+                continue
+            merged.append({
+                **station,
+                "available_ports": aggregate["available_ports"],
+                "total_ports": aggregate["total_ports"],
+                "status": aggregate["status"]
+            })
+        return merged
+
+class ChargerSimulator:
+    """Local stand-in for charger telemetry that emits OCPP-like status events"""
+
+    def __init__(self, store, interval=SIMULATOR_INTERVAL, seed=None):
+        self.store = store
+        self.interval = interval
+        self._rng = random.Random(seed)
+        self._stop = threading.Event()
+        self._thread = None
+        self._port_ids = []
+        self._known_stations = 0
+
+    def _refresh_ports(self):
+        station_ids = self.store.station_ids()
+        self._known_stations = len(station_ids)
+        self._port_ids = [
+            (station_id, connector_id)
+            for station_id in station_ids
+            for connector_id in self.store.get_ports(station_id)
+        ]
+
+    def step(self, elapsed_seconds):
+        """Emit the status events expected over elapsed_seconds; returns how many"""
+        if len(self.store.station_ids()) != self._known_stations:
+            self._refresh_ports()
+        if not self._port_ids:
+            return 0
+
+        # Sample the number of events for the whole network, then pick ports,
+        # so the cost scales with event volume rather than station count
+        expected = len(self._port_ids) * SIMULATOR_EVENTS_PER_PORT_HOUR * elapsed_seconds / 3600
+        num_events = int(expected) + (1 if self._rng.random() < expected - int(expected) else 0)
+
+        for _ in range(num_events):
+            station_id, connector_id = self._rng.choice(self._port_ids)
+            roll = self._rng.random()
+            if roll < 0.02:
+                status = "Faulted"
+            elif roll < 0.5:
+                status = "Charging"
+            else:
+                status = "Available"
+            self.store.apply_status_event({
+                "station_id": station_id,
+                "connector_id": connector_id,
+                "status": status,
+                "timestamp": datetime.now()
+            })
+        return num_events
+
+    def _run(self):
+        last = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            # A bad event must not stop the simulator thread; the next step carries on
+            try:
+                self.step(now - last)
+            except Exception:
+                logger.exception("Charger simulator step failed")
+            last = now
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="charger-simulator", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+# Process-wide store shared by every Streamlit session
+_store = None
+_simulator = None
+_store_lock = threading.Lock()
+
+def get_charger_state_store(stations, start_simulator=True):
+    """Return the shared charger state store, seeding it on first use"""
+    global _store, _simulator
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = ChargerStateStore()
+                for station in stations:
+                    store.register_station(station)
+                if start_simulator:
+                    _simulator = ChargerSimulator(store)
+                    _simulator.start()
+                _store = store
+    else:
+        # Pick up stations added to the data file since the store was seeded
+        for station in stations:
+            if _store.get_station_aggregate(station["id"]) is None:
+                _store.register_station(station)
+    return _store
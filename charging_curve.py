@@ -0,0 +1,139 @@
+import threading
+import numpy as np
+
+# Charging efficiency from the grid to the battery
+DC_EFFICIENCY = 0.85
+AC_EFFICIENCY = 0.9
+# Chargers at or above this power are DC fast chargers (kW)
+DC_THRESHOLD_KW = 50
+# Most onboard AC chargers accept up to this much when the vehicle is unknown (kW)
+DEFAULT_AC_LIMIT_KW = 22
+
+# Generic DC curve, as multiples of battery capacity (C-rate) at each state of charge
+DEFAULT_CURVE_SOC = [0.0, 0.1, 0.5, 0.8, 0.9, 1.0]
+DEFAULT_CURVE_C_RATE = [1.0, 1.5, 1.5, 0.8, 0.4, 0.15]
+
+# Ambient temperature (°C) and the share of peak power the battery accepts
+TEMPERATURE_POINTS = [-10, 0, 10, 25, 35, 45]
+TEMPERATURE_DERATE = [0.4, 0.6, 0.85, 1.0, 0.95, 0.8]
+
+# Number of state-of-charge steps used for numerical integration
+SOC_STEPS = 200
+
+# Piecewise DC curves (state of charge -> kW) for common EVs in Tamil Nadu
+VEHICLE_PROFILES = {
+    "Tata Nexon EV (40.5 kWh)": {
+        "battery_kwh": 40.5,
+        "soc": [0.0, 0.1, 0.5, 0.8, 0.9, 1.0],
+        "power_kw": [30, 50, 48, 30, 15, 5],
+        "ac_limit_kw": 7.2
+    },
+    "MG ZS EV (50.3 kWh)": {
+        "battery_kwh": 50.3,
+        "soc": [0.0, 0.1, 0.6, 0.8, 0.9, 1.0],
+        "power_kw": [45, 76, 70, 40, 20, 7],
+        "ac_limit_kw": 7.4
+    },
+    "Hyundai Kona Electric (39.2 kWh)": {
+        "battery_kwh": 39.2,
+        "soc": [0.0, 0.1, 0.7, 0.8, 0.9, 1.0],
+        "power_kw": [40, 50, 48, 35, 18, 6],
+        "ac_limit_kw": 7.2
+    },
+    "BYD Atto 3 (60.5 kWh)": {
+        "battery_kwh": 60.5,
+        "soc": [0.0, 0.1, 0.5, 0.8, 0.9, 1.0],
+        "power_kw": [60, 88, 85, 50, 25, 8],
+        "ac_limit_kw": 7.0
+    }
+}
+
+def temperature_derate(temperature_c):
+    """Share of peak charging power available at an ambient temperature"""
+    return float(np.interp(temperature_c, TEMPERATURE_POINTS, TEMPERATURE_DERATE))
+
+class ChargingCurve:
+    """Battery charging model that turns charger power and SOC into charging time.
+
+    Accepted power is the lower of the charger's output and the vehicle's
+    curve at each state of charge, derated for temperature. Cumulative
+    time-to-SOC tables are integrated once per (charger power, temperature)
+    for a whole batch of powers, so repeated estimates are lookups.
+    """
+
+    def __init__(self, battery_kwh, soc_points=None, power_points=None, ac_limit_kw=DEFAULT_AC_LIMIT_KW):
+        self.battery_kwh = float(battery_kwh)
+        self.soc_points = np.asarray(soc_points if soc_points is not None else DEFAULT_CURVE_SOC, dtype=float)
+        if power_points is None:
+            power_points = np.asarray(DEFAULT_CURVE_C_RATE) * self.battery_kwh
+        self.power_points = np.asarray(power_points, dtype=float)
+        self.ac_limit_kw = ac_limit_kw
+        self.soc_grid = np.linspace(0.0, 1.0, SOC_STEPS + 1)
+        self._curve_on_grid = np.interp(self.soc_grid, self.soc_points, self.power_points)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_vehicle(cls, name):
+        profile = VEHICLE_PROFILES[name]
+        return cls(profile["battery_kwh"], profile["soc"], profile["power_kw"], profile["ac_limit_kw"])
+
+    def accepted_power(self, charger_powers, temperature_c=25):
+        """Power (kW) delivered at every grid SOC, one row per charger power"""
+        charger_powers = np.asarray(charger_powers, dtype=float).reshape(-1, 1)
+        is_dc = charger_powers >= DC_THRESHOLD_KW
+        # AC power goes through the onboard charger, DC follows the battery's curve
+        vehicle_limit = np.where(is_dc, self._curve_on_grid[None, :], self.ac_limit_kw)
+        return np.minimum(charger_powers, vehicle_limit) * temperature_derate(temperature_c)
+
+    def _time_tables(self, charger_powers, temperature_c):
+        """Cumulative minutes from 0% to each grid SOC, one row per charger power"""
+        charger_powers = [float(p) for p in np.atleast_1d(charger_powers)]
+        missing = [p for p in dict.fromkeys(charger_powers) if (p, temperature_c) not in self._tables]
+
+        if missing:
+            power = self.accepted_power(missing, temperature_c)
+            efficiency = np.where(np.asarray(missing) >= DC_THRESHOLD_KW, DC_EFFICIENCY, AC_EFFICIENCY)
+            # Minutes per unit of SOC, integrated with the trapezoid rule
+            rate = self.battery_kwh / (np.maximum(power, 1e-6) * efficiency[:, None]) * 60
+            step = self.soc_grid[1] - self.soc_grid[0]
+            cumulative = np.zeros_like(rate)
+            cumulative[:, 1:] = np.cumsum((rate[:, 1:] + rate[:, :-1]) / 2 * step, axis=1)
+            with self._lock:
+                for p, row in zip(missing, cumulative):
+                    self._tables[(p, temperature_c)] = row
+
+        return np.array([self._tables[(p, temperature_c)] for p in charger_powers])
+
+    def charge_minutes(self, charger_powers, start_soc, target_socs, temperature_c=25):
+        """Minutes to charge from start_soc to each target, for each charger power.
+
+        Returns an array shaped (len(charger_powers), len(target_socs)).
+        """
+        tables = self._time_tables(charger_powers, temperature_c)
+        targets = np.clip(np.atleast_1d(np.asarray(target_socs, dtype=float)), 0.0, 1.0)
+        start = float(np.clip(start_soc, 0.0, 1.0))
+
+        # Linear interpolation into each row's cumulative table, all rows at once
+        position = targets * SOC_STEPS
+        low = np.minimum(position.astype(int), SOC_STEPS - 1)
+        fraction = position - low
+        at_target = tables[:, low] * (1 - fraction) + tables[:, low + 1] * fraction
+        at_start = np.array([np.interp(start, self.soc_grid, row) for row in tables])
+        return np.maximum(at_target - at_start[:, None], 0.0)
+
+# Curves shared across reruns, keyed by battery capacity or vehicle name
+_curve_cache = {}
+
+def get_charging_curve(battery_kwh=None, vehicle=None):
+    """Return a cached charging curve for a known vehicle or a generic battery size"""
+    key = vehicle if vehicle in VEHICLE_PROFILES else float(battery_kwh)
+    curve = _curve_cache.get(key)
+    if curve is None:
+        curve = ChargingCurve.for_vehicle(vehicle) if vehicle in VEHICLE_PROFILES else ChargingCurve(battery_kwh)
+        _curve_cache[key] = curve
+    return curve
+
+def estimate_charge_minutes(battery_kwh, from_soc, to_socs, power_kw, temperature_c=25):
+    """Minutes to charge from from_soc to each of to_socs at one charger (1-D array)"""
+    return get_charging_curve(battery_kwh).charge_minutes([power_kw], from_soc, to_socs, temperature_c)[0]
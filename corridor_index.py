@@ -0,0 +1,119 @@
+import math
+import threading
+from collections import defaultdict
+import numpy as np
+
+# Grid cell size for the point index (km)
+GRID_CELL_KM = 10
+KM_PER_DEGREE = 111.32
+# Reference latitude for the flat projection (centre of Tamil Nadu)
+REFERENCE_LAT = 11.1271
+
+def project_km(coords):
+    """Project [lat, lng] pairs onto a flat km plane centred on Tamil Nadu"""
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    x = coords[:, 1] * KM_PER_DEGREE * math.cos(math.radians(REFERENCE_LAT))
+    y = coords[:, 0] * KM_PER_DEGREE
+    return np.column_stack([x, y])
+
+class CorridorIndex:
+    """Grid index over points that answers 'what lies within X km of this route'"""
+
+    def __init__(self, items, get_coords=None, cell_km=GRID_CELL_KM):
+        get_coords = get_coords or (lambda item: item["coordinates"])
+        self.items = list(items)
+        self.cell_km = cell_km
+        self.points = project_km([get_coords(item) for item in self.items]) if self.items else np.empty((0, 2))
+
+        cells = defaultdict(list)
+        for i, (x, y) in enumerate(self.points):
+            cells[(int(math.floor(x / cell_km)), int(math.floor(y / cell_km)))].append(i)
+        self.cells = {cell: np.array(ids) for cell, ids in cells.items()}
+
+    def _segment_grid(self, start, end, buffer_km):
+        """Map each grid cell touched by a buffered segment to the segments that touch it"""
+        grid = defaultdict(list)
+        low = np.minimum(start, end) - buffer_km
+        high = np.maximum(start, end) + buffer_km
+        low_cells = np.floor(low / self.cell_km).astype(int)
+        high_cells = np.floor(high / self.cell_km).astype(int)
+
+        # Only keep cells whose centre lies close enough to the segment itself, so
+        # long diagonal segments don't claim their whole bounding box
+        reach = buffer_km + self.cell_km * 0.7072
+        for seg, (lo, hi) in enumerate(zip(low_cells, high_cells)):
+            cx, cy = np.meshgrid(np.arange(lo[0], hi[0] + 1), np.arange(lo[1], hi[1] + 1))
+            cell_ids = np.column_stack([cx.ravel(), cy.ravel()])
+            centres = (cell_ids + 0.5) * self.cell_km
+            distances, _ = point_segment_distance(centres, start[seg:seg + 1], end[seg:seg + 1])
+            for cell in cell_ids[distances[:, 0] <= reach]:
+                grid[(int(cell[0]), int(cell[1]))].append(seg)
+        return grid
+
+    def query(self, polyline, buffer_km):
+        """Items within buffer_km of a [lat, lng] polyline, ordered by distance along it.
+
+        Returns a list of dicts with the item, its offset from the route
+        ("offset_km") and how far along the route it lies ("along_km").
+        """
+        if len(self.items) == 0 or len(polyline) == 0:
+            return []
+
+        route = project_km(polyline)
+        if len(route) == 1:
+            route = np.vstack([route, route])
+        start, end = route[:-1], route[1:]
+        seg_lengths = np.hypot(*(end - start).T)
+        seg_offsets = np.concatenate([[0.0], np.cumsum(seg_lengths)[:-1]])
+
+        best_offset = {}
+        best_along = {}
+        for cell, segments in self._segment_grid(start, end, buffer_km).items():
+            point_ids = self.cells.get(cell)
+            if point_ids is None:
+                continue
+            segments = np.array(segments)
+            distances, fractions = point_segment_distance(self.points[point_ids], start[segments], end[segments])
+            nearest = np.argmin(distances, axis=1)
+            rows = np.arange(len(point_ids))
+            offsets = distances[rows, nearest]
+            along = seg_offsets[segments[nearest]] + fractions[rows, nearest] * seg_lengths[segments[nearest]]
+
+            for point_id, offset, position in zip(point_ids, offsets, along):
+                if offset <= buffer_km and offset < best_offset.get(point_id, np.inf):
+                    best_offset[point_id] = float(offset)
+                    best_along[point_id] = float(position)
+
+        results = [
+            {"item": self.items[i], "offset_km": best_offset[i], "along_km": best_along[i]}
+            for i in best_offset
+        ]
+        results.sort(key=lambda r: r["along_km"])
+        return results
+
+def point_segment_distance(points, start, end):
+    """Distances (points x segments) and the projection fraction along each segment"""
+    direction = end - start
+    length_sq = np.einsum("ij,ij->i", direction, direction)
+    relative = points[:, None, :] - start[None, :, :]
+    safe_length = np.where(length_sq > 0, length_sq, 1.0)
+    fractions = np.clip(np.einsum("ijk,jk->ij", relative, direction) / safe_length, 0.0, 1.0)
+    closest = start[None, :, :] + fractions[:, :, None] * direction[None, :, :]
+    distances = np.hypot(*(points[:, None, :] - closest).transpose(2, 0, 1))
+    return distances, fractions
+
+# Indexes shared across reruns, keyed by dataset name and record ids
+_index_cache = {}
+_index_lock = threading.Lock()
+
+def get_corridor_index(name, items, get_coords=None):
+    """Return a cached corridor index for a named dataset (stations, toll_plazas, parking)"""
+    key = (name, tuple(item.get("id", i) for i, item in enumerate(items)))
+    index = _index_cache.get(name)
+    if index is None or index[0] != key:
+        with _index_lock:
+            index = _index_cache.get(name)
+            if index is None or index[0] != key:
+                index = (key, CorridorIndex(items, get_coords))
+                _index_cache[name] = index
+    return index[1]
@@ -0,0 +1,241 @@
+import heapq
+import itertools
+
+from charger_state import parse_power_kw
+from charging_curve import estimate_charge_minutes
+from charger_queue import predict_wait_minutes
+from road_network import AVERAGE_SPEED_KMPH, ROAD_DETOUR_FACTOR, city_node, haversine_matrix, station_node
+from route_geometry import encode_polyline
+
+# Default battery size when the vehicle's capacity is not known (kWh)
+DEFAULT_BATTERY_KWH = 60
+# Never plan to arrive anywhere below this state of charge
+RESERVE_SOC = 0.10
+# State-of-charge levels a stop may charge up to
+CHARGE_TARGETS = (0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+# Fixed time lost per stop for leaving the highway, parking and plugging in
+STOP_OVERHEAD_MINUTES = 5
+# Resolution at which charge levels are compared when pruning labels at a node
+SOC_RESOLUTION = 0.01
+# Stations further than this from the direct road path are not considered (km)
+CORRIDOR_KM = 40
+# Largest power an AC charger can deliver (kW)
+MAX_AC_POWER_KW = 22
+
+def station_power_kw(station, charger_type="Any"):
+    """Best power level (kW) a station offers for the requested charger type"""
+    powers = [parse_power_kw(level) for level in station.get("power_levels", [])]
+    if not powers:
+        return 7.4
+    if "AC" in charger_type:
+        ac_powers = [p for p in powers if p <= MAX_AC_POWER_KW]
+        return max(ac_powers) if ac_powers else min(powers)
+    return max(powers)
+
+def _table_minutes(table, soc):
+    """Interpolate a cumulative whole-percent charging table at a state of charge"""
+    position = min(max(soc, 0.0), 1.0) * 100
+    low = min(int(position), 99)
+    return table[low] + (table[low + 1] - table[low]) * (position - low)
+
+def _dominated(front, time, soc):
+    return any(t <= time and s >= soc for t, s in front)
+
+def _add_to_front(front, time, soc):
+    front[:] = [(t, s) for t, s in front if not (time <= t and soc >= s)]
+    front.append((time, soc))
+
+def plan_ev_route(network, stations, start_city, end_city, vehicle_range, current_charge,
+                  battery_kwh=DEFAULT_BATTERY_KWH, preferred_charger="Any",
+                  reserve_soc=RESERVE_SOC, charge_time_fn=None, wait_time_fn=None,
+                  corridor_km=CORRIDOR_KM):
+    """Fastest EV route between two cities, including where and how long to charge.
+
+    Runs a label-setting search over the road network where each label carries
+    elapsed time and state of charge. Labels that are slower and emptier than
+    another label at the same node are dropped, and charging stations spawn
+    one label per target charge level. The first label to reach the
+    destination is the fastest feasible plan.
+
+    With corridor_km set, the search is limited to nodes within that distance
+    of the direct road path, falling back to the whole network if no plan
+    fits inside the corridor.
+
+    charge_time_fn(battery_kwh, from_soc, target_socs, power_kw) returns
+    minutes for each target and is called once per distinct station power;
+    wait_time_fn(stations, eta_minutes) returns the expected wait at each
+    station and is called once for all candidate stops.
+    """
+    if corridor_km:
+        _, direct_path = network.shortest_path(city_node(start_city), city_node(end_city))
+        if direct_path:
+            allowed = set(network.nodes_near_path(direct_path, corridor_km)) | set(direct_path)
+            plan = _search(network, stations, start_city, end_city, vehicle_range, current_charge,
+                           battery_kwh, preferred_charger, reserve_soc, charge_time_fn, wait_time_fn, allowed)
+            if plan["found"]:
+                return plan
+
+    return _search(network, stations, start_city, end_city, vehicle_range, current_charge,
+                   battery_kwh, preferred_charger, reserve_soc, charge_time_fn, wait_time_fn, None)
+
+def _search(network, stations, start_city, end_city, vehicle_range, current_charge,
+            battery_kwh, preferred_charger, reserve_soc, charge_time_fn, wait_time_fn, allowed):
+    charge_time_fn = charge_time_fn or estimate_charge_minutes
+    wait_time_fn = wait_time_fn or predict_wait_minutes
+
+    source = city_node(start_city)
+    target = city_node(end_city)
+    consumption_per_km = 1.0 / vehicle_range
+    start_soc = current_charge / 100
+
+    # Only stations that are in service and offer the preferred connector can be used as stops
+    chargeable = {}
+    for station in stations:
+        if station.get("status") == "Out of Service":
+            continue
+        if preferred_charger != "Any" and preferred_charger not in station.get("charger_types", []):
+            continue
+        node = station_node(station["id"])
+        if node in network.nodes and (allowed is None or node in allowed):
+            chargeable[node] = station
+
+    # Predict queues for every candidate stop in one batch, at a rough ETA
+    # from its straight-line distance to the start
+    candidate_nodes = list(chargeable.keys())
+    waits = {}
+    if candidate_nodes:
+        from_start = haversine_matrix(network.nodes[source], [network.nodes[n] for n in candidate_nodes])[0]
+        etas = from_start * ROAD_DETOUR_FACTOR / AVERAGE_SPEED_KMPH * 60
+        waits = dict(zip(candidate_nodes, wait_time_fn([chargeable[n] for n in candidate_nodes], etas)))
+
+    # A* bound: drive the straight-line distance at average speed, and charge any
+    # energy shortfall for it at the fastest rate the best charger ever reaches
+    target_coords = network.nodes[target]
+    node_ids = list(network.nodes.keys())
+    straight_line = haversine_matrix(target_coords, [network.nodes[n] for n in node_ids])[0]
+    remaining_km = dict(zip(node_ids, straight_line))
+    # Cumulative minutes from 0% to each whole percent, one table per station power
+    station_power = {node: station_power_kw(station, preferred_charger) for node, station in chargeable.items()}
+    soc_steps = [i / 100 for i in range(101)]
+    charge_tables = {
+        power: [float(m) for m in charge_time_fn(battery_kwh, 0.0, soc_steps, power)]
+        for power in set(station_power.values())
+    }
+    best_power = max(charge_tables, default=None)
+    if best_power is None:
+        minutes_per_soc = 0.0
+    else:
+        table = charge_tables[best_power]
+        minutes_per_soc = min(b - a for a, b in zip(table, table[1:])) * 100
+
+    def lower_bound(node, soc):
+        shortfall = remaining_km[node] * consumption_per_km - (soc - reserve_soc)
+        return remaining_km[node] / AVERAGE_SPEED_KMPH * 60 + max(0.0, shortfall) * minutes_per_soc
+
+    labels = []
+    fronts = {}
+    counter = itertools.count()
+    heap = []
+
+    def push(node, time, soc, distance, parent, charged, stop=None):
+        front = fronts.setdefault((node, charged), [])
+        bucket = int(soc / SOC_RESOLUTION)
+        if _dominated(front, time, bucket):
+            return
+        _add_to_front(front, time, bucket)
+        labels.append({
+            "node": node,
+            "time": time,
+            "soc": soc,
+            "distance": distance,
+            "parent": parent,
+            "charged": charged,
+            "bucket": bucket,
+            "stop": stop
+        })
+        heapq.heappush(heap, (time + lower_bound(node, soc), next(counter), len(labels) - 1))
+
+    push(source, 0.0, start_soc, 0.0, None, False)
+
+    while heap:
+        _, _, index = heapq.heappop(heap)
+        label = labels[index]
+        node = label["node"]
+        if (label["time"], label["bucket"]) not in fronts[(node, label["charged"])]:
+            continue
+        if node == target:
+            return _build_plan(network, labels, index, start_soc, vehicle_range)
+
+        # Drive to each neighbour the remaining charge can reach
+        for neighbour, edge_id in network.adjacency[node]:
+            if allowed is not None and neighbour not in allowed:
+                continue
+            edge = network.edges[edge_id]
+            soc = label["soc"] - edge["distance"] * consumption_per_km
+            if soc < reserve_soc:
+                continue
+            push(neighbour, label["time"] + edge["time"], soc,
+                 label["distance"] + edge["distance"], index, False)
+
+        # Charge here, once per arrival, to each target level
+        station = chargeable.get(node)
+        if station is None or label["charged"]:
+            continue
+        power = station_power[node]
+        table = charge_tables[power]
+        wait = float(waits[node])
+        for target_soc in CHARGE_TARGETS:
+            if target_soc <= label["soc"] + 0.05:
+                continue
+            charge = _table_minutes(table, target_soc) - _table_minutes(table, label["soc"])
+            push(node, label["time"] + STOP_OVERHEAD_MINUTES + wait + charge, target_soc, label["distance"], index, True, {
+                "station": station,
+                "distance_from_start": label["distance"],
+                "arrival_minutes": label["time"],
+                "arrival_soc": label["soc"],
+                "departure_soc": target_soc,
+                "power_kw": power,
+                "wait_time": wait,
+                "charging_time": charge + STOP_OVERHEAD_MINUTES
+            })
+
+    return {"found": False}
+
+def _build_plan(network, labels, index, start_soc, vehicle_range):
+    chain = []
+    while index is not None:
+        chain.append(labels[index])
+        index = labels[index]["parent"]
+    chain.reverse()
+
+    path = []
+    for label in chain:
+        if not path or path[-1] != label["node"]:
+            path.append(label["node"])
+
+    stops = [label["stop"] for label in chain if label["stop"]]
+    final = chain[-1]
+    wait_minutes = sum(stop["wait_time"] for stop in stops)
+    charge_minutes = sum(stop["charging_time"] for stop in stops)
+
+    soc_profile = [{"distance": 0.0, "soc": start_soc * 100, "location": "Start"}]
+    for i, stop in enumerate(stops):
+        soc_profile.append({"distance": stop["distance_from_start"], "soc": stop["arrival_soc"] * 100,
+                            "location": f"Arriving at Stop {i+1}"})
+        soc_profile.append({"distance": stop["distance_from_start"], "soc": stop["departure_soc"] * 100,
+                            "location": f"Leaving Stop {i+1}"})
+    soc_profile.append({"distance": final["distance"], "soc": final["soc"] * 100, "location": "Destination"})
+
+    return {
+        "found": True,
+        "path": path,
+        "polyline": encode_polyline(network.path_coords(path)),
+        "distance_km": final["distance"],
+        "total_minutes": final["time"],
+        "wait_minutes": wait_minutes,
+        "charge_minutes": charge_minutes,
+        "drive_minutes": final["time"] - wait_minutes - charge_minutes,
+        "stops": stops,
+        "soc_profile": soc_profile,
+        "arrival_soc": final["soc"]
+    }
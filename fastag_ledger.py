@@ -0,0 +1,298 @@
+import logging
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Directory holding one append-only file per ledger column
+LEDGER_DIR = "data/fastag_ledger"
+TOLL = 0
+RECHARGE = 1
+# Balance carried over when existing history is imported
+OPENING = 2
+# Balance below which a vehicle is flagged for recharge (₹)
+LOW_BALANCE_THRESHOLD = 200
+# Fleet vehicles expected to run out within this many days are flagged too
+RUNWAY_ALERT_DAYS = 7
+# Column name -> array typecode; rows line up by position across columns
+COLUMNS = {
+    "vehicle": "i",   # string id of the vehicle registration
+    "timestamp": "q", # seconds since the epoch
+    "kind": "b",      # TOLL, RECHARGE or OPENING
+    "amount": "d",    # signed: tolls are negative, recharges positive
+    "balance": "d",   # running balance after this transaction
+    "label": "i",     # string id of the toll plaza or payment method
+    "status": "i"     # string id of the status
+}
+
+def _timestamp(record):
+    """Seconds since the epoch for a stored transaction's date and time fields"""
+    date = record.get("date", "")
+    for text in (f"{date} {record.get('time', '')}".strip(), date):
+        try:
+            return int(datetime.fromisoformat(text).timestamp())
+        except ValueError:
+            continue
+    return 0
+
+class FastagLedger:
+    """Append-only FASTag transaction ledger stored column by column.
+
+    Every toll and recharge is a row appended to typed column files, with
+    the balance after it stored alongside, so a vehicle's balance is read
+    from its latest row rather than summed. Row offsets are indexed by
+    vehicle and by vehicle and kind, which makes the balance, the last
+    recharge and any page of history a direct lookup, and date ranges a
+    binary search.
+    """
+
+    def __init__(self, path=LEDGER_DIR):
+        self.path = path
+        self.columns = {name: array(code) for name, code in COLUMNS.items()}
+        self._strings = []
+        self._string_ids = {}
+        self._by_vehicle = defaultdict(lambda: array("q"))
+        self._by_kind = defaultdict(lambda: array("q"))
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        strings_path = os.path.join(self.path, "strings.txt")
+        try:
+            with open(strings_path, "rb+") as f:
+                data = f.read()
+                # A write cut short leaves a partial last string; cut it off on disk too,
+                # or the next append joins onto it and shifts every later id
+                if data and not data.endswith(b"\n"):
+                    data = data[:data.rfind(b"\n") + 1]
+                    f.truncate(len(data))
+                    logger.warning("Dropped a partial last string from %s", strings_path)
+        except FileNotFoundError:
+            return
+        # Split on "\n" only, the one separator _string_id keeps out of strings; splitlines()
+        # would also break at "\r", "\u2028" and the like and shift every later id
+        self._strings = data.decode("utf-8").split("\n")[:-1]
+        self._string_ids = {s: i for i, s in enumerate(self._strings)}
+
+        for name, column in self.columns.items():
+            try:
+                with open(os.path.join(self.path, f"{name}.bin"), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            # Leave out a partly written item at the end
+            column.frombytes(data[:len(data) - len(data) % column.itemsize])
+
+        # A write cut short leaves some columns longer than others; drop the partial row,
+        # on disk as well, so the next append lines up across the column files again
+        rows = min(len(column) for column in self.columns.values())
+        for name, column in self.columns.items():
+            del column[rows:]
+            file_path = os.path.join(self.path, f"{name}.bin")
+            if os.path.exists(file_path) and os.path.getsize(file_path) != rows * column.itemsize:
+                os.truncate(file_path, rows * column.itemsize)
+                logger.warning("Dropped a partly written row from %s", file_path)
+
+        vehicles, kinds = self.columns["vehicle"], self.columns["kind"]
+        for row in range(rows):
+            self._by_vehicle[vehicles[row]].append(row)
+            self._by_kind[vehicles[row], kinds[row]].append(row)
+
+    def __len__(self):
+        return len(self.columns["vehicle"])
+
+    def _string_id(self, text, new_strings):
+        text = str(text or "").replace("\n", " ")
+        string_id = self._string_ids.get(text)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._strings.append(text)
+            self._string_ids[text] = string_id
+            new_strings.append(text)
+        return string_id
+
+    def _write(self, first_row, new_strings):
+        os.makedirs(self.path, exist_ok=True)
+        if new_strings:
+            with open(os.path.join(self.path, "strings.txt"), "a", encoding="utf-8", newline="") as f:
+                f.write("".join(s + "\n" for s in new_strings))
+        for name, column in self.columns.items():
+            with open(os.path.join(self.path, f"{name}.bin"), "ab") as f:
+                column[first_row:].tofile(f)
+
+    def _append_rows(self, entries):
+        """Append (registration, timestamp, kind, amount, label, status) rows in order"""
+        with self._lock:
+            first_row = len(self)
+            new_strings = []
+            for registration, timestamp, kind, amount, label, status in entries:
+                vehicle = self._string_id(registration, new_strings)
+                offsets = self._by_vehicle[vehicle]
+                previous = self.columns["balance"][offsets[-1]] if offsets else 0.0
+                row = len(self)
+                self.columns["vehicle"].append(vehicle)
+                self.columns["timestamp"].append(int(timestamp))
+                self.columns["kind"].append(kind)
+                self.columns["amount"].append(float(amount))
+                self.columns["balance"].append(previous + float(amount))
+                self.columns["label"].append(self._string_id(label, new_strings))
+                self.columns["status"].append(self._string_id(status, new_strings))
+                offsets.append(row)
+                self._by_kind[vehicle, kind].append(row)
+            self._write(first_row, new_strings)
+            return first_row
+
+    def _row(self, row):
+        when = datetime.fromtimestamp(self.columns["timestamp"][row])
+        kind = self.columns["kind"][row]
+        label = self._strings[self.columns["label"][row]]
+        return {
+            "row": row,
+            "vehicle_reg": self._strings[self.columns["vehicle"][row]],
+            "kind": {TOLL: "Toll", RECHARGE: "Recharge"}.get(kind, "Opening balance"),
+            "date": when.strftime("%Y-%m-%d"),
+            "time": when.strftime("%H:%M"),
+            "toll_plaza": label if kind == TOLL else "",
+            "payment_method": label if kind == RECHARGE else "",
+            "amount": abs(self.columns["amount"][row]),
+            "balance": self.columns["balance"][row],
+            "status": self._strings[self.columns["status"][row]]
+        }
+
+    def _offsets(self, registration, kind=None):
+        vehicle = self._string_ids.get(registration)
+        index = self._by_vehicle if kind is None else self._by_kind
+        key = vehicle if kind is None else (vehicle, kind)
+        return index.get(key, array("q")) if vehicle is not None else array("q")
+
+    def record_toll(self, registration, toll_plaza, amount, status="Success", when=None):
+        timestamp = (when or datetime.now()).timestamp()
+        row = self._append_rows([(registration, timestamp, TOLL, -abs(amount), toll_plaza, status)])
+        return self._row(row)
+
+    def recharge(self, registration, amount, payment_method, status="Success", when=None):
+        timestamp = (when or datetime.now()).timestamp()
+        row = self._append_rows([(registration, timestamp, RECHARGE, abs(amount), payment_method, status)])
+        return self._row(row)
+
+    def import_history(self, fastag_data):
+        """Load the stored vehicles, tolls and recharges into an empty ledger.
+
+        Each vehicle gets an opening entry so that its running balance ends
+        at the balance already on record.
+        """
+        entries = [
+            (t["vehicle_reg"], _timestamp(t), TOLL, -abs(t["amount"]), t.get("toll_plaza", ""), t.get("status", "Success"))
+            for t in fastag_data.get("recent_transactions", [])
+        ] + [
+            (r["vehicle_reg"], _timestamp(r), RECHARGE, abs(r["amount"]), r.get("payment_method", ""), r.get("status", "Success"))
+            for r in fastag_data.get("recharge_history", [])
+        ]
+        entries.sort(key=lambda entry: entry[1])
+
+        net = defaultdict(float)
+        for registration, _, _, amount, _, _ in entries:
+            net[registration] += amount
+        opening = [
+            (v["registration"], entries[0][1] if entries else 0, OPENING, v.get("balance", 0) - net[v["registration"]], "Opening balance", "Success")
+            for v in fastag_data.get("user_data", {}).get("vehicles", [])
+        ]
+        self._append_rows(opening + entries)
+
+    def balance(self, registration):
+        """Current balance of a vehicle, or None if it has no transactions"""
+        offsets = self._offsets(registration)
+        return self.columns["balance"][offsets[-1]] if offsets else None
+
+    def last_recharge(self, registration):
+        offsets = self._offsets(registration, RECHARGE)
+        return self._row(offsets[-1]) if offsets else None
+
+    def last_transaction(self, registration):
+        """A vehicle's latest toll or recharge, or None"""
+        offsets = self._offsets(registration)
+        kinds = self.columns["kind"]
+        # Only the first row of a vehicle can be its opening balance
+        for row in reversed(offsets[-2:]):
+            if kinds[row] != OPENING:
+                return self._row(row)
+        return None
+
+    def history(self, registration, page=0, page_size=20, kind=None):
+        """One page of a vehicle's transactions, newest first, and the total count"""
+        offsets = self._offsets(registration, kind)
+        end = len(offsets) - page * page_size
+        start = max(0, end - page_size)
+        return [self._row(row) for row in reversed(offsets[start:max(0, end)])], len(offsets)
+
+    def between(self, registration, start, end):
+        """A vehicle's transactions from start to end (datetimes), oldest first"""
+        offsets = self._offsets(registration)
+        timestamps = self.columns["timestamp"]
+        low = bisect_left(offsets, start.timestamp(), key=lambda row: timestamps[row])
+        high = bisect_right(offsets, end.timestamp(), key=lambda row: timestamps[row])
+        return [self._row(row) for row in offsets[low:high]]
+
+    def fleet_summary(self, registrations, days=30, threshold=LOW_BALANCE_THRESHOLD, alert_days=RUNWAY_ALERT_DAYS, now=None):
+        """Balances, recent spend and days until empty for many vehicles at once.
+
+        Toll spend over the last `days` is summed for every vehicle in one
+        pass over the ledger's columns. Returns a dict of arrays aligned
+        with registrations: "registration", "known", "balance", "spend",
+        "daily_spend", "days_to_empty", "low_balance" and "runs_out_soon".
+        Unknown vehicles get NaN balances and are not flagged.
+        """
+        now = (now or datetime.now()).timestamp()
+        with self._lock:
+            # Copies, so the columns stay free to grow while the arrays are in use
+            vehicle, timestamp, kind, amount, balances = (
+                np.array(self.columns[name]) for name in ("vehicle", "timestamp", "kind", "amount", "balance")
+            )
+            string_count = len(self._strings)
+            ids = np.array([self._string_ids.get(r, -1) for r in registrations], dtype=np.int64)
+            last_rows = np.full(len(ids), -1, dtype=np.int64)
+            for n, string_id in enumerate(ids.tolist()):
+                offsets = self._by_vehicle.get(string_id)
+                if offsets:
+                    last_rows[n] = offsets[-1]
+
+        recent = (kind == TOLL) & (timestamp >= now - days * 86400)
+        spend_by_string = np.bincount(vehicle[recent], weights=-amount[recent], minlength=string_count)
+
+        known = last_rows >= 0
+        balance = np.where(known, balances[np.maximum(last_rows, 0)] if len(balances) else 0, np.nan)
+        spend = np.where(ids >= 0, spend_by_string[np.maximum(ids, 0)] if string_count else 0, 0.0)
+        daily_spend = spend / days
+        with np.errstate(divide="ignore", invalid="ignore"):
+            days_to_empty = np.where(daily_spend > 0, np.maximum(balance, 0) / daily_spend, np.inf)
+        return {
+            "registration": list(registrations),
+            "known": known,
+            "balance": balance,
+            "spend": spend,
+            "daily_spend": daily_spend,
+            "days_to_empty": days_to_empty,
+            "low_balance": known & (balance < threshold),
+            "runs_out_soon": known & (days_to_empty < alert_days)
+        }
+
+# Ledger shared by every Streamlit session
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_fastag_ledger(fastag_data=None):
+    """Return the shared ledger, importing fastag_data into it the first time it is empty"""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                ledger = FastagLedger()
+                if not len(ledger) and fastag_data:
+                    ledger.import_history(fastag_data)
+                _ledger = ledger
+    return _ledger
@@ -2,6 +2,7 @@ import streamlit as st
 import json
 import requests
 import time
+import threading
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -13,31 +14,107 @@ from firebase_admin.exceptions import FirebaseError
 load_dotenv()
 
 # Firebase configuration
-FIREBASE_CONFIG = {
-    "type": "service_account",
-    "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-    "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-    "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace('\\n', '\n'),
-    "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-    "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-    "token_uri": "https://oauth2.googleapis.com/token",
-    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-    "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_CERT_URL")
-}
+def firebase_config():
+    """Service account credentials from the environment"""
+    private_key = os.getenv("FIREBASE_PRIVATE_KEY")
+    if not private_key:
+        raise RuntimeError("Firebase is not configured: FIREBASE_PRIVATE_KEY is not set")
+    return {
+        "type": "service_account",
+        "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+        "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+        "private_key": private_key.replace('\\n', '\n'),
+        "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+        "client_id": os.getenv("FIREBASE_CLIENT_ID"),
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+        "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_CERT_URL")
+    }
 
 # Google Maps API Key
 GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate(FIREBASE_CONFIG)
-firebase_admin.initialize_app(cred, {
-    'databaseURL': os.getenv("FIREBASE_DATABASE_URL")
-})
+# Firebase app and clients shared by every Streamlit session, created on first use
+_app = None
+_firestore = None
+_app_lock = threading.Lock()
 
-# Get database and firestore instances
-rtdb = db.reference()
-db_store = firestore.client()
+# HTTP connections to Google APIs are kept open between requests
+_http = requests.Session()
+
+# Realtime Database reads are served from memory for this long (seconds)
+RTDB_CACHE_TTL_SECONDS = 60
+# Cached paths kept before the cache is reset
+RTDB_CACHE_SIZE = 1024
+
+class RtdbCache:
+    """Read-through cache of Realtime Database paths.
+
+    Writes made through this module invalidate the written path along
+    with every cached path above or below it. A read that overlaps a
+    write is returned but not cached.
+    """
+
+    def __init__(self, ttl=RTDB_CACHE_TTL_SECONDS, size=RTDB_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._entries = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, fetch):
+        path = path.strip("/")
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] > time.time():
+            return entry[1]
+        generation = self._generation
+        data = fetch()
+        with self._lock:
+            if generation == self._generation:
+                if len(self._entries) >= self.size:
+                    self._entries.clear()
+                self._entries[path] = (time.time() + self.ttl, data)
+        return data
+
+    def invalidate(self, path):
+        path = path.strip("/")
+        with self._lock:
+            self._generation += 1
+            for cached in list(self._entries):
+                if not path or not cached or cached == path or cached.startswith(path + "/") or path.startswith(cached + "/"):
+                    del self._entries[cached]
+
+_rtdb_cache = RtdbCache()
+
+def get_firebase_app():
+    """Return the Firebase app, initializing the Admin SDK the first time it is needed"""
+    global _app
+    if _app is None:
+        with _app_lock:
+            if _app is None:
+                try:
+                    # Already initialized, e.g. before Streamlit reloaded this module
+                    _app = firebase_admin.get_app()
+                except ValueError:
+                    _app = firebase_admin.initialize_app(credentials.Certificate(firebase_config()), {
+                        'databaseURL': os.getenv("FIREBASE_DATABASE_URL")
+                    })
+    return _app
+
+def get_firestore():
+    """Return the shared Firestore client"""
+    global _firestore
+    if _firestore is None:
+        app = get_firebase_app()
+        with _app_lock:
+            if _firestore is None:
+                _firestore = firestore.client(app)
+    return _firestore
+
+def rtdb_reference(path="/"):
+    """Realtime Database reference on the shared app, whose connections every reference reuses"""
+    return db.reference(path, app=get_firebase_app())
 
 def init_firebase():
     """Initialize Firebase in the Streamlit session state"""
@@ -55,7 +132,7 @@ def auth_required():
 def sign_in_with_email_and_password(email, password):
     """Sign in user with email and password"""
     try:
-        user = auth.get_user_by_email(email)
+        user = auth.get_user_by_email(email, app=get_firebase_app())
         # In a production environment, you should use proper password hashing
         # This is a simplified version for demonstration
         user_data = {
@@ -66,13 +143,13 @@ def sign_in_with_email_and_password(email, password):
         }
         st.session_state.user = user_data
         return {'success': True, 'user': user_data}
-    except FirebaseError as e:
+    except (FirebaseError, RuntimeError) as e:
         return {'success': False, 'error': str(e)}
 
 def sign_up_with_email_and_password(email, password):
     """Create new user with email and password"""
     try:
-        user = auth.create_user(email=email, password=password)
+        user = auth.create_user(email=email, password=password, app=get_firebase_app())
         user_data = {
             'uid': user.uid,
             'email': user.email,
@@ -81,7 +158,7 @@ def sign_up_with_email_and_password(email, password):
         }
         st.session_state.user = user_data
         return {'success': True, 'user': user_data}
-    except FirebaseError as e:
+    except (FirebaseError, RuntimeError) as e:
         return {'success': False, 'error': str(e)}
 
 def sign_out():
@@ -95,7 +172,7 @@ def sign_out():
 def save_to_firestore(collection, document_id, data):
     """Save data to Firestore database"""
     try:
-        doc_ref = db_store.collection(collection).document(document_id)
+        doc_ref = get_firestore().collection(collection).document(document_id)
         doc_ref.set(data)
         return {'success': True}
     except Exception as e:
@@ -104,7 +181,7 @@ def save_to_firestore(collection, document_id, data):
 def get_from_firestore(collection, document_id):
     """Get data from Firestore database"""
     try:
-        doc_ref = db_store.collection(collection).document(document_id)
+        doc_ref = get_firestore().collection(collection).document(document_id)
         doc = doc_ref.get()
         if doc.exists:
             return {'success': True, 'data': doc.to_dict()}
@@ -115,7 +192,7 @@ def get_from_firestore(collection, document_id):
 def query_firestore(collection, field, operator, value):
     """Query data from Firestore database"""
     try:
-        query = db_store.collection(collection)
+        query = get_firestore().collection(collection)
         if operator == '==':
             query = query.where(field, '==', value)
         elif operator == '>':
@@ -132,47 +209,85 @@ def query_firestore(collection, field, operator, value):
 def save_to_rtdb(path, data):
     """Save data to Realtime Database"""
     try:
-        ref = db.reference(path)
+        ref = rtdb_reference(path)
         ref.set(data)
         return {'success': True}
     except Exception as e:
         return {'success': False, 'error': str(e)}
+    finally:
+        _rtdb_cache.invalidate(path)
 
 def push_to_rtdb(path, data):
     """Push data to Realtime Database with auto-generated key"""
     try:
-        ref = db.reference(path)
+        ref = rtdb_reference(path)
         new_ref = ref.push(data)
         return {'success': True, 'key': new_ref.key}
     except Exception as e:
         return {'success': False, 'error': str(e)}
+    finally:
+        _rtdb_cache.invalidate(path)
 
 def get_from_rtdb(path):
     """Get data from Realtime Database"""
     try:
-        ref = db.reference(path)
+        ref = rtdb_reference(path)
         data = ref.get()
         return {'success': True, 'data': data}
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
+def get_cached_from_rtdb(path):
+    """Get data from Realtime Database, served from memory until it expires or is written through this module"""
+    try:
+        data = _rtdb_cache.get(path, lambda: rtdb_reference(path).get())
+        return {'success': True, 'data': data}
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
+def query_rtdb(path, order_by="$key", start_at=None, end_at=None, limit_to_last=None):
+    """Get an ordered range of children from Realtime Database.
+
+    order_by is a child key, or "$key" for the children's own keys;
+    ordering by a child needs an ".indexOn" rule for it in the database
+    rules. Results come back in ascending order.
+    """
+    try:
+        ref = rtdb_reference(path)
+        query = ref.order_by_key() if order_by == "$key" else ref.order_by_child(order_by)
+        if start_at is not None:
+            query = query.start_at(start_at)
+        if end_at is not None:
+            query = query.end_at(end_at)
+        if limit_to_last is not None:
+            query = query.limit_to_last(limit_to_last)
+        return {'success': True, 'data': query.get()}
+    except Exception as e:
+        return {'success': False, 'error': str(e)}
+
 def update_in_rtdb(path, data):
     """Update data in Realtime Database"""
     try:
-        ref = db.reference(path)
+        ref = rtdb_reference(path)
         ref.update(data)
         return {'success': True}
     except Exception as e:
         return {'success': False, 'error': str(e)}
+    finally:
+        # Only the updated children change
+        for key in data:
+            _rtdb_cache.invalidate(f"{path.strip('/')}/{key}")
 
 def remove_from_rtdb(path):
     """Remove data from Realtime Database"""
     try:
-        ref = db.reference(path)
+        ref = rtdb_reference(path)
         ref.delete()
         return {'success': True}
     except Exception as e:
         return {'success': False, 'error': str(e)}
+    finally:
+        _rtdb_cache.invalidate(path)
 
 # Function to initialize Google Maps
 def init_google_maps():
@@ -245,7 +360,7 @@ def calculate_route(map_id, origin, destination, waypoints=None, travel_mode='DR
 def geocode_address(address):
     """Convert address to coordinates using Google Maps Geocoding API"""
     url = f"https://maps.googleapis.com/maps/api/geocode/json?address={address}&key={GOOGLE_MAPS_API_KEY}"
-    response = requests.get(url)
+    response = _http.get(url)
     data = response.json()
     
     if data['status'] == 'OK':
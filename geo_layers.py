@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from branca.element import MacroElement
+from jinja2 import Template
+
+# Generated layers are written here; Streamlit serves ./static at app/static when static serving is on
+LAYER_DIR = "static/layers"
+LAYER_URL = "/app/static/layers"
+# Layer files older than this are removed when a newer one is written (seconds)
+LAYER_MAX_AGE_SECONDS = 3600
+
+def script_json(value):
+    """JSON for inlining in a map script.
+
+    branca renders each element's script output as a template once more,
+    so "{{", "{%" and "{#" (which JSON only produces inside strings) are
+    escaped as well as the characters that could close the script tag.
+    """
+    text = json.dumps(value, separators=(",", ":"))
+    text = text.replace("<", "\\u003c").replace(">", "\\u003e").replace("&", "\\u0026")
+    return re.sub(r"\{(?=[{%#])", r"\\u007b", text)
+
+def point_features(items, coords, tooltip=None, style=None, popup=None, indices=None):
+    """GeoJSON FeatureCollection of point items with their style in the properties.
+
+    coords is an (n, 2) [lat, lng] array aligned with items; indices picks
+    which items to include (all by default). style returns {"color",
+    "icon"} for an item, matching folium.Icon's color and Font Awesome
+    icon names. popup, if given, is a dict of item index -> popup HTML.
+    """
+    features = []
+    for index in (range(len(items)) if indices is None else indices):
+        item = items[index]
+        properties = {"i": index}
+        if tooltip:
+            properties["tooltip"] = tooltip(item)
+        if style:
+            properties.update(style(item))
+        if popup and index in popup:
+            properties["popup"] = popup[index]
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(float(coords[index][1]), 6), round(float(coords[index][0]), 6)]},
+            "properties": properties
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+class LayerCache:
+    """Writes FeatureCollections to LAYER_DIR under content-hashed names.
+
+    The same data always maps to the same URL, so browsers cache it and
+    an unchanged layer is never written twice.
+    """
+
+    def __init__(self, directory=LAYER_DIR, url=LAYER_URL):
+        self.directory = directory
+        self.url = url
+        self._written = set()
+        self._lock = threading.Lock()
+
+    def publish(self, name, collection):
+        """Store a FeatureCollection and return the URL it is served at"""
+        payload = json.dumps(collection, separators=(",", ":"))
+        digest = hashlib.sha1(payload.encode()).hexdigest()[:16]
+        file_name = f"{re.sub(r'[^A-Za-z0-9_-]', '_', name)}-{digest}.geojson"
+        with self._lock:
+            if file_name not in self._written:
+                os.makedirs(self.directory, exist_ok=True)
+                path = os.path.join(self.directory, file_name)
+                if not os.path.exists(path):
+                    with open(path + ".tmp", "w") as f:
+                        f.write(payload)
+                    os.replace(path + ".tmp", path)
+                    self._prune()
+                self._written.add(file_name)
+        return f"{self.url}/{file_name}"
+
+    def _prune(self):
+        cutoff = time.time() - LAYER_MAX_AGE_SECONDS
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".geojson") and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                self._written.discard(entry.name)
+
+class GeoJsonPoints(MacroElement):
+    """One Leaflet GeoJSON layer drawing styled point markers.
+
+    Features come inline (data), from a cached file (url), or both; when
+    both are given, the file's copy of the feature with index skip is left
+    out in favour of the inline one. A feature with a "popup" property
+    opens its popup as soon as it is drawn.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            (function(parent) {
+                var layer = L.geoJSON(null, {
+                    filter: function(feature) {
+                        return feature.properties.popup !== undefined || feature.properties.i !== {{ this.skip_json }};
+                    },
+                    pointToLayer: function(feature, latlng) {
+                        var p = feature.properties;
+                        var marker = L.marker(latlng, {icon: L.AwesomeMarkers.icon({
+                            icon: p.icon || "info-sign", prefix: p.icon ? "fa" : "glyphicon",
+                            markerColor: p.color || "blue", iconColor: "white", extraClasses: "fa-rotate-0"
+                        })});
+                        if (p.tooltip) marker.bindTooltip(p.tooltip, {sticky: true});
+                        if (p.popup) {
+                            marker.bindPopup(p.popup, {maxWidth: 300});
+                            marker.on("add", function() { marker.openPopup(); });
+                        }
+                        return marker;
+                    }
+                }).addTo(parent);
+                {% if this.data %}layer.addData({{ this.data_json }});{% endif %}
+                {% if this.url %}fetch({{ this.url_json }}).then(function(r) { return r.json(); }).then(function(d) { layer.addData(d); });{% endif %}
+            })({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, data=None, url=None, skip=None):
+        super().__init__()
+        self._name = "GeoJsonPoints"
+        self.data = data
+        self.url = url
+        self.data_json = script_json(data)
+        self.url_json = script_json(url)
+        self.skip_json = script_json(skip)
+
+# Cache shared by every Streamlit session
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_layer_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LayerCache()
+    return _cache
@@ -0,0 +1,48 @@
+import threading
+import plotly.io as pio
+import streamlit as st
+
+# Figures kept as JSON before the cache is reset
+CHART_CACHE_SIZE = 512
+
+class ChartCache:
+    """Plotly figure JSON per chart key, rebuilt only when the key's data version changes"""
+
+    def __init__(self, size=CHART_CACHE_SIZE):
+        self.size = size
+        self._figures = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, build_figure):
+        cached = self._figures.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        figure_json = build_figure().to_json()
+        with self._lock:
+            if len(self._figures) >= self.size:
+                self._figures.clear()
+            self._figures[key] = (version, figure_json)
+        return figure_json
+
+# Cache shared by every Streamlit session
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_chart_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ChartCache()
+    return _cache
+
+def lazy_plotly_chart(key, version, build_figure, label="Show chart"):
+    """Show a Plotly chart only once its checkbox is ticked.
+
+    Expander bodies run on every rerun whether they are open or not, so
+    the checkbox is what defers the work. build_figure is called at most
+    once per key and version, across sessions.
+    """
+    if st.checkbox(label, key=f"lazy_chart_{key}"):
+        # Keyed, since two open charts with the same figure would otherwise share an element id
+        st.plotly_chart(pio.from_json(get_chart_cache().get(key, version, build_figure)), use_container_width=True, key=f"lazy_chart_{key}_figure")
@@ -0,0 +1,187 @@
+import threading
+import numpy as np
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+from geo_layers import GeoJsonPoints, get_layer_cache, point_features
+from map_tiles import EMPTY_TILE_URL, TILE_MAX_ZOOM, TILE_MIN_ZOOM
+
+# Markers closer than this on screen are merged into one cluster (pixels)
+CLUSTER_RADIUS_PX = 60
+# From this zoom level up every point is drawn on its own
+CLUSTER_MAX_ZOOM = 15
+# Layers with at most this many points are drawn whole, from one cached file, without clustering
+CLUSTER_MIN_POINTS = 500
+# Most individual markers drawn in one render
+MAX_MARKERS = 2000
+# Share of the viewport added on each side, so points just off-screen are already drawn when panning
+VIEWPORT_PADDING = 0.25
+TILE_SIZE = 256
+# Size maps are shown at (utils.display_map), for the viewport before the browser has reported one
+MAP_WIDTH_PX = 800
+MAP_HEIGHT_PX = 500
+# Point sets whose clusters are kept in memory before the cache is reset
+LAYER_CACHE_SIZE = 32
+
+def _mercator(lat, lng):
+    """Web Mercator position of each point, scaled to [0, 1] across the world"""
+    x = (lng + 180) / 360
+    sin_lat = np.sin(np.radians(np.clip(lat, -85, 85)))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)
+    return x, y
+
+def _view_bounds(center, zoom):
+    """(south, west, north, east) of a MAP_WIDTH_PX x MAP_HEIGHT_PX map at center and zoom"""
+    x, y = _mercator(np.float64(center[0]), np.float64(center[1]))
+    half_width = MAP_WIDTH_PX / 2 / (TILE_SIZE * 2 ** zoom)
+    half_height = MAP_HEIGHT_PX / 2 / (TILE_SIZE * 2 ** zoom)
+    south, north = (np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * v)))) for v in (y + half_height, y - half_height))
+    return (float(south), float((x - half_width) * 360 - 180), float(north), float((x + half_width) * 360 - 180))
+
+def _in_bounds(lat, lng, bounds):
+    if bounds is None:
+        return np.ones(len(lat), dtype=bool)
+    south, west, north, east = bounds
+    pad_lat = (north - south) * VIEWPORT_PADDING
+    pad_lng = (east - west) * VIEWPORT_PADDING
+    return (lat >= south - pad_lat) & (lat <= north + pad_lat) & (lng >= west - pad_lng) & (lng <= east + pad_lng)
+
+class ClusterMarkers(MacroElement):
+    """Cluster bubbles drawn from one [lat, lng, count] array rather than a folium marker each"""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            {{ this.clusters|tojson }}.forEach(function(c) {
+                var size = c[2] < 100 ? 30 : c[2] < 1000 ? 38 : 46;
+                var html = '<div style="width:' + size + 'px;height:' + size + 'px;line-height:' + size + 'px;'
+                    + 'border-radius:50%;background:rgba(49,130,189,0.8);color:white;text-align:center;font-weight:bold">'
+                    + c[2] + '</div>';
+                L.marker([c[0], c[1]], {icon: L.divIcon({html: html, className: "empty", iconSize: [size, size], iconAnchor: [size / 2, size / 2]})})
+                    .bindTooltip(c[2] + " " + {{ this.label|tojson }} + " - zoom in to see them")
+                    .addTo({{ this._parent.get_name() }});
+            });
+        {% endmacro %}
+    """)
+
+    def __init__(self, clusters, label):
+        super().__init__()
+        self._name = "ClusterMarkers"
+        self.clusters = clusters
+        self.label = label
+
+class PointLayer:
+    """Map points clustered on a screen-space grid for each zoom level.
+
+    Points are projected once; the first render at a zoom level groups
+    them into grid cells CLUSTER_RADIUS_PX wide at that zoom and keeps
+    the result, so later renders only pick the clusters and points inside
+    the viewport. Clusters go out as a single data array and points as
+    one GeoJSON layer. Sets of up to CLUSTER_MIN_POINTS are drawn whole
+    from a cached file; larger ones can be shown from pre-rendered tiles
+    at statewide zoom levels. Popup HTML is built only for the point that
+    was clicked.
+    """
+
+    def __init__(self, name, coords):
+        self.name = name
+        self.coords = coords
+        self.lat = coords[:, 0]
+        self.lng = coords[:, 1]
+        self.x, self.y = _mercator(self.lat, self.lng)
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def _clusters(self, zoom):
+        """(cluster label per point, size, mean lat, mean lng per cluster) at a zoom level"""
+        level = self._levels.get(zoom)
+        if level is None:
+            cells = TILE_SIZE * 2 ** zoom / CLUSTER_RADIUS_PX
+            keys = np.floor(self.x * cells).astype(np.int64) * (int(cells) + 1) + np.floor(self.y * cells).astype(np.int64)
+            _, labels, counts = np.unique(keys, return_inverse=True, return_counts=True)
+            labels = labels.reshape(-1)
+            level = (labels, counts, np.bincount(labels, self.lat) / counts, np.bincount(labels, self.lng) / counts)
+            with self._lock:
+                self._levels[zoom] = level
+        return level
+
+    def visible(self, zoom, bounds=None):
+        """Clusters [(lat, lng, count)] and indices of single points to draw for a view"""
+        zoom = int(zoom)
+        if len(self.lat) <= CLUSTER_MIN_POINTS:
+            return [], np.arange(len(self.lat))
+        in_view = _in_bounds(self.lat, self.lng, bounds)
+        if zoom >= CLUSTER_MAX_ZOOM or not len(self.lat):
+            return [], np.flatnonzero(in_view)[:MAX_MARKERS]
+
+        labels, counts, lat, lng = self._clusters(zoom)
+        singles = np.flatnonzero(in_view & (counts[labels] == 1))[:MAX_MARKERS]
+        shown = np.flatnonzero(_in_bounds(lat, lng, bounds) & (counts > 1))
+        return [(round(float(lat[c]), 5), round(float(lng[c]), 5), int(counts[c])) for c in shown], singles
+
+    def add_to(self, m, items, view=None, tooltip=None, style=None, popup=None, label="items", tiles=None):
+        """Draw the clusters and items visible in view onto map m.
+
+        items are the records the layer was built from, in the same order;
+        view is what utils.map_view returns for the map (empty on first
+        render, when the map's own center and zoom are used). tooltip,
+        style ({"color", "icon"}) and popup are functions of an item;
+        popup is only called for the item whose marker was last clicked.
+        tiles is a map_tiles.TileLayer of the same items; once rendered, it
+        replaces clusters and markers between TILE_MIN_ZOOM and TILE_MAX_ZOOM.
+        """
+        view = view or {}
+        zoom = view.get("zoom") or m.options.get("zoom", 7)
+        layer = folium.FeatureGroup(name=label)
+        if tiles is not None and tiles.ready and len(items) > CLUSTER_MIN_POINTS and TILE_MIN_ZOOM <= zoom <= TILE_MAX_ZOOM:
+            folium.TileLayer(
+                tiles.url,
+                attr=label,
+                name=label,
+                overlay=True,
+                min_zoom=TILE_MIN_ZOOM,
+                max_zoom=TILE_MAX_ZOOM,
+                error_tile_url=EMPTY_TILE_URL,
+                bounds=tiles.bounds
+            ).add_to(layer)
+            layer.add_to(m)
+            return layer
+
+        bounds = view.get("bounds") or _view_bounds(view.get("center") or m.location, zoom)
+        clusters, singles = self.visible(zoom, bounds)
+        clicked = view.get("clicked")
+
+        if clusters:
+            ClusterMarkers(clusters, label).add_to(layer)
+
+        clicked_index = None
+        if clicked is not None and len(singles):
+            hits = singles[np.isclose(self.lat[singles], clicked[0], atol=1e-6) & np.isclose(self.lng[singles], clicked[1], atol=1e-6)]
+            clicked_index = int(hits[0]) if len(hits) else None
+        popups = {clicked_index: popup(items[clicked_index])} if popup and clicked_index is not None else None
+
+        if len(singles) == len(items) and len(items):
+            # Every point is on screen: serve the whole set from the layer cache so browsers reuse it across reruns
+            url = get_layer_cache().publish(self.name, point_features(items, self.coords, tooltip, style))
+            data = point_features(items, self.coords, tooltip, style, popups, indices=[clicked_index]) if popups else None
+            GeoJsonPoints(data=data, url=url, skip=clicked_index).add_to(layer)
+        elif len(singles):
+            GeoJsonPoints(data=point_features(items, self.coords, tooltip, style, popups, indices=singles.tolist())).add_to(layer)
+
+        layer.add_to(m)
+        return layer
+
+# Layers shared across reruns, keyed by map name and point positions
+_layers = {}
+_layers_lock = threading.Lock()
+
+def get_point_layer(name, items, coords_of=lambda item: item["coordinates"]):
+    """Return the cached point layer for a map's items, rebuilding it when their positions change"""
+    coords = np.array([coords_of(item) for item in items], dtype=float).reshape(-1, 2)
+    key = (name, hash(coords.tobytes()))
+    layer = _layers.get(key)
+    if layer is None:
+        with _layers_lock:
+            if len(_layers) >= LAYER_CACHE_SIZE:
+                _layers.clear()
+            layer = _layers.setdefault(key, PointLayer(name, coords))
+    return layer
@@ -0,0 +1,251 @@
+import json
+import logging
+import multiprocessing
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rendered tiles are written here as {layer}/{z}/{x}/{y}.png and served by Streamlit static serving
+TILE_DIR = "static/tiles"
+TILE_URL = "/app/static/tiles"
+TILE_SIZE = 256
+# Zoom levels covered by tiles; closer views draw live markers instead
+TILE_MIN_ZOOM = 5
+TILE_MAX_ZOOM = 11
+# Radius of the dot drawn for each point (pixels)
+TILE_DOT_RADIUS_PX = 4
+# How often registered layers are re-rendered in the background (seconds)
+TILE_RENDER_SECONDS = 300
+# Tiles handed to one worker process at a time
+TILE_BATCH = 64
+# Re-renders touching fewer tiles than this run in the calling thread instead of a process pool
+TILE_POOL_MIN_TILES = 256
+TILE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+# RGB of the marker colors used by the pages (folium.Icon names)
+TILE_COLORS = {
+    "red": (214, 62, 42),
+    "darkred": (162, 51, 54),
+    "orange": (246, 151, 48),
+    "beige": (255, 203, 146),
+    "green": (114, 176, 38),
+    "darkgreen": (114, 130, 36),
+    "blue": (56, 170, 221),
+    "darkblue": (0, 103, 163),
+    "lightblue": (138, 218, 255),
+    "purple": (210, 82, 185),
+    "darkpurple": (91, 57, 107),
+    "cadetblue": (67, 105, 120),
+    "gray": (87, 87, 87),
+    "lightgray": (163, 163, 163),
+    "black": (48, 48, 48),
+}
+# Transparent 1x1 PNG shown by Leaflet for tiles with no points (no file is written for them)
+EMPTY_TILE_URL = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+
+def _pixels(lat, lng, zoom):
+    """Global pixel position of each point at a zoom level"""
+    scale = TILE_SIZE * 2 ** zoom
+    sin_lat = np.sin(np.radians(np.clip(lat, -85, 85)))
+    return (lng + 180) / 360 * scale, (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)) * scale
+
+def _tile_keys(px, py, zoom):
+    """Tile key (x * 2**zoom + y) of every tile a dot at each pixel position reaches, with up to four per point"""
+    keys = []
+    for ox in (-TILE_DOT_RADIUS_PX, TILE_DOT_RADIUS_PX):
+        for oy in (-TILE_DOT_RADIUS_PX, TILE_DOT_RADIUS_PX):
+            keys.append(((px + ox) // TILE_SIZE).astype(np.int64) * 2 ** zoom + ((py + oy) // TILE_SIZE).astype(np.int64))
+    return keys
+
+def _png(rgba):
+    """Encode an (h, w, 4) uint8 array as a PNG"""
+    height, width = rgba.shape[:2]
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, -1)]).tobytes()
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, 6))
+        + chunk(b"IEND", b"")
+    )
+
+def _disc(radius):
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    inside = dx * dx + dy * dy <= radius * radius
+    return dy[inside], dx[inside]
+
+def _render_tile(x, y, rgb):
+    """Draw dots at tile pixel positions x, y with colors rgb ((n, 3) uint8)"""
+    tile = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    ix = np.floor(x).astype(np.int64)
+    iy = np.floor(y).astype(np.int64)
+    # A darker ring first, then the fill, so neighbouring dots stay distinguishable
+    for radius, shade in ((TILE_DOT_RADIUS_PX, 0.6), (TILE_DOT_RADIUS_PX - 1, 1.0)):
+        dy, dx = _disc(radius)
+        rows = (iy[:, None] + dy[None, :]).ravel()
+        cols = (ix[:, None] + dx[None, :]).ravel()
+        colors = np.repeat((rgb * shade).astype(np.uint8), len(dy), axis=0)
+        keep = (rows >= 0) & (rows < TILE_SIZE) & (cols >= 0) & (cols < TILE_SIZE)
+        tile[rows[keep], cols[keep], :3] = colors[keep]
+        tile[rows[keep], cols[keep], 3] = 230
+    return tile
+
+def _render_batch(batch):
+    """Write (or remove, when empty) each tile in a batch; runs in worker processes"""
+    directory, tiles = batch
+    for z, x, y, px, py, rgb in tiles:
+        path = os.path.join(directory, str(z), str(x), f"{y}.png")
+        if not len(px):
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(_png(_render_tile(px, py, rgb)))
+        os.replace(path + ".tmp", path)
+    return len(tiles)
+
+class TileLayer:
+    """Raster z/x/y tiles of a point dataset, re-rendered only where points changed.
+
+    update() compares the new points with those of the last render; only
+    tiles within a dot radius of a point that appeared, moved, changed
+    color or disappeared are drawn again. Large re-renders are split into
+    batches of TILE_BATCH tiles across a process pool.
+    """
+
+    def __init__(self, name, directory=TILE_DIR, url=TILE_URL):
+        self.name = name
+        self.directory = os.path.join(directory, name)
+        self._url = f"{url}/{name}"
+        self._manifest = os.path.join(self.directory, "points.json")
+        self._points = None
+        self.version = 0
+        self.bounds = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.version > 0
+
+    @property
+    def url(self):
+        """Leaflet tile URL template; the version makes browsers drop tiles from earlier renders"""
+        return f"{self._url}/{{z}}/{{x}}/{{y}}.png?v={self.version}"
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest, "r") as f:
+                return [tuple(p) for p in json.load(f)]
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def update(self, points):
+        """Render the tiles affected by changes since the last update; points are (lat, lng, color)
+
+        Returns the number of tiles drawn or removed.
+        """
+        points = [(round(float(lat), 6), round(float(lng), 6), color) for lat, lng, color in points]
+        with self._lock:
+            previous = self._points
+            if previous is None:
+                previous = self._load_manifest()
+            if previous is None:
+                # No earlier render to diff against: start from a clean directory
+                changed = points
+                for root, _, files in os.walk(self.directory, topdown=False):
+                    for file_name in files:
+                        if file_name.endswith(".png"):
+                            os.remove(os.path.join(root, file_name))
+            else:
+                old, new = Counter(previous), Counter(points)
+                changed = list((old - new) + (new - old))
+
+            lat = np.array([p[0] for p in points], dtype=float)
+            lng = np.array([p[1] for p in points], dtype=float)
+            rgb = np.array([TILE_COLORS.get(p[2], TILE_COLORS["blue"]) for p in points], dtype=np.uint8).reshape(-1, 3)
+            changed_lat = np.array([p[0] for p in changed], dtype=float)
+            changed_lng = np.array([p[1] for p in changed], dtype=float)
+            tiles = []
+            for zoom in range(TILE_MIN_ZOOM, TILE_MAX_ZOOM + 1) if changed else ():
+                dirty = np.unique(np.concatenate(_tile_keys(*_pixels(changed_lat, changed_lng, zoom), zoom)))
+                # Points reaching a dirty tile, sorted by tile so each tile's points are one slice
+                px, py = _pixels(lat, lng, zoom)
+                keys = np.concatenate(_tile_keys(px, py, zoom))
+                owners = np.tile(np.arange(len(points)), 4)
+                hit = np.isin(keys, dirty)
+                pairs = np.unique(keys[hit] * len(points) + owners[hit])
+                keys, owners = pairs // max(len(points), 1), pairs % max(len(points), 1)
+                starts = np.searchsorted(keys, dirty)
+                ends = np.searchsorted(keys, dirty, side="right")
+                for key, start, end in zip(dirty.tolist(), starts.tolist(), ends.tolist()):
+                    x, y = divmod(key, 2 ** zoom)
+                    near = owners[start:end]
+                    tiles.append((zoom, x, y, px[near] - x * TILE_SIZE, py[near] - y * TILE_SIZE, rgb[near]))
+
+            batches = [(self.directory, tiles[i:i + TILE_BATCH]) for i in range(0, len(tiles), TILE_BATCH)]
+            if len(tiles) < TILE_POOL_MIN_TILES or TILE_WORKERS == 1:
+                for batch in batches:
+                    _render_batch(batch)
+            else:
+                # spawn rather than fork: the app process runs Streamlit's threads
+                with multiprocessing.get_context("spawn").Pool(TILE_WORKERS) as pool:
+                    for _ in pool.imap_unordered(_render_batch, batches):
+                        pass
+
+            if changed:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self._manifest + ".tmp", "w") as f:
+                    f.write(json.dumps(points))
+                os.replace(self._manifest + ".tmp", self._manifest)
+            self._points = points
+            if len(points):
+                self.bounds = [[float(lat.min()), float(lng.min())], [float(lat.max()), float(lng.max())]]
+            if tiles or not self.version:
+                self.version += 1
+            return len(tiles)
+
+# Layers shared by every Streamlit session, each with the function that loads its points
+_layers = {}
+_layers_lock = threading.Lock()
+_scheduler = None
+
+def _render(layer, load_points):
+    # A failed render keeps the layer's last tiles; it is retried on the next pass
+    try:
+        layer.update(load_points())
+    except Exception:
+        logger.exception("Rendering %s tiles failed", layer.name)
+
+def _run():
+    while True:
+        time.sleep(TILE_RENDER_SECONDS)
+        for layer, load_points in list(_layers.values()):
+            _render(layer, load_points)
+
+def get_tile_layer(name, load_points):
+    """Return the shared tile layer for a dataset, rendered and kept current in the background.
+
+    load_points returns the dataset as (lat, lng, color) tuples; it is
+    called from the background thread every TILE_RENDER_SECONDS.
+    """
+    global _scheduler
+    entry = _layers.get(name)
+    if entry is None:
+        with _layers_lock:
+            entry = _layers.get(name)
+            if entry is None:
+                entry = _layers[name] = (TileLayer(name), load_points)
+                threading.Thread(target=_render, args=entry, name=f"tiles-{name}", daemon=True).start()
+            if _scheduler is None:
+                _scheduler = threading.Thread(target=_run, name="tile-renderer", daemon=True)
+                _scheduler.start()
+    return entry[0]
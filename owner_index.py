@@ -0,0 +1,63 @@
+import json
+import os
+import threading
+from collections import defaultdict
+
+from utils import load_jsonl
+
+class OwnerIndex:
+    """Records grouped by the user who created them, maintained on every write.
+
+    Each collection (offered rides, event reports, ...) keeps an owner →
+    {record id: record} map in memory, so a user's own list is one key
+    lookup no matter how many records exist. Changes are appended to a log
+    and replayed on startup.
+    """
+
+    def __init__(self, collection, path=None):
+        self.collection = collection
+        self.path = path or f"data/owners_{collection}.jsonl"
+        self._records = defaultdict(dict)
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        for entry in load_jsonl(self.path):
+            if entry["op"] == "put":
+                self._records[entry["owner"]][entry["record"]["id"]] = entry["record"]
+            else:
+                self._records[entry["owner"]].pop(entry["id"], None)
+
+    def _append(self, entry):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def put(self, owner_id, record):
+        """Add or replace one of an owner's records"""
+        with self._lock:
+            self._records[owner_id][record["id"]] = record
+            self._append({"op": "put", "owner": owner_id, "record": record})
+
+    def remove(self, owner_id, record_id):
+        with self._lock:
+            if self._records.get(owner_id, {}).pop(record_id, None) is not None:
+                self._append({"op": "remove", "owner": owner_id, "id": record_id})
+
+    def records(self, owner_id):
+        """An owner's records, oldest first"""
+        return list(self._records.get(owner_id, {}).values())
+
+# Indexes shared by every Streamlit session, one per collection
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_owner_index(collection):
+    index = _indexes.get(collection)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(collection)
+            if index is None:
+                index = OwnerIndex(collection)
+                _indexes[collection] = index
+    return index
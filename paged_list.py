@@ -0,0 +1,49 @@
+import streamlit as st
+
+# Records shown on one page of a list
+PAGE_SIZE = 20
+
+def paged_list(items, key, sort_options=None, search_fields=(), page_size=PAGE_SIZE, label="items"):
+    """Show search, sort and page controls for a list and return the records on the current page.
+
+    sort_options maps an option name to a (key function, reverse) pair, or
+    to None to keep the list's own order, and search_fields names the
+    record fields a search matches. Searching and
+    sorting run over the whole list here, so callers only build widgets
+    for the page that is returned.
+    """
+    sort_options = sort_options or {}
+    col1, col2 = st.columns([2, 1])
+
+    with col1:
+        search = st.text_input(f"Search {label}", key=f"{key}_search").strip().lower() if search_fields else ""
+
+    with col2:
+        sort_by = st.selectbox("Sort by", options=list(sort_options), key=f"{key}_sort") if sort_options else None
+
+    if search:
+        items = [item for item in items if any(search in str(item.get(field, "")).lower() for field in search_fields)]
+    if sort_by and sort_options[sort_by]:
+        sort_key, reverse = sort_options[sort_by]
+        items = sorted(items, key=sort_key, reverse=reverse)
+
+    # Start from the first page whenever the search or sort changes, and stay within the pages left
+    page_key = f"{key}_page"
+    pages = max(1, (len(items) - 1) // page_size + 1)
+    if st.session_state.get(f"{key}_query") != (search, sort_by):
+        st.session_state[f"{key}_query"] = (search, sort_by)
+        st.session_state[page_key] = 1
+    elif st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+
+    page = 1
+    if pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+    start = (page - 1) * page_size
+    page_items = items[start:start + page_size]
+    if page_items:
+        st.caption(f"Showing {start + 1}-{start + len(page_items)} of {len(items)} {label}")
+    elif search:
+        st.info(f"No {label} match \"{search}\".")
+    return page_items
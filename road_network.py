@@ -0,0 +1,240 @@
+import heapq
+import threading
+import numpy as np
+
+from utils import MAJOR_CITIES
+from corridor_index import CorridorIndex
+
+# Ratio of road distance to straight-line distance on Tamil Nadu highways
+ROAD_DETOUR_FACTOR = 1.25
+# Average highway speed used for edge travel times (km/h)
+AVERAGE_SPEED_KMPH = 55
+# Number of nearest neighbours each node is linked to
+NEIGHBOURS_PER_NODE = 4
+EARTH_RADIUS_KM = 6371
+
+def haversine_matrix(coords_a, coords_b):
+    """Great-circle distances (km) between every pair of points in two [lat, lng] arrays"""
+    a = np.radians(np.asarray(coords_a, dtype=float).reshape(-1, 2))
+    b = np.radians(np.asarray(coords_b, dtype=float).reshape(-1, 2))
+    dlat = b[None, :, 0] - a[:, None, 0]
+    dlng = b[None, :, 1] - a[:, None, 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(a[:, None, 0]) * np.cos(b[None, :, 0]) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+def city_node(city):
+    return f"city:{city}"
+
+def station_node(station_id):
+    return f"station:{station_id}"
+
+def toll_node(plaza):
+    return f"toll:{plaza.get('id', plaza['name'])}"
+
+class RoadNetwork:
+    """Undirected road graph with numbered edges and travel-time weights"""
+
+    def __init__(self):
+        self.nodes = {}
+        self.adjacency = {}
+        self.edges = []
+        self._edge_lookup = {}
+        self._corridor_index = None
+        self._city_matrices = {}
+
+    def add_node(self, node_id, coords):
+        if node_id not in self.nodes:
+            self._corridor_index = None
+            self.nodes[node_id] = [float(coords[0]), float(coords[1])]
+            self.adjacency[node_id] = []
+
+    def add_edge(self, u, v, distance=None):
+        """Add a two-way road between u and v and return its edge id"""
+        key = (u, v) if u <= v else (v, u)
+        if key in self._edge_lookup:
+            return self._edge_lookup[key]
+        if distance is None:
+            distance = float(haversine_matrix(self.nodes[u], self.nodes[v])[0, 0]) * ROAD_DETOUR_FACTOR
+        edge_id = len(self.edges)
+        self._city_matrices.clear()
+        self.edges.append({
+            "id": edge_id,
+            "u": key[0],
+            "v": key[1],
+            "distance": distance,
+            "time": distance / AVERAGE_SPEED_KMPH * 60
+        })
+        self._edge_lookup[key] = edge_id
+        self.adjacency[u].append((v, edge_id))
+        self.adjacency[v].append((u, edge_id))
+        return edge_id
+
+    def edge_between(self, u, v):
+        key = (u, v) if u <= v else (v, u)
+        return self._edge_lookup.get(key)
+
+    def nearest_node(self, coords, prefix=None):
+        """Return the id of the graph node closest to coords"""
+        node_ids = [n for n in self.nodes if prefix is None or n.startswith(prefix)]
+        if not node_ids:
+            return None
+        distances = haversine_matrix(coords, [self.nodes[n] for n in node_ids])[0]
+        return node_ids[int(np.argmin(distances))]
+
+    def shortest_path(self, source, target, weight="time", edge_delays=None):
+        """Dijkstra search; returns (cost, [node ids]) or (None, []) if unreachable.
+
+        edge_delays optionally maps edge ids to a cost added for crossing
+        them, such as the wait at a toll plaza on that road.
+        """
+        edge_delays = edge_delays or {}
+        best = {source: 0.0}
+        previous = {}
+        heap = [(0.0, source)]
+
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if node == target:
+                path = [target]
+                while path[-1] != source:
+                    path.append(previous[path[-1]])
+                return cost, path[::-1]
+            if cost > best.get(node, float("inf")):
+                continue
+            for neighbour, edge_id in self.adjacency[node]:
+                new_cost = cost + self.edges[edge_id][weight] + edge_delays.get(edge_id, 0)
+                if new_cost < best.get(neighbour, float("inf")):
+                    best[neighbour] = new_cost
+                    previous[neighbour] = node
+                    heapq.heappush(heap, (new_cost, neighbour))
+
+        return None, []
+
+    def costs_from(self, source, weight="time"):
+        """Dijkstra from source to every reachable node; returns {node id: cost}"""
+        best = {source: 0.0}
+        done = set()
+        heap = [(0.0, source)]
+
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if node in done:
+                continue
+            done.add(node)
+            for neighbour, edge_id in self.adjacency[node]:
+                new_cost = cost + self.edges[edge_id][weight]
+                if new_cost < best.get(neighbour, float("inf")):
+                    best[neighbour] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbour))
+
+        return best
+
+    def city_matrix(self, cities, weight="distance"):
+        """Road cost between every pair of cities, cached per city list (inf if unreachable)"""
+        key = (tuple(cities), weight)
+        matrix = self._city_matrices.get(key)
+        if matrix is None:
+            matrix = np.full((len(cities), len(cities)), np.inf)
+            for i, city in enumerate(cities):
+                if city_node(city) not in self.nodes:
+                    continue
+                costs = self.costs_from(city_node(city), weight)
+                for j, other in enumerate(cities):
+                    matrix[i, j] = costs.get(city_node(other), np.inf)
+            self._city_matrices[key] = matrix
+        return matrix
+
+    def path_edges(self, path):
+        """Edge ids traversed by a node path"""
+        return [self.edge_between(u, v) for u, v in zip(path, path[1:])]
+
+    def path_distance(self, path):
+        return sum(self.edges[e]["distance"] for e in self.path_edges(path))
+
+    def path_coords(self, path):
+        return [self.nodes[n] for n in path]
+
+    def nodes_near_path(self, path, buffer_km):
+        """Ids of nodes within buffer_km of a node path, ordered along it"""
+        if self._corridor_index is None:
+            self._corridor_index = CorridorIndex(
+                [{"id": n, "coordinates": c} for n, c in self.nodes.items()]
+            )
+        return [r["item"]["id"] for r in self._corridor_index.query(self.path_coords(path), buffer_km)]
+
+def build_road_network(stations=None, neighbours=NEIGHBOURS_PER_NODE, plazas=None):
+    """Build a road graph linking major cities, charging stations and toll plazas to their nearest neighbours"""
+    network = RoadNetwork()
+
+    for city, coords in MAJOR_CITIES.items():
+        network.add_node(city_node(city), coords)
+
+    for station in stations or []:
+        network.add_node(station_node(station["id"]), station["coordinates"])
+
+    # Plazas sit on the highways, so linking through them keeps edges close to the real roads
+    for plaza in plazas or []:
+        network.add_node(toll_node(plaza), plaza["coordinates"])
+
+    node_ids = list(network.nodes.keys())
+    coords = np.array([network.nodes[n] for n in node_ids])
+
+    k = min(neighbours, len(node_ids) - 1)
+    if k > 0:
+        # Work in row blocks so large station sets never need the full n x n matrix
+        for start in range(0, len(node_ids), 1024):
+            block = haversine_matrix(coords[start:start + 1024], coords)
+            rows = np.arange(block.shape[0])
+            block[rows, rows + start] = np.inf
+            nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+            for i, row in enumerate(nearest):
+                for j in row:
+                    network.add_edge(node_ids[start + i], node_ids[j], float(block[i, j]) * ROAD_DETOUR_FACTOR)
+
+    _connect_components(network, node_ids, coords)
+    return network
+
+def _connect_components(network, node_ids, coords):
+    """Link isolated clusters to the main component through their closest node pair"""
+    index = {n: i for i, n in enumerate(node_ids)}
+    component = [-1] * len(node_ids)
+    components = []
+
+    for start in range(len(node_ids)):
+        if component[start] != -1:
+            continue
+        members = [start]
+        component[start] = len(components)
+        for i in members:
+            for neighbour, _ in network.adjacency[node_ids[i]]:
+                j = index[neighbour]
+                if component[j] == -1:
+                    component[j] = len(components)
+                    members.append(j)
+        components.append(members)
+
+    main = list(components[0])
+    for members in components[1:]:
+        block = haversine_matrix(coords[members], coords[main])
+        i, j = np.unravel_index(np.argmin(block), block.shape)
+        network.add_edge(node_ids[members[i]], node_ids[main[j]], float(block[i, j]) * ROAD_DETOUR_FACTOR)
+        main.extend(members)
+
+# Networks shared across reruns, keyed by the station and plaza nodes they were built from
+_network_cache = {}
+_network_lock = threading.Lock()
+
+def get_road_network(stations=None, plazas=None):
+    """Return a cached road network for the given stations and toll plazas"""
+    key = (tuple(sorted(s["id"] for s in stations or [])), tuple(sorted(toll_node(p) for p in plazas or [])))
+    network = _network_cache.get(key)
+    if network is None:
+        with _network_lock:
+            network = _network_cache.get(key)
+            if network is None:
+                network = build_road_network(stations, plazas=plazas)
+                # Pages build networks over different station sets; keep only a few around
+                if len(_network_cache) >= 4:
+                    _network_cache.clear()
+                _network_cache[key] = network
+    return network
@@ -0,0 +1,149 @@
+import threading
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+
+from geo_layers import script_json
+
+# Decimal places kept by encoded polylines (5 is about 1 m)
+ROUTE_PRECISION = 5
+# Vertices closer than this to the simplified line are dropped (pixels at the level's zoom)
+ROUTE_TOLERANCE_PX = 1.0
+# Zoom levels routes are simplified for; a map uses the first level at or above its zoom, or the last
+ROUTE_LEVEL_ZOOMS = (6, 9, 12, 15)
+# Routes whose simplified levels are kept before the cache is reset
+ROUTE_CACHE_SIZE = 256
+TILE_SIZE = 256
+
+def encode_polyline(coords, precision=ROUTE_PRECISION):
+    """Encode [lat, lng] points with the Google encoded polyline format"""
+    points = np.round(np.asarray(coords, dtype=float).reshape(-1, 2) * 10 ** precision).astype(np.int64)
+    if not len(points):
+        return ""
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    # Each value becomes 5-bit chunks, low bits first, with 0x20 set on every chunk but its last
+    shifts = 5 * np.arange(7)
+    chunks = (values[:, None] >> shifts) & 0x1F
+    lengths = 1 + ((values[:, None] >> shifts[1:]) > 0).sum(axis=1)
+    used = np.arange(7) < lengths[:, None]
+    more = np.arange(7) < (lengths - 1)[:, None]
+    return ((chunks | more * 0x20) + 63)[used].astype(np.uint8).tobytes().decode("ascii")
+
+def decode_polyline(encoded, precision=ROUTE_PRECISION):
+    """(n, 2) array of [lat, lng] points from an encoded polyline"""
+    data = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    if not len(data):
+        return np.empty((0, 2))
+    last = (data & 0x20) == 0
+    starts = np.flatnonzero(np.r_[True, last[:-1]])
+    value_of = np.r_[0, np.cumsum(last)[:-1]]
+    position = np.arange(len(data)) - starts[value_of]
+    values = np.add.reduceat((data & 0x1F) << (5 * position), starts)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+
+def _mercator(points):
+    """Web Mercator position of [lat, lng] points, scaled to [0, 1] across the world"""
+    sin_lat = np.sin(np.radians(np.clip(points[:, 0], -85, 85)))
+    return np.column_stack([(points[:, 1] + 180) / 360, 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)])
+
+def simplify(coords, zoom, tolerance_px=ROUTE_TOLERANCE_PX):
+    """Douglas-Peucker simplification of [lat, lng] points for display at a zoom level.
+
+    Every open segment is split at once on each pass, so the work is a
+    few numpy passes over the points rather than one recursion per vertex.
+    """
+    points = np.asarray(coords, dtype=float).reshape(-1, 2)
+    if len(points) < 3:
+        return points
+    xy = _mercator(points)
+    tolerance = tolerance_px / (TILE_SIZE * 2 ** zoom)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    index = np.arange(len(points))
+    while True:
+        anchors = np.flatnonzero(keep)
+        segment = np.minimum(np.searchsorted(anchors, index, side="right") - 1, len(anchors) - 2)
+        a = xy[anchors[segment]]
+        b = xy[anchors[segment + 1]]
+        ab = b - a
+        length = np.maximum((ab ** 2).sum(axis=1), 1e-30)
+        t = np.clip(((xy - a) * ab).sum(axis=1) / length, 0, 1)
+        distance = np.hypot(*(xy - a - t[:, None] * ab).T)
+        distance[keep] = 0
+        # Farthest point of each segment: the first entry per segment after sorting by (segment, -distance)
+        order = np.lexsort((-distance, segment))
+        farthest = order[np.searchsorted(segment[order], np.arange(len(anchors) - 1))]
+        split = farthest[distance[farthest] > tolerance]
+        if not len(split):
+            return points[keep]
+        keep[split] = True
+
+# Simplified levels shared across reruns, keyed by the full encoded route
+_levels = {}
+_levels_lock = threading.Lock()
+
+def route_levels(encoded):
+    """[(zoom, encoded polyline)] for each of ROUTE_LEVEL_ZOOMS, computed once per route"""
+    levels = _levels.get(encoded)
+    if levels is None:
+        points = decode_polyline(encoded)
+        levels = [(zoom, encode_polyline(simplify(points, zoom))) for zoom in ROUTE_LEVEL_ZOOMS]
+        with _levels_lock:
+            if len(_levels) >= ROUTE_CACHE_SIZE:
+                _levels.clear()
+            _levels[encoded] = levels
+    return levels
+
+class RouteLine(MacroElement):
+    """A route drawn from encoded polylines simplified per zoom level.
+
+    Takes coordinates or an already encoded polyline. The browser decodes
+    only the level for the current zoom, and the next one when the zoom
+    changes.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            (function(parent) {
+                var levels = {{ this.levels_json }};
+                var decoded = {};
+                function decode(text) {
+                    var points = [], lat = 0, lng = 0, i = 0, scale = {{ 10 ** this.precision }};
+                    while (i < text.length) {
+                        var deltas = [0, 0];
+                        for (var k = 0; k < 2; k++) {
+                            var shift = 0, result = 0, b;
+                            do { b = text.charCodeAt(i++) - 63; result |= (b & 0x1f) << shift; shift += 5; } while (b >= 0x20);
+                            deltas[k] = (result & 1) ? ~(result >> 1) : (result >> 1);
+                        }
+                        lat += deltas[0];
+                        lng += deltas[1];
+                        points.push([lat / scale, lng / scale]);
+                    }
+                    return points;
+                }
+                var line = L.polyline([], {{ this.options_json }});
+                function draw() {
+                    var zoom = line._map.getZoom(), level = levels[levels.length - 1];
+                    for (var i = 0; i < levels.length; i++) {
+                        if (levels[i][0] >= zoom) { level = levels[i]; break; }
+                    }
+                    if (!decoded[level[0]]) decoded[level[0]] = decode(level[1]);
+                    line.setLatLngs(decoded[level[0]]);
+                }
+                line.on("add", function() { draw(); line._map.on("zoomend", draw); });
+                {% if this.tooltip %}line.bindTooltip({{ this.tooltip_json }}, {sticky: true});{% endif %}
+                line.addTo(parent);
+            })({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, coords=None, encoded=None, tooltip=None, color="blue", weight=3, opacity=0.7):
+        super().__init__()
+        self._name = "RouteLine"
+        self.levels_json = script_json(route_levels(encoded if encoded is not None else encode_polyline(coords)))
+        self.precision = ROUTE_PRECISION
+        self.tooltip = tooltip
+        self.tooltip_json = script_json(tooltip)
+        self.options_json = script_json({"color": color, "weight": weight, "opacity": opacity})
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    """Run pages against an empty data directory, with fresh process-wide singletons"""
+    import carpool_bookings
+    import carpool_dispatch
+    import carpool_matching
+    import owner_index
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    monkeypatch.setattr(carpool_bookings, "_inventory", None)
+    monkeypatch.setattr(carpool_matching, "_matcher", None)
+    monkeypatch.setattr(carpool_dispatch, "_queue", None)
+    monkeypatch.setattr(carpool_dispatch, "_dispatcher", None)
+    monkeypatch.setattr(owner_index, "_indexes", {})
+    yield tmp_path
+    if carpool_dispatch._dispatcher is not None:
+        carpool_dispatch._dispatcher.stop()
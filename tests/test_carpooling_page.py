@@ -0,0 +1,83 @@
+import json
+import os
+from datetime import date
+
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+
+RIDE = {
+    "id": "carpool_1",
+    "driver_id": "driver",
+    "driver_name": "Driver",
+    "driver_rating": 4.8,
+    "vehicle": "Toyota Innova",
+    "vehicle_number": "TN 01 AB 1234",
+    "route": "Chennai to Madurai",
+    "start_point": "Chennai",
+    "end_point": "Madurai",
+    "via": [],
+    "date": "2030-01-01",
+    "time": "08:00 AM",
+    "seats_available": 3,
+    "price_per_seat": 400,
+    "phone": "9876543210",
+    "preferences": []
+}
+
+def run_page():
+    return AppTest.from_file(os.path.join(ROOT, "6_carpooling.py"), default_timeout=30).run()
+
+def button(at, key):
+    return next(b for b in at.button if b.key == key)
+
+def test_cancel_booking_returns_the_seat(app_dir):
+    from carpool_bookings import get_seat_inventory
+
+    (app_dir / "data" / "carpools.json").write_text(json.dumps([RIDE]))
+    inventory = get_seat_inventory()
+    booking = inventory.book(dict(RIDE), "guest", "Guest")
+
+    at = run_page()
+    assert not at.exception
+    button(at, f"cancel_booking_{booking['id']}").click().run()
+    button(at, f"yes_confirm_booking_cancel_{booking['id']}").click().run()
+
+    assert not at.exception
+    assert inventory.bookings_for("guest") == []
+    assert inventory.seats_left(RIDE) == 3
+    assert "Booking cancelled successfully." in [s.value for s in at.success]
+
+def test_keep_booking_leaves_it_confirmed(app_dir):
+    from carpool_bookings import get_seat_inventory
+
+    (app_dir / "data" / "carpools.json").write_text(json.dumps([RIDE]))
+    inventory = get_seat_inventory()
+    booking = inventory.book(dict(RIDE), "guest", "Guest")
+
+    at = run_page()
+    button(at, f"cancel_booking_{booking['id']}").click().run()
+    button(at, f"keep_confirm_booking_cancel_{booking['id']}").click().run()
+
+    assert not at.exception
+    assert [b["id"] for b in inventory.bookings_for("guest")] == [booking["id"]]
+    assert any(b.key == f"cancel_booking_{booking['id']}" for b in at.button)
+
+def test_departure_time_sort_is_chronological(app_dir):
+    rides = [
+        dict(RIDE, id="carpool_pm", time="01:00 PM"),
+        dict(RIDE, id="carpool_am", time="09:00 AM"),
+        dict(RIDE, id="carpool_noon", time="12:30 PM")
+    ]
+    (app_dir / "data" / "carpools.json").write_text(json.dumps(rides))
+
+    at = run_page()
+    at.date_input[0].set_value(date(2030, 1, 1)).run()
+    at.selectbox(key="ride_list_sort").set_value("Departure time").run()
+
+    assert not at.exception
+    assert [e.label for e in at.expander][:3] == [
+        "Chennai to Madurai - 09:00 AM",
+        "Chennai to Madurai - 12:30 PM",
+        "Chennai to Madurai - 01:00 PM"
+    ]
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from fastag_ledger import COLUMNS, FastagLedger
+
+WHEN = datetime(2030, 1, 1, 9, 30)
+
+def make_ledger(tmp_path):
+    ledger = FastagLedger(str(tmp_path))
+    ledger.recharge("TN01AB1234", 500, "UPI", when=WHEN)
+    ledger.record_toll("TN01AB1234", "Paranur", 85, when=WHEN)
+    return ledger
+
+def test_torn_row_is_dropped_on_disk(tmp_path):
+    columns = make_ledger(tmp_path).columns
+    # A crash after writing only some columns of a third row
+    for name in ("vehicle", "timestamp", "kind"):
+        with open(tmp_path / f"{name}.bin", "ab") as f:
+            columns[name][-1:].tofile(f)
+
+    ledger = FastagLedger(str(tmp_path))
+    assert len(ledger) == 2
+    ledger.recharge("TN01AB1234", 200, "Card", when=WHEN)
+
+    reloaded = FastagLedger(str(tmp_path))
+    assert len(reloaded) == 3
+    last = reloaded.last_transaction("TN01AB1234")
+    assert (last["kind"], last["payment_method"], last["toll_plaza"]) == ("Recharge", "Card", "")
+    assert reloaded.balance("TN01AB1234") == 615
+    for name in COLUMNS:
+        assert (tmp_path / f"{name}.bin").stat().st_size == 3 * reloaded.columns[name].itemsize
+
+def test_partial_element_is_dropped(tmp_path):
+    make_ledger(tmp_path)
+    with open(tmp_path / "amount.bin", "ab") as f:
+        f.write(b"\x00\x01\x02")
+
+    ledger = FastagLedger(str(tmp_path))
+    assert len(ledger) == 2
+    ledger.record_toll("TN01AB1234", "Vikravandi", 60, when=WHEN)
+
+    reloaded = FastagLedger(str(tmp_path))
+    assert reloaded.last_transaction("TN01AB1234")["toll_plaza"] == "Vikravandi"
+    assert reloaded.balance("TN01AB1234") == 355
+
+def test_partial_string_is_dropped(tmp_path):
+    make_ledger(tmp_path)
+    with open(tmp_path / "strings.txt", "ab") as f:
+        f.write("Samaya".encode("utf-8"))
+
+    FastagLedger(str(tmp_path)).record_toll("TN01AB1234", "Samayapuram", 95, when=WHEN)
+
+    reloaded = FastagLedger(str(tmp_path))
+    assert reloaded.last_transaction("TN01AB1234")["toll_plaza"] == "Samayapuram"
+    assert reloaded.last_recharge("TN01AB1234")["payment_method"] == "UPI"
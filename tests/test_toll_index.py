@@ -0,0 +1,50 @@
+from road_network import build_road_network, city_node
+from toll_index import TollIndex
+
+# Plazas on the Chennai - Tiruchirappalli highway (NH 45), in driving order
+NH45_PLAZAS = [
+    ("Paranur", [12.7267, 79.9870]),
+    ("Athur", [12.5937, 79.9078]),
+    ("Vikravandi", [12.0380, 79.5457]),
+    ("Thirumandurai", [11.4030, 78.9630]),
+    ("Samayapuram", [10.9307, 78.7394]),
+]
+# A plaza well away from that highway
+OFF_ROUTE_PLAZA = ("Kappalur", [9.8790, 78.0310])
+
+def make_plaza(plaza_id, name, coords):
+    return {
+        "id": plaza_id,
+        "name": name,
+        "coordinates": coords,
+        "fees": {"Car/Jeep/Van": 100, "LCV": 150, "Bus/Truck": 300, "Heavy Vehicle": 500}
+    }
+
+def corridor_plazas():
+    named = NH45_PLAZAS + [OFF_ROUTE_PLAZA]
+    return [make_plaza(f"t{i}", name, coords) for i, (name, coords) in enumerate(named)]
+
+def test_plazas_on_a_known_corridor_are_found():
+    plazas = corridor_plazas()
+    network = build_road_network(plazas=plazas)
+    index = TollIndex(network, plazas)
+
+    _, path = network.shortest_path(city_node("Chennai"), city_node("Tiruchirappalli"))
+    tolls = index.route_tolls(path)
+
+    assert [match["plaza"]["name"] for match in tolls["plazas"]] == [name for name, _ in NH45_PLAZAS]
+    distances = [match["distance_km"] for match in tolls["plazas"]]
+    assert distances == sorted(distances)
+    assert tolls["totals"]["Car/Jeep/Van"] == 100 * len(NH45_PLAZAS)
+
+def test_plaza_waits_fall_on_the_edges_through_the_plaza():
+    plazas = corridor_plazas()
+    network = build_road_network(plazas=plazas)
+    index = TollIndex(network, plazas)
+    waits = [10.0] * len(plazas)
+
+    delays = index.edge_delays(waits)
+    _, path = network.shortest_path(city_node("Chennai"), city_node("Tiruchirappalli"))
+
+    # Driving through each plaza costs its wait once
+    assert sum(delays.get(edge_id, 0) for edge_id in network.path_edges(path)) == 10.0 * len(NH45_PLAZAS)
@@ -0,0 +1,54 @@
+import numpy as np
+
+VEHICLE_CLASSES = ["Car/Jeep/Van", "LCV", "Bus/Truck", "Heavy Vehicle"]
+# Fee multiplier by payment mode; vehicles without a valid FASTag pay more
+PAYMENT_MODES = {"FASTag": 1.0, "UPI": 1.25, "Cash": 2.0}
+# A return trip through the same plaza within 24 hours costs this many single fees
+RETURN_WITHIN_24H_FACTOR = 1.5
+# Monthly pass: this many single trips at this share of the single fee
+MONTHLY_PASS_TRIPS = 50
+MONTHLY_PASS_FACTOR = 2 / 3
+
+class TollFeeMatrix:
+    """Fees of every plaza as a dense (plaza x vehicle class) matrix.
+
+    Route costs for all vehicle classes and payment modes come from one
+    gather over the plazas passed, and monthly pass comparisons run over
+    whole arrays of plazas and trip counts at once.
+    """
+
+    def __init__(self, plazas):
+        self.fees = np.array(
+            [[float(plaza.get("fees", {}).get(vc, 0)) for vc in VEHICLE_CLASSES] for plaza in plazas],
+            dtype=float
+        ).reshape(-1, len(VEHICLE_CLASSES))
+        self.payment_multipliers = np.array(list(PAYMENT_MODES.values()))
+
+    def plaza_fees(self, rows, return_within_24h=False):
+        """Fee at each plaza for each vehicle class (len(rows) x classes), FASTag rates"""
+        fees = self.fees[np.asarray(rows, dtype=int)]
+        if return_within_24h:
+            fees = fees * RETURN_WITHIN_24H_FACTOR
+        return fees
+
+    def route_cost(self, rows, return_within_24h=False):
+        """Total route cost for every vehicle class and payment mode (classes x modes)"""
+        totals = self.plaza_fees(rows, return_within_24h).sum(axis=0)
+        return totals[:, None] * self.payment_multipliers[None, :]
+
+    def monthly_costs(self, rows, trips_per_month):
+        """Monthly spend with and without passes, for many trip counts at once.
+
+        trips_per_month is a scalar or array of single trips through each of
+        the route's plazas. Returns (pay_per_trip, with_passes, pass_worthwhile):
+        the first two shaped (trip counts x classes), the last
+        (trip counts x plazas x classes) marking where a pass is cheaper.
+        """
+        trips = np.atleast_1d(np.asarray(trips_per_month, dtype=float))
+        fees = self.fees[np.asarray(rows, dtype=int)]
+        per_trip = trips[:, None, None] * fees[None, :, :]
+        pass_price = fees * MONTHLY_PASS_TRIPS * MONTHLY_PASS_FACTOR
+        # A pass covers MONTHLY_PASS_TRIPS trips; any beyond that are paid per trip
+        with_pass = pass_price[None, :, :] + np.maximum(trips[:, None, None] - MONTHLY_PASS_TRIPS, 0) * fees[None, :, :]
+        worthwhile = with_pass < per_trip
+        return per_trip.sum(axis=1), np.minimum(per_trip, with_pass).sum(axis=1), worthwhile
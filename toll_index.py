@@ -0,0 +1,129 @@
+import threading
+from collections import defaultdict
+import numpy as np
+
+from corridor_index import point_segment_distance, project_km
+from road_network import toll_node
+from toll_fees import VEHICLE_CLASSES, TollFeeMatrix
+
+# Plazas further than this from every road edge are left off the network (km)
+TOLL_SNAP_KM = 5
+# Plazas snapped per batch when measuring against every edge
+SNAP_BATCH = 256
+# Routes whose tolls are kept in memory before the cache is reset
+ROUTE_CACHE_SIZE = 1024
+
+class TollIndex:
+    """Toll plazas snapped onto road network edges.
+
+    Each plaza is attached once, at load time, to its nearest edge, to
+    every other edge running past it within snap_km, and to the edges of
+    its own node when the network was built with plaza nodes, along with
+    the point along each edge where it sits. A route's plazas are then
+    found by walking its edge ids in order, and each route's plaza list
+    and fee totals are cached, so repeated trips cost a dictionary lookup.
+    """
+
+    def __init__(self, network, plazas, snap_km=TOLL_SNAP_KM):
+        self.network = network
+        self.plazas = list(plazas)
+        self.fees = TollFeeMatrix(self.plazas)
+        self._edge_plazas = defaultdict(list)
+        self._routes = {}
+        self._lock = threading.Lock()
+
+        if not self.plazas or not network.edges:
+            return
+
+        starts = project_km([network.nodes[e["u"]] for e in network.edges])
+        ends = project_km([network.nodes[e["v"]] for e in network.edges])
+        points = project_km([p["coordinates"] for p in self.plazas])
+
+        for batch in range(0, len(points), SNAP_BATCH):
+            distances, fractions = point_segment_distance(points[batch:batch + SNAP_BATCH], starts, ends)
+            nearest = np.argmin(distances, axis=1)
+            # Edges that merely end near a plaza lead elsewhere; only count those passing it
+            passing = (distances <= snap_km) & (fractions > 0) & (fractions < 1)
+            for row, edge_id in enumerate(nearest):
+                plaza_index = batch + row
+                edge_ids = set(np.flatnonzero(passing[row]).tolist())
+                if distances[row, edge_id] <= snap_km:
+                    edge_ids.add(int(edge_id))
+                node = toll_node(self.plazas[plaza_index])
+                if node in network.nodes:
+                    edge_ids.update(e for _, e in network.adjacency[node])
+                for e in edge_ids:
+                    self._edge_plazas[e].append((float(fractions[row, e]), plaza_index))
+
+        for entries in self._edge_plazas.values():
+            entries.sort()
+
+    def route_tolls(self, path):
+        """Plazas passed along a node path, in order, with fee totals per vehicle class.
+
+        Returns {"plazas": [{"plaza", "index", "distance_km"}], "rows": plaza
+        indices into self.fees, "totals": {vehicle class: single-trip FASTag fee}}.
+        """
+        key = tuple(path)
+        cached = self._routes.get(key)
+        if cached is not None:
+            return cached
+
+        plazas = []
+        seen = set()
+        travelled = 0.0
+        for u, v in zip(path, path[1:]):
+            edge = self.network.edges[self.network.edge_between(u, v)]
+            entries = self._edge_plazas.get(edge["id"], ())
+            # Fractions run from the edge's u end; flip them when driving it the other way
+            forward = edge["u"] == u
+            for fraction, plaza_index in (entries if forward else reversed(entries)):
+                # Consecutive edges can both pass a plaza; it is still crossed once
+                if plaza_index in seen:
+                    continue
+                seen.add(plaza_index)
+                along = fraction if forward else 1 - fraction
+                plazas.append({
+                    "plaza": self.plazas[plaza_index],
+                    "index": plaza_index,
+                    "distance_km": travelled + along * edge["distance"]
+                })
+            travelled += edge["distance"]
+
+        rows = [match["index"] for match in plazas]
+        totals = dict(zip(VEHICLE_CLASSES, self.fees.plaza_fees(rows).sum(axis=0).tolist()))
+
+        result = {"plazas": plazas, "rows": rows, "totals": totals}
+        with self._lock:
+            if len(self._routes) >= ROUTE_CACHE_SIZE:
+                self._routes.clear()
+            self._routes[key] = result
+        return result
+
+    def edge_delays(self, plaza_delays):
+        """Sum a per-plaza cost (e.g. predicted wait) onto the edges the plazas sit on"""
+        delays = {}
+        for edge_id, entries in self._edge_plazas.items():
+            edge = self.network.edges[edge_id]
+            # A route through a plaza's node uses two of its edges, so each carries half the cost
+            delays[edge_id] = float(sum(
+                plaza_delays[plaza_index] / 2 if toll_node(self.plazas[plaza_index]) in (edge["u"], edge["v"]) else plaza_delays[plaza_index]
+                for _, plaza_index in entries
+            ))
+        return delays
+
+# Indexes shared across reruns, keyed by network and plaza ids
+_index_cache = {}
+_index_lock = threading.Lock()
+
+def get_toll_index(network, plazas):
+    """Return the cached toll index for a road network and plaza list"""
+    key = (id(network), tuple(p.get("id", p["name"]) for p in plazas))
+    index = _index_cache.get("toll_plazas")
+    if index is None or index[0] != key:
+        with _index_lock:
+            index = _index_cache.get("toll_plazas")
+            if index is None or index[0] != key:
+                index = (key, TollIndex(network, plazas))
+                _index_cache["toll_plazas"] = index
+    return index[1]
@@ -0,0 +1,144 @@
+import logging
+import re
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Vehicles one lane clears per minute
+FASTAG_SERVICE_PER_MIN = 10
+CASH_SERVICE_PER_MIN = 2
+# Share of traffic still paying cash
+CASH_SHARE = 0.05
+# Traffic relative to the day's average for each hour
+HOURLY_TRAFFIC = np.array([
+    0.3, 0.2, 0.2, 0.2, 0.3, 0.5, 0.9, 1.3, 1.6, 1.5, 1.2, 1.1,
+    1.1, 1.0, 1.0, 1.1, 1.3, 1.6, 1.7, 1.4, 1.1, 0.8, 0.6, 0.4
+])
+# Arrival rates are smoothed over roughly this many minutes of counts
+RATE_WINDOW_MINUTES = 5
+# Utilisation used in the steady-state wait once a lane is saturated; the backlog covers the rest
+MAX_UTILISATION = 0.99
+WAIT_UPDATE_SECONDS = 5
+# Wait assumed at plazas whose stored wait can't be read (minutes)
+DEFAULT_WAIT_MINUTES = 2
+
+def _minutes(text):
+    match = re.search(r"\d+(\.\d+)?", str(text or ""))
+    return float(match.group()) if match else DEFAULT_WAIT_MINUTES
+
+def _lane_wait(rate, lanes, backlog, service):
+    """Queueing wait (minutes) with traffic split evenly over M/M/1 lanes, NaN where there are no lanes.
+
+    The steady-state wait is topped up by the backlog divided by lane
+    capacity, the extra time to clear the queue ahead.
+    """
+    has_lanes = lanes > 0
+    lanes = np.where(has_lanes, lanes, 1)
+    per_lane = np.minimum(rate / lanes, MAX_UTILISATION * service)
+    wait = per_lane / (service * (service - per_lane)) + backlog / (lanes * service)
+    return np.where(has_lanes, wait, np.nan)
+
+class PlazaWaitEngine:
+    """Predicted FASTag and cash lane waits for every toll plaza.
+
+    Each plaza's lanes are modelled as queues whose arrival rates are
+    smoothed from a stream of arrival counts, and a backlog carries over
+    whatever the lanes couldn't clear. All plazas are advanced together
+    in one array step, either from recorded counts or, with no live feed,
+    from arrivals drawn around each plaza's usual traffic for the hour.
+    """
+
+    def __init__(self, plazas, seed=None):
+        self.plazas = list(plazas)
+        self.fastag_lanes = np.array([p.get("fastag_lanes", 0) for p in self.plazas], dtype=float)
+        self.cash_lanes = np.array([p.get("cash_lanes", 0) for p in self.plazas], dtype=float)
+        self._random = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+        # Take each plaza's stored FASTag wait as its peak-hour load and solve for the arrival rate behind it
+        stored = np.array([_minutes(p.get("current_waiting_time")) for p in self.plazas], dtype=float)
+        per_lane = stored * FASTAG_SERVICE_PER_MIN ** 2 / (1 + stored * FASTAG_SERVICE_PER_MIN)
+        self.base_rate = per_lane * self.fastag_lanes / (1 - CASH_SHARE) / HOURLY_TRAFFIC.max()
+        hourly_rate = self.base_rate * HOURLY_TRAFFIC[time.localtime().tm_hour]
+        self.fastag_rate = hourly_rate * (1 - CASH_SHARE)
+        self.cash_rate = hourly_rate * CASH_SHARE
+        self.fastag_backlog = np.zeros(len(self.plazas))
+        self.cash_backlog = np.zeros(len(self.plazas))
+        self.fastag_wait = np.zeros(len(self.plazas))
+        self.cash_wait = np.zeros(len(self.plazas))
+        self.updated_at = time.time()
+        self._refresh_waits()
+
+    def _refresh_waits(self):
+        self.fastag_wait = _lane_wait(self.fastag_rate, self.fastag_lanes, self.fastag_backlog, FASTAG_SERVICE_PER_MIN)
+        self.cash_wait = _lane_wait(self.cash_rate, self.cash_lanes, self.cash_backlog, CASH_SERVICE_PER_MIN)
+
+    def record_arrivals(self, fastag_counts, cash_counts, minutes):
+        """Advance every plaza by `minutes` given the vehicles that arrived at each in that time"""
+        fastag_counts = np.asarray(fastag_counts, dtype=float)
+        cash_counts = np.asarray(cash_counts, dtype=float)
+        weight = 1 - np.exp(-minutes / RATE_WINDOW_MINUTES)
+        with self._lock:
+            self.fastag_rate += weight * (fastag_counts / minutes - self.fastag_rate)
+            self.cash_rate += weight * (cash_counts / minutes - self.cash_rate)
+            # Arrivals beyond what the lanes clear in this interval queue up for the next
+            self.fastag_backlog = np.maximum(0, self.fastag_backlog + fastag_counts - self.fastag_lanes * FASTAG_SERVICE_PER_MIN * minutes)
+            self.cash_backlog = np.maximum(0, self.cash_backlog + cash_counts - self.cash_lanes * CASH_SERVICE_PER_MIN * minutes)
+            self._refresh_waits()
+            self.updated_at = time.time()
+
+    def step(self, now=None):
+        """Draw arrivals since the last update at each plaza's usual rate for the hour and advance"""
+        now = now or time.time()
+        minutes = max((now - self.updated_at) / 60, 1e-3)
+        expected = self.base_rate * HOURLY_TRAFFIC[time.localtime(now).tm_hour] * minutes
+        arrivals = self._random.poisson(expected)
+        cash = self._random.binomial(arrivals, CASH_SHARE)
+        self.record_arrivals(arrivals - cash, cash, minutes)
+
+    def waits(self, index):
+        """(FASTag, cash) predicted wait in minutes at one plaza, None for a lane type it doesn't have"""
+        return tuple(None if np.isnan(wait) else float(wait) for wait in (self.fastag_wait[index], self.cash_wait[index]))
+
+    def plaza_delays(self, cash=False):
+        """Predicted wait at every plaza (minutes), in plaza order.
+
+        Plazas without lanes for the payment mode are timed at their other
+        lanes, and plazas with no lanes listed at DEFAULT_WAIT_MINUTES.
+        """
+        own, other = (self.cash_wait, self.fastag_wait) if cash else (self.fastag_wait, self.cash_wait)
+        return np.where(np.isnan(own), np.where(np.isnan(other), DEFAULT_WAIT_MINUTES, other), own)
+
+# Engines shared by every Streamlit session, keyed by plaza ids
+_engine = None
+_engine_lock = threading.Lock()
+_engine_thread = None
+_engine_stop = threading.Event()
+
+def _run(engine):
+    while not _engine_stop.wait(WAIT_UPDATE_SECONDS):
+        # A failed update leaves the last waits in place until the next one
+        try:
+            engine.step()
+        except Exception:
+            logger.exception("Toll wait update failed")
+
+def get_wait_engine(plazas, start=True):
+    """Return the shared wait engine for a plaza list, updating it in the background on first use"""
+    global _engine, _engine_thread
+    key = tuple(p.get("id", p["name"]) for p in plazas)
+    if _engine is None or _engine[0] != key or (start and _engine_thread is None):
+        with _engine_lock:
+            if _engine is None or _engine[0] != key:
+                _engine = (key, PlazaWaitEngine(plazas))
+                if _engine_thread is not None:
+                    _engine_stop.set()
+                    _engine_thread.join()
+                    _engine_stop.clear()
+                _engine_thread = None
+            if start and _engine_thread is None:
+                _engine_thread = threading.Thread(target=_run, args=(_engine[1],), name="toll-wait-engine", daemon=True)
+                _engine_thread.start()
+    return _engine[1]
@@ -1,9 +1,13 @@
 import streamlit as st
 import folium
+import xyzservices
+from branca.element import MacroElement
+from jinja2 import Template
 from streamlit_folium import st_folium
 import numpy as np
 import pandas as pd
 import json
+import logging
 import os
 import random
 from datetime import datetime, timedelta
@@ -36,24 +40,73 @@ TRAFFIC_COLORS = {
     "Gridlock": "darkred"
 }
 
+# Base map tiles, looked up once; folium otherwise searches every xyzservices provider for each new map
+_BASE_TILES = xyzservices.providers.query_name("OpenStreetMap Mapnik")
+
+# City markers as one script, serialized once; same look as a folium.Marker with folium.Icon(icon="city", prefix="fa")
+_CITY_LAYER_SCRIPT = """
+var cities = %s;
+var icon = L.AwesomeMarkers.icon({icon: "city", prefix: "fa", markerColor: "blue", iconColor: "white", extraClasses: "fa-rotate-0"});
+cities.forEach(function(city) {
+    L.marker(city[1], {icon: icon}).bindPopup(city[0], {maxWidth: "100%%"}).bindTooltip(city[0], {sticky: true}).addTo(map);
+});
+""" % json.dumps(list(MAJOR_CITIES.items()))
+
+class CityLayer(MacroElement):
+    """Major city markers drawn by one pre-serialized script instead of a folium element per city"""
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            (function(map) {{ '{' }}{{ this.script }}{{ '}' }})({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = "CityLayer"
+        self.script = _CITY_LAYER_SCRIPT
+
 # Function to create a base Tamil Nadu map
-def create_tamil_nadu_map(center=TAMIL_NADU_CENTER, zoom=TAMIL_NADU_ZOOM):
-    m = folium.Map(location=center, zoom_start=zoom, tiles="OpenStreetMap")
+def create_tamil_nadu_map(center=TAMIL_NADU_CENTER, zoom=TAMIL_NADU_ZOOM, cities=True):
+    m = folium.Map(location=center, zoom_start=zoom, tiles=folium.TileLayer(_BASE_TILES, name="openstreetmap"))
     
     # Add major cities
-    for city, coords in MAJOR_CITIES.items():
-        folium.Marker(
-            location=coords,
-            popup=city,
-            tooltip=city,
-            icon=folium.Icon(icon="city", prefix="fa")
-        ).add_to(m)
+    if cities:
+        CityLayer().add_to(m)
     
     return m
 
 # Function to display a folium map in Streamlit
-def display_map(map_object):
-    return st_folium(map_object, width=800, height=500, returned_objects=[])
+def display_map(map_object, key=None):
+    """Show a map; with a key, its viewport and last click are kept for map_view on the next rerun"""
+    if key is None:
+        return st_folium(map_object, width=800, height=500, returned_objects=[])
+    view = map_view(key)
+    return st_folium(
+        map_object,
+        width=800,
+        height=500,
+        key=key,
+        center=view.get("center"),
+        zoom=view.get("zoom"),
+        returned_objects=["bounds", "zoom", "center", "last_object_clicked"]
+    )
+
+# Function to read the viewport a keyed map was last shown at
+def map_view(key):
+    state = st.session_state.get(key) or {}
+    bounds = state.get("bounds") or {}
+    south_west = bounds.get("_southWest") or {}
+    north_east = bounds.get("_northEast") or {}
+    center = state.get("center") or {}
+    clicked = state.get("last_object_clicked") or {}
+    view = {"zoom": state.get("zoom")}
+    if south_west.get("lat") is not None and north_east.get("lat") is not None:
+        view["bounds"] = (south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"])
+    if center.get("lat") is not None:
+        view["center"] = [center["lat"], center["lng"]]
+    if clicked.get("lat") is not None:
+        view["clicked"] = [clicked["lat"], clicked["lng"]]
+    return view
 
 # Function to generate routes between two locations
 def generate_routes(start, end, num_routes=3):
@@ -142,6 +195,34 @@ def load_json_data(filename):
     except (FileNotFoundError, json.JSONDecodeError):
         return []
 
+# Function to load an append-only JSON lines log
+def load_jsonl(path):
+    """Entries of a log written one JSON object per line.
+
+    A crash mid-write leaves a partial last line; it is cut off so the next
+    append starts on a fresh line. Any other line that can't be parsed is
+    skipped rather than losing the rest of the log.
+    """
+    try:
+        with open(path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                data = data[:data.rfind(b"\n") + 1]
+                f.truncate(len(data))
+                logging.getLogger(__name__).warning("Dropped a partial last line from %s", path)
+    except FileNotFoundError:
+        return []
+
+    entries = []
+    for number, line in enumerate(data.decode("utf-8", errors="replace").split("\n"), 1):
+        if not line.strip():
+            continue
+        try:
+            entries.append(json.loads(line))
+        except json.JSONDecodeError:
+            logging.getLogger(__name__).warning("Skipped unreadable line %d of %s", number, path)
+    return entries
+
 # Function to save JSON data
 def save_json_data(data, filename):
     os.makedirs("data", exist_ok=True)